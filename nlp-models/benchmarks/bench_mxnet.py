@@ -0,0 +1,31 @@
+import os
+import sys
+import mxnet as mx
+import synthetic
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mxnet'))
+
+
+def setup(cfg):
+    pass # the engine reads OMP_NUM_THREADS at import, run.py sets it for the benchmark process
+
+
+def cnn_text_clf(cfg):
+    from cnn_text_clf import CNNTextClassifier
+    model = CNNTextClassifier(mx.cpu(), cfg.vocab_size, cfg.n_out)
+    X, _ = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    inputs, labels = model.from_numpy(X, synthetic.labels(cfg.batch_size, cfg.n_out))
+    def train_step():
+        with mx.gluon.autograd.record(train_mode=True):
+            loss = model.criterion(model.model(inputs), labels)
+        loss.backward()
+        model.optimizer.step(cfg.batch_size)
+        mx.nd.waitall() # the engine is asynchronous, wait for the step to really finish
+    def make_predict(batch_size):
+        inputs = model.from_numpy(synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)[0])
+        return lambda: model.model(inputs).asnumpy()
+    return train_step, make_predict
+
+
+BENCHMARKS = [('cnn_text_clf', cnn_text_clf)]
@@ -0,0 +1,119 @@
+import os
+import sys
+import numpy as np
+import torch
+import synthetic
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pytorch'))
+
+
+def setup(cfg):
+    if cfg.threads > 0:
+        torch.set_num_threads(cfg.threads)
+
+
+def to_variable(arr):
+    return torch.autograd.Variable(torch.from_numpy(arr.astype(np.int64)))
+
+
+def optimizer_step(model, loss):
+    model.optimizer.zero_grad()
+    loss.backward()
+    model.optimizer.step()
+
+
+def rnn_text_clf(cfg):
+    from rnn_text_clf import RNNTextClassifier
+    model = RNNTextClassifier(cfg.vocab_size, cfg.n_out)
+    X, X_lens = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    inputs, labels = to_variable(X), to_variable(synthetic.labels(cfg.batch_size, cfg.n_out))
+    def train_step():
+        model.train()
+        preds, _ = model(inputs, X_lens.tolist())
+        optimizer_step(model, model.criterion(preds, labels))
+    def make_predict(batch_size):
+        X, X_lens = synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)
+        inputs = to_variable(X)
+        def predict():
+            model.eval()
+            with torch.no_grad():
+                return model(inputs, X_lens.tolist())[0]
+        return predict
+    return train_step, make_predict
+
+
+def cnn_text_clf(cfg):
+    from cnn_text_clf import CNNTextClassifier
+    model = CNNTextClassifier(cfg.seq_len, cfg.vocab_size, cfg.n_out)
+    inputs = to_variable(synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)[0])
+    labels = to_variable(synthetic.labels(cfg.batch_size, cfg.n_out))
+    def train_step():
+        model.train()
+        optimizer_step(model, model.criterion(model(inputs, cfg.batch_size), labels))
+    def make_predict(batch_size):
+        inputs = to_variable(synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)[0])
+        def predict():
+            model.eval()
+            with torch.no_grad():
+                return model(inputs, batch_size)
+        return predict
+    return train_step, make_predict
+
+
+def rnn_attn_text_clf(cfg):
+    from rnn_attn_text_clf import RNNTextClassifier
+    model = RNNTextClassifier(cfg.vocab_size, cfg.n_out)
+    inputs = to_variable(synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)[0])
+    labels = to_variable(synthetic.labels(cfg.batch_size, cfg.n_out))
+    def train_step():
+        model.train()
+        optimizer_step(model, model.criterion(model(inputs, cfg.batch_size), labels))
+    def make_predict(batch_size):
+        inputs = to_variable(synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)[0])
+        def predict():
+            model.eval()
+            with torch.no_grad():
+                return model(inputs, batch_size)
+        return predict
+    return train_step, make_predict
+
+
+def birnn_seq_clf(cfg):
+    from birnn_seq_clf import BiRNN
+    model = BiRNN(cfg.vocab_size, cfg.n_tags)
+    X, X_lens = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    inputs, labels = to_variable(X), to_variable(synthetic.tags(X_lens, cfg.seq_len, cfg.n_tags).ravel())
+    def train_step():
+        model.train()
+        optimizer_step(model, model.criterion(model(inputs), labels))
+    def make_predict(batch_size):
+        inputs = to_variable(synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)[0])
+        def predict():
+            model.eval()
+            with torch.no_grad():
+                return model(inputs)
+        return predict
+    return train_step, make_predict
+
+
+def seq2seq(cfg):
+    from seq2seq import Seq2Seq
+    word2idx = synthetic.word2idx(cfg.vocab_size)
+    model = Seq2Seq(128, 2, word2idx, 64, word2idx, 64)
+    X, X_lens = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    Y, Y_lens = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    source, target = to_variable(X), to_variable(Y)
+    Y_masks = (np.arange(cfg.seq_len)[np.newaxis, :] < Y_lens[:, np.newaxis]).astype(np.int32)
+    def make_predict(batch_size):
+        X, X_lens = synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)
+        sequences = [row[:n].tolist() for row, n in zip(X, X_lens)]
+        return lambda: model.predict_batch(sequences, maxlen=cfg.seq_len)
+    return lambda: model.train(source, target, X_lens.tolist(), Y_masks), make_predict
+
+
+BENCHMARKS = [('rnn_text_clf', rnn_text_clf),
+              ('cnn_text_clf', cnn_text_clf),
+              ('rnn_attn_text_clf', rnn_attn_text_clf),
+              ('birnn_seq_clf', birnn_seq_clf),
+              ('seq2seq', seq2seq)]
@@ -0,0 +1,31 @@
+import os
+import sys
+import synthetic
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+
+
+def setup(cfg):
+    pass
+
+
+def tfidf_logistic(cfg):
+    """
+    A train step is a full fit on one batch of documents, the model has no incremental update
+    """
+    from tfidf_logistic import TfidfLogistic
+    model = TfidfLogistic(cfg.vocab_size)
+    X, X_lens = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    docs = [row[:n] for row, n in zip(X, X_lens)]
+    y = synthetic.labels(cfg.batch_size, cfg.n_out)
+    y[:cfg.n_out] = range(cfg.n_out) # every class present, LogisticRegression refuses a single one
+    model.fit(docs, y)
+    def make_predict(batch_size):
+        X, X_lens = synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)
+        docs = [row[:n] for row, n in zip(X, X_lens)]
+        return lambda: model.predict(docs)
+    return lambda: model.fit(docs, y), make_predict
+
+
+BENCHMARKS = [('tfidf_logistic', tfidf_logistic)]
@@ -0,0 +1,123 @@
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+import synthetic
+
+
+TF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tensorflow')
+sys.path.insert(0, TF_DIR)
+import session_config
+
+
+def setup(cfg):
+    session_config.configure(intra_op_threads=cfg.threads, inter_op_threads=cfg.threads)
+
+
+def rnn_text_clf(cfg):
+    from rnn_text_clf import RNNTextClassifier
+    model = RNNTextClassifier(cfg.vocab_size, cfg.n_out)
+    model.sess.run(tf.global_variables_initializer())
+    X, X_lens = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    train_feed = {model.X: X, model.X_seq_lens: X_lens, model.Y: synthetic.labels(cfg.batch_size, cfg.n_out),
+                  model.keep_prob: 0.8, model.lr: 1e-3}
+    def make_predict(batch_size):
+        X, X_lens = synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)
+        feed = {model.X: X, model.X_seq_lens: X_lens, model.keep_prob: 1.0}
+        return lambda: model.sess.run(model.logits, feed)
+    return lambda: model.sess.run(model.train_op, train_feed), make_predict
+
+
+def conv_1d_text_clf(cfg):
+    from conv_1d_text_clf import Conv1DClassifier
+    model = Conv1DClassifier(cfg.seq_len, cfg.vocab_size, cfg.n_out)
+    model.sess.run(tf.global_variables_initializer())
+    X, _ = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    train_feed = {model.X: X, model.Y: synthetic.labels(cfg.batch_size, cfg.n_out), model.keep_prob: 0.8,
+                  model.lr: 1e-3}
+    def make_predict(batch_size):
+        feed = {model.X: synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)[0], model.keep_prob: 1.0}
+        return lambda: model.sess.run(model.logits, feed)
+    return lambda: model.sess.run(model.train_op, train_feed), make_predict
+
+
+def birnn_crf_clf(cfg):
+    from birnn_crf_clf import BiRNN_CRF
+    model = BiRNN_CRF(cfg.vocab_size, cfg.n_tags)
+    model.sess.run(tf.global_variables_initializer())
+    X, X_lens = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    train_feed = {model.X: X, model.X_seq_len: X_lens, model.Y: synthetic.tags(X_lens, cfg.seq_len, cfg.n_tags),
+                  model.keep_prob: 0.8, model.lr: 1e-3}
+    def make_predict(batch_size):
+        X, X_lens = synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)
+        feed = {model.X: X, model.X_seq_len: X_lens, model.keep_prob: 1.0}
+        return lambda: model.sess.run(model.viterbi_sequence, feed)
+    return lambda: model.sess.run(model.train_op, train_feed), make_predict
+
+
+def multihead_attn_clf(cfg):
+    from multihead_attn_clf import Tagger
+    model = Tagger(cfg.vocab_size, cfg.n_tags, cfg.seq_len)
+    model.sess.run(tf.global_variables_initializer())
+    X, X_lens = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    train_feed = {model.X: X, model.X_seq_len: X_lens, model.Y: synthetic.tags(X_lens, cfg.seq_len, cfg.n_tags),
+                  model.is_training: True, model.lr: 1e-3}
+    def make_predict(batch_size):
+        X, X_lens = synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)
+        feed = {model.X: X, model.X_seq_len: X_lens, model.is_training: False}
+        return lambda: model.sess.run(model.viterbi_sequence, feed)
+    return lambda: model.sess.run(model.train_op, train_feed), make_predict
+
+
+def seq2seq(cfg):
+    from seq2seq import Seq2Seq
+    word2idx = synthetic.word2idx(cfg.vocab_size)
+    model = Seq2Seq(128, 2, word2idx, 64, word2idx, 64)
+    model.sess.run(tf.global_variables_initializer())
+    X, X_lens = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    Y, Y_lens = synthetic.tokens(cfg.batch_size, cfg.seq_len, cfg.vocab_size)
+    train_feed = {model.X: X, model.X_seq_len: X_lens, model.Y: Y, model.Y_seq_len: Y_lens}
+    def make_predict(batch_size):
+        X, X_lens = synthetic.tokens(batch_size, cfg.seq_len, cfg.vocab_size)
+        feed = {model.X: X, model.X_seq_len: X_lens}
+        return lambda: model.sess.run(model.predicting_ids, feed)
+    return lambda: model.sess.run(model.train_op, train_feed), make_predict
+
+
+def asr(cfg):
+    sys.path.insert(0, os.path.join(TF_DIR, 'asr'))
+    from model import Model
+    n_classes = 28
+    model = Model(n_classes, num_features=cfg.n_features)
+    sess = session_config.new_session()
+    sess.run(tf.global_variables_initializer())
+    inputs, seq_lens = synthetic.audio_features(cfg.batch_size, cfg.n_frames, cfg.n_features)
+    targets = synthetic.ctc_targets(cfg.batch_size, cfg.n_frames // 4, n_classes)
+    def make_predict(batch_size):
+        inputs, seq_lens = synthetic.audio_features(batch_size, cfg.n_frames, cfg.n_features)
+        return lambda: model.test_batch(sess, inputs, seq_lens)
+    return lambda: model.train_batch(sess, inputs, seq_lens, targets), make_predict
+
+
+def img2seq(cfg):
+    sys.path.insert(0, os.path.join(TF_DIR, 'image_caption'))
+    from img2seq import Image2Seq
+    word2idx = synthetic.word2idx(cfg.vocab_size, ('<pad>', '<start>', '<end>', '<unk>')) # build_vocab.py symbols
+    model = Image2Seq((cfg.image_size, cfg.image_size), word2idx)
+    model.sess.run(tf.global_variables_initializer())
+    images = synthetic.images(cfg.batch_size, cfg.image_size, cfg.image_size)
+    captions, caption_lens = synthetic.tokens(cfg.batch_size, cfg.caption_len, cfg.vocab_size)
+    def make_predict(batch_size):
+        feed = {model.X: synthetic.images(batch_size, cfg.image_size, cfg.image_size),
+                model.Y_seq_len: np.full(batch_size, cfg.caption_len), model.train_flag: False}
+        return lambda: model.sess.run(model.predicting_ids, feed)
+    return lambda: model.partial_fit(images, captions, caption_lens), make_predict
+
+
+BENCHMARKS = [('rnn_text_clf', rnn_text_clf),
+              ('conv_1d_text_clf', conv_1d_text_clf),
+              ('birnn_crf_clf', birnn_crf_clf),
+              ('multihead_attn_clf', multihead_attn_clf),
+              ('seq2seq', seq2seq),
+              ('asr', asr),
+              ('img2seq', img2seq)]
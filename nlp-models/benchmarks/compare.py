@@ -0,0 +1,66 @@
+"""
+Compares two run.py reports, e.g. the base and the head of a branch
+
+    python compare.py results/base.json results/head.json --threshold 0.1
+
+Exits with 1 when a model got slower than the threshold, in training steps/sec or in p50/p99 latency
+"""
+from __future__ import print_function
+import sys
+import json
+import argparse
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report, {(r['framework'], r['model']): r for r in report['results']}
+
+
+def metrics(result):
+    # name -> (value, True if higher is better)
+    out = {}
+    if 'train_steps_per_sec' in result:
+        out['train steps/sec'] = (result['train_steps_per_sec'], True)
+    for batch_size, latency in sorted(result.get('latency', {}).items(), key=lambda kv: int(kv[0])):
+        out['p50 ms @%s' % batch_size] = (latency['p50_ms'], False)
+        out['p99 ms @%s' % batch_size] = (latency['p99_ms'], False)
+    if 'peak_rss_mb' in result:
+        out['peak RSS MB'] = (result['peak_rss_mb'], False)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change counted as a regression')
+    args = parser.parse_args()
+
+    base_report, base = load(args.base)
+    head_report, head = load(args.head)
+    if base_report['config'] != head_report['config']:
+        print("Warning: the two runs used different configs")
+    print("base: %s | head: %s" % (base_report['commit'], head_report['commit']))
+
+    regressions = 0
+    for key in sorted(set(base) & set(head)):
+        base_metrics, head_metrics = metrics(base[key]), metrics(head[key])
+        for name in sorted(set(base_metrics) & set(head_metrics)):
+            (old, higher_is_better), (new, _) = base_metrics[name], head_metrics[name]
+            change = (new - old) / old if old > 0 else 0.
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > args.threshold:
+                flag = '  <-- regression'
+                regressions += 1
+            print("%-12s %-20s %-16s %10.2f -> %10.2f  (%+.1f%%)%s" % (
+                key[0], key[1], name, old, new, 100 * change, flag))
+    for key in sorted(set(base) ^ set(head)):
+        print("%-12s %-20s only in %s" % (key[0], key[1], 'base' if key in base else 'head'))
+    print("%d regression(s) beyond %.0f%%" % (regressions, 100 * args.threshold))
+    sys.exit(1 if regressions > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
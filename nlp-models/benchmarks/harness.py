@@ -0,0 +1,57 @@
+"""
+Timing helpers shared by the framework benchmarks
+
+A benchmark is a function cfg -> (train_step, make_predict):
+    train_step()              runs one optimizer step on a batch of cfg.batch_size prepared beforehand
+    make_predict(batch_size)  prepares a batch of that size and returns a zero-argument predict function
+so only the framework call is timed, not the data generation
+"""
+import sys
+import time
+import resource
+import numpy as np
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024. ** 2 if sys.platform == 'darwin' else peak / 1024. # bytes on macOS, KB on Linux
+
+
+def time_train(train_step, n_steps, n_warmup):
+    for _ in range(n_warmup):
+        train_step()
+    t0 = time.time()
+    for _ in range(n_steps):
+        train_step()
+    return n_steps / (time.time() - t0)
+
+
+def time_latency(predict, n_runs, n_warmup):
+    for _ in range(n_warmup):
+        predict()
+    times = []
+    for _ in range(n_runs):
+        t0 = time.time()
+        predict()
+        times.append(1000 * (time.time() - t0))
+    return {'p50_ms': float(np.percentile(times, 50)),
+            'p99_ms': float(np.percentile(times, 99)),
+            'mean_ms': float(np.mean(times))}
+
+
+def measure(benchmark, cfg):
+    """
+    Runs one benchmark, returns a JSON-serializable dict
+    """
+    t0 = time.time()
+    train_step, make_predict = benchmark(cfg)
+    result = {'build_secs': time.time() - t0}
+    if train_step is not None:
+        steps_per_sec = time_train(train_step, cfg.train_steps, cfg.warmup)
+        result['train_steps_per_sec'] = steps_per_sec
+        result['train_examples_per_sec'] = steps_per_sec * cfg.batch_size
+    if make_predict is not None:
+        result['latency'] = {str(batch_size): time_latency(make_predict(batch_size), cfg.latency_runs, cfg.warmup)
+                             for batch_size in cfg.latency_batch_sizes}
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
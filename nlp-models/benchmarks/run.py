@@ -0,0 +1,124 @@
+"""
+Synthetic-data benchmarks of the models of every framework, offline and on CPU
+
+    python run.py --out results/$(git rev-parse --short HEAD).json
+    python run.py --frameworks pytorch --models rnn_text_clf,seq2seq --batch_size 64 --seq_len 200
+    python compare.py results/base.json results/head.json
+
+Each model runs in its own process, so its peak RSS is its own and a framework that is not installed
+only marks its models as skipped
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import importlib
+import subprocess
+import harness
+
+
+FRAMEWORKS = ['tensorflow', 'pytorch', 'mxnet', 'sklearn']
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def int_list(s):
+    return [int(x) for x in s.split(',')]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frameworks', default=','.join(FRAMEWORKS))
+    parser.add_argument('--models', default=None, help='comma separated model names, all by default')
+    parser.add_argument('--out', default='results.json')
+    parser.add_argument('--batch_size', type=int, default=32, help='training batch size')
+    parser.add_argument('--seq_len', type=int, default=100)
+    parser.add_argument('--vocab_size', type=int, default=10000)
+    parser.add_argument('--n_out', type=int, default=2, help='classes of the text classifiers')
+    parser.add_argument('--n_tags', type=int, default=10, help='tags of the sequence taggers')
+    parser.add_argument('--n_frames', type=int, default=200, help='audio frames per utterance')
+    parser.add_argument('--n_features', type=int, default=13, help='features per audio frame')
+    parser.add_argument('--image_size', type=int, default=64)
+    parser.add_argument('--caption_len', type=int, default=20)
+    parser.add_argument('--train_steps', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--latency_batch_sizes', type=int_list, default=[1, 8, 32, 128])
+    parser.add_argument('--latency_runs', type=int, default=30)
+    parser.add_argument('--threads', type=int, default=0, help='intra-op threads, 0 for the framework default')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--single', default=None, help=argparse.SUPPRESS) # framework:model, internal
+    return parser.parse_args(argv)
+
+
+def run_single(cfg):
+    # child process: prints the result of one benchmark as the last line of stdout
+    import numpy as np
+    framework, name = cfg.single.split(':')
+    np.random.seed(cfg.seed)
+    module = importlib.import_module('bench_' + framework)
+    module.setup(cfg)
+    print(json.dumps(harness.measure(dict(module.BENCHMARKS)[name], cfg)))
+
+
+def benchmark_names(framework):
+    # the registry is read from the source, so listing does not import the framework
+    path = os.path.join(BENCH_DIR, 'bench_%s.py' % framework)
+    source = open(path).read()
+    registry = source[source.index('BENCHMARKS = '):]
+    return [line.split("'")[1] for line in registry.splitlines() if "('" in line]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BENCH_DIR).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    cfg = parse_args()
+    if cfg.single is not None:
+        return run_single(cfg)
+
+    env = dict(os.environ, CUDA_VISIBLE_DEVICES='', TF_CPP_MIN_LOG_LEVEL='2')
+    if cfg.threads > 0:
+        env['OMP_NUM_THREADS'] = str(cfg.threads)
+    models = None if cfg.models is None else set(cfg.models.split(','))
+    results = []
+    for framework in cfg.frameworks.split(','):
+        for name in benchmark_names(framework):
+            if models is not None and name not in models:
+                continue
+            print("%s | %s ..." % (framework, name), end=' ')
+            sys.stdout.flush()
+            proc = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, 'run.py'), '--single',
+                                     '%s:%s' % (framework, name)] + sys.argv[1:],
+                                    cwd=BENCH_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            out, err = proc.communicate()
+            result = {'framework': framework, 'model': name}
+            if proc.returncode == 0:
+                result.update(json.loads(out.decode().strip().splitlines()[-1]))
+                print("%.2f steps/sec | peak RSS %.0f MB" % (result.get('train_steps_per_sec', 0.),
+                                                            result['peak_rss_mb']))
+            else:
+                lines = err.decode(errors='replace').strip().splitlines()
+                result['error'] = lines[-1] if lines else 'exit code %d' % proc.returncode
+                print("skipped: %s" % result['error'])
+            results.append(result)
+
+    config = {k: v for k, v in vars(cfg).items() if k not in ('single', 'out', 'frameworks', 'models')}
+    report = {'commit': git_commit(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'platform': platform.platform(), 'processor': platform.processor(), 'cpu_count': os.cpu_count(),
+              'python': platform.python_version(), 'config': config, 'results': results}
+    out_dir = os.path.dirname(os.path.abspath(cfg.out))
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    with open(cfg.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Results written to %s" % cfg.out)
+
+
+if __name__ == '__main__':
+    main()
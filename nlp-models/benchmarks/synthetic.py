@@ -0,0 +1,62 @@
+"""
+Synthetic inputs of configurable shape, so the benchmarks run offline without IMDB, PKU or COCO
+"""
+import numpy as np
+
+
+def tokens(batch_size, seq_len, vocab_size, min_len=None, pad_int=0, rng=np.random):
+    """
+    Returns padded ids [batch_size, seq_len] and their lengths, sorted longest first
+    (pack_padded_sequence expects that). Ids are drawn from [1, vocab_size), pad_int fills the tail
+    """
+    min_len = seq_len // 2 if min_len is None else min_len
+    lens = np.sort(rng.randint(min_len, seq_len + 1, batch_size))[::-1]
+    X = rng.randint(1, vocab_size, [batch_size, seq_len])
+    X[np.arange(seq_len)[np.newaxis, :] >= lens[:, np.newaxis]] = pad_int
+    return X.astype(np.int32), lens.astype(np.int32)
+
+
+def labels(batch_size, n_out, rng=np.random):
+    return rng.randint(0, n_out, batch_size).astype(np.int32)
+
+
+def tags(lens, seq_len, n_tags, rng=np.random):
+    """
+    One tag per token [batch_size, seq_len], 0 past each length
+    """
+    Y = rng.randint(0, n_tags, [len(lens), seq_len])
+    Y[np.arange(seq_len)[np.newaxis, :] >= np.asarray(lens)[:, np.newaxis]] = 0
+    return Y.astype(np.int32)
+
+
+def audio_features(batch_size, n_frames, n_features=13, rng=np.random):
+    """
+    MFCC-like frames [batch_size, n_frames, n_features], zero past each length, and the lengths
+    """
+    lens = rng.randint(n_frames // 2, n_frames + 1, batch_size)
+    X = rng.randn(batch_size, n_frames, n_features).astype(np.float32)
+    X[np.arange(n_frames)[np.newaxis, :] >= lens[:, np.newaxis]] = 0.
+    return X, lens.astype(np.int32)
+
+
+def ctc_targets(batch_size, target_len, n_classes, rng=np.random):
+    """
+    (indices, values, dense_shape) for tf.sparse_placeholder, labels in [0, n_classes - 1) as the blank is last
+    """
+    lens = rng.randint(1, target_len + 1, batch_size)
+    indices = np.array([(i, t) for i, n in enumerate(lens) for t in range(n)], np.int64)
+    values = rng.randint(0, n_classes - 1, len(indices)).astype(np.int32)
+    return indices, values, np.array([batch_size, lens.max()], np.int64)
+
+
+def images(batch_size, height, width, channels=3, channels_first=True, rng=np.random):
+    shape = [batch_size, channels, height, width] if channels_first else [batch_size, height, width, channels]
+    return rng.rand(*shape).astype(np.float32)
+
+
+def word2idx(vocab_size, symbols=('<PAD>', '<UNK>', '<GO>', '<EOS>')):
+    """
+    Vocabulary starting with the special symbols the seq2seq models look up
+    """
+    return dict([(w, i) for i, w in enumerate(symbols)] +
+                [('w%d' % i, i) for i in range(len(symbols), vocab_size)])
@@ -1,6 +1,9 @@
+import io
 import re
 import sys
 import jieba
+import torch
+import numpy as np
 
 
 def load_data():
@@ -65,3 +68,115 @@ def load_data():
             build_y(chars, y_test)
     
     return x_train, y_train, x_test, y_test, len(char2idx), char2idx, idx2char
+
+
+def load_test_sentences(path='temp/icwb2-data/testing/pku_test.utf8'):
+    with io.open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def save_vocab(char2idx, path):
+    # one token per line, line number == index
+    idx2char = sorted(char2idx, key=char2idx.get)
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(u'\n'.join(idx2char))
+
+
+def load_vocab(path):
+    with io.open(path, encoding='utf-8') as f:
+        return {c: i for i, c in enumerate(f.read().split(u'\n'))}
+
+
+class Segmenter:
+    def __init__(self, model, char2idx, ckpt_path=None, batch_size=256):
+        """
+        Parameters:
+        -----------
+        model: object
+            A BMES tagger, rnn_seq_clf.RNNTextClassifier
+        char2idx: dict or str
+            Char vocab, or the path of a file written by save_vocab
+        ckpt_path: str
+            If given, the state_dict saved at this path is loaded into the model
+        batch_size: int
+            Number of sentences per forward pass
+        """
+        self.model = model
+        self.batch_size = batch_size
+        if ckpt_path is not None:
+            self.model.load_state_dict(torch.load(ckpt_path))
+        if not isinstance(char2idx, dict):
+            char2idx = load_vocab(char2idx)
+        self.build_lookup_table(char2idx)
+    # end constructor
+
+
+    def build_lookup_table(self, char2idx):
+        # code point -> char index, the last slot catches everything out of vocab
+        unk_idx = char2idx.get('_unknown', len(char2idx))
+        chars = [c for c in char2idx if len(c) == 1]
+        codes = np.array([ord(c) for c in chars], np.int64)
+        self.lookup_table = np.full(codes.max() + 2, unk_idx, np.int64)
+        self.lookup_table[codes] = [char2idx[c] for c in chars]
+    # end method build_lookup_table
+
+
+    def to_ids(self, text):
+        codes = np.frombuffer(text.encode('utf-32-le'), np.uint32)
+        return self.lookup_table[np.minimum(codes, len(self.lookup_table) - 1)]
+    # end method to_ids
+
+
+    def tag(self, X):
+        # the lstm is unidirectional, so right padding never leaks into real positions
+        self.model.eval()
+        with torch.no_grad():
+            logits, _ = self.model.forward(torch.from_numpy(X))
+        return logits.view(X.shape[0], X.shape[1], -1).argmax(-1).numpy()
+    # end method tag
+
+
+    def segment(self, texts):
+        """
+        Parameters:
+        -----------
+        texts: list of str
+            Raw sentences
+        Returns:
+        -----------
+        list of word lists, one per sentence
+        """
+        results = [[] for _ in texts]
+        # sentences are never trained with whitespace inside, so it is a hard word boundary
+        owners, pieces = [], []
+        for i, text in enumerate(texts):
+            for piece in text.split():
+                owners.append(i)
+                pieces.append(piece)
+        if len(pieces) == 0:
+            return results
+        lens = np.array([len(p) for p in pieces])
+        offsets = np.concatenate([[0], np.cumsum(lens)])
+        ids = self.to_ids(u''.join(pieces))
+
+        order = np.argsort(lens, kind='mergesort') # similar lengths share a batch -> little padding
+        tags = [None] * len(pieces)
+        for i in range(0, len(order), self.batch_size):
+            batch_idx = order[i : i+self.batch_size]
+            X = np.zeros([len(batch_idx), lens[batch_idx].max()], np.int64)
+            for row, k in enumerate(batch_idx):
+                X[row, :lens[k]] = ids[offsets[k] : offsets[k+1]]
+            batch_tags = self.tag(X)
+            for row, k in enumerate(batch_idx):
+                tags[k] = batch_tags[row, :lens[k]]
+
+        for owner, piece, tag in zip(owners, pieces, tags):
+            # a word ends at E (2) or S (3), and always at the end of the piece
+            ends = np.flatnonzero(tag >= 2) + 1
+            if len(ends) == 0 or ends[-1] != len(piece):
+                ends = np.append(ends, len(piece))
+            starts = np.concatenate([[0], ends[:-1]])
+            results[owner].extend(piece[s:e] for s, e in zip(starts, ends))
+        return results
+    # end method segment
+# end class
@@ -144,3 +144,26 @@ def nll(log_prob, label):
     mask = one_hot(log_prob.size(), label)
     mask = cast(mask, _type)
     return -1 * (log_prob * mask).sum(1)
+
+
+def sequence_nll(logits, target, mask):
+    """ Masked sequence cross-entropy. Picks the target log-probability of each position with `gather`,
+        so no `(N*T, V)` one-hot mask is built as in `nll`.
+
+        ```
+        import torch
+        from torch.autograd import Variable
+        import torch_extras
+        setattr(torch, 'sequence_nll', torch_extras.sequence_nll)
+
+        logits = Variable(torch.randn(2, 3, 5))           # (N, T, V), or (N*T, V)
+        target = Variable(torch.LongTensor([[1, 2, 0], [4, 0, 0]]))
+        mask = Variable(torch.FloatTensor([[1, 1, 1], [1, 0, 0]]))
+        output = torch.sequence_nll(logits, target, mask)
+        output.size()
+        # (2,)  summed over the unmasked positions of each sequence
+        ```
+    """
+    log_prob = torch.nn.functional.log_softmax(logits.view(-1, logits.size(-1)), 1)
+    losses = -log_prob.gather(1, target.contiguous().view(-1, 1)).view(target.size())
+    return (losses * mask.float()).sum(1)
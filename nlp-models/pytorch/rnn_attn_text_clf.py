@@ -2,6 +2,8 @@ import torch
 import numpy as np
 import math
 from sklearn.utils import shuffle
+from step_profiler import profiled_step
+from train_metrics import ThroughputMeter
 
 
 class RNNTextClassifier(torch.nn.Module):
@@ -49,7 +51,8 @@ class RNNTextClassifier(torch.nn.Module):
     # end method forward
 
 
-    def fit(self, X, y, n_epoch=10, batch_size=32, en_shuffle=True):
+    def fit(self, X, y, n_epoch=10, batch_size=32, en_shuffle=True, profiler=None, callbacks=None):
+        meter = ThroughputMeter(callbacks)
         global_step = 0
         n_batch = int(len(X) / batch_size)
         total_steps = int(n_epoch * n_batch)
@@ -63,13 +66,16 @@ class RNNTextClassifier(torch.nn.Module):
                 inputs = torch.autograd.Variable(torch.from_numpy(X_batch.astype(np.int64)))
                 labels = torch.autograd.Variable(torch.from_numpy(y_batch.astype(np.int64)))
                 
-                preds = self.forward(inputs, len(X_batch))
-
-                loss = self.criterion(preds, labels)                   # cross entropy loss
-                self.optimizer, lr = self.adjust_lr(self.optimizer, global_step, total_steps)
-                self.optimizer.zero_grad()                             # clear gradients for this training step
-                loss.backward()                                        # backpropagation, compute gradients
-                self.optimizer.step()                                  # apply gradients
+                meter.start()
+                with profiled_step(profiler):
+                    preds = self.forward(inputs, len(X_batch))
+
+                    loss = self.criterion(preds, labels)                   # cross entropy loss
+                    self.optimizer, lr = self.adjust_lr(self.optimizer, global_step, total_steps)
+                    self.optimizer.zero_grad()                             # clear gradients for this training step
+                    loss.backward()                                        # backpropagation, compute gradients
+                    self.optimizer.step()                                  # apply gradients
+                meter.stop(X_batch, lr)
                 global_step += 1
 
                 preds = torch.max(preds,1)[1].data.numpy().squeeze()
@@ -1,6 +1,8 @@
 import torch
 import numpy as np
 import math
+from step_profiler import profiled_step
+from train_metrics import ThroughputMeter
 
 
 class RNNTextClassifier(torch.nn.Module):
@@ -39,7 +41,8 @@ class RNNTextClassifier(torch.nn.Module):
     # end method forward
 
 
-    def fit(self, X, Y, n_epoch=10, batch_size=128, en_shuffle=True):
+    def fit(self, X, Y, n_epoch=10, batch_size=128, en_shuffle=True, profiler=None, callbacks=None):
+        meter = ThroughputMeter(callbacks, pad_int=None)
         global_step = 0
         n_batch = len(X) / batch_size
         total_steps = int(n_epoch * n_batch)
@@ -56,17 +59,20 @@ class RNNTextClassifier(torch.nn.Module):
                 inputs = torch.autograd.Variable(torch.from_numpy(X_batch.astype(np.int64)))
                 labels = torch.autograd.Variable(torch.from_numpy(y_batch.astype(np.int64)))
                 
-                if (self.stateful) and (len(X_batch) == batch_size):
-                    preds, state = self.forward(inputs, state)
-                    state = (torch.autograd.Variable(state[0].data), torch.autograd.Variable(state[1].data))
-                else:
-                    preds, _ = self.forward(inputs)
-
-                loss = self.criterion(preds, labels)                   # cross entropy loss
-                self.optimizer, lr = self.adjust_lr(self.optimizer, global_step, total_steps)
-                self.optimizer.zero_grad()                             # clear gradients for this training step
-                loss.backward()                                        # backpropagation, compute gradients
-                self.optimizer.step()                                  # apply gradients
+                meter.start()
+                with profiled_step(profiler):
+                    if (self.stateful) and (len(X_batch) == batch_size):
+                        preds, state = self.forward(inputs, state)
+                        state = (torch.autograd.Variable(state[0].data), torch.autograd.Variable(state[1].data))
+                    else:
+                        preds, _ = self.forward(inputs)
+
+                    loss = self.criterion(preds, labels)                   # cross entropy loss
+                    self.optimizer, lr = self.adjust_lr(self.optimizer, global_step, total_steps)
+                    self.optimizer.zero_grad()                             # clear gradients for this training step
+                    loss.backward()                                        # backpropagation, compute gradients
+                    self.optimizer.step()                                  # apply gradients
+                meter.stop(X_batch, lr)
                 global_step += 1
 
                 preds = torch.max(preds, 1)[1].data.numpy().squeeze()
@@ -3,6 +3,8 @@ import torch
 import numpy as np
 import math
 from sklearn.utils import shuffle
+from step_profiler import profiled_step
+from train_metrics import ThroughputMeter
 
 
 class RNNTextClassifier(torch.nn.Module):
@@ -44,7 +46,8 @@ class RNNTextClassifier(torch.nn.Module):
     # end method forward
 
 
-    def fit(self, X, y, n_epoch=10, batch_size=32, en_shuffle=False):
+    def fit(self, X, y, n_epoch=10, batch_size=32, en_shuffle=False, profiler=None, callbacks=None):
+        meter = ThroughputMeter(callbacks)
         X, y, X_lens = self.sort_pad(X, y)
         global_step = 0
         n_batch = int(len(X) / batch_size)
@@ -61,18 +64,21 @@ class RNNTextClassifier(torch.nn.Module):
                 inputs = torch.autograd.Variable(torch.from_numpy(X_batch.astype(np.int64)))
                 labels = torch.autograd.Variable(torch.from_numpy(y_batch.astype(np.int64)))
                 
-                if (self.stateful) and (len(X_batch) == batch_size):
-                    preds, state = self.forward(inputs, X_lens_batch, state)
-                    state = (torch.autograd.Variable(state[0].data), torch.autograd.Variable(state[1].data))
-                else:
-                    preds, _ = self.forward(inputs, X_lens_batch)
-
-                loss = self.criterion(preds, labels)                   # cross entropy loss
-                self.optimizer, lr = self.adjust_lr(self.optimizer, global_step, total_steps)
-                self.optimizer.zero_grad()                             # clear gradients for this training step
-                loss.backward()                                        # backpropagation, compute gradients
-                torch.nn.utils.clip_grad_norm(self.parameters(), self.grad_clip)
-                self.optimizer.step()                                  # apply gradients
+                meter.start()
+                with profiled_step(profiler):
+                    if (self.stateful) and (len(X_batch) == batch_size):
+                        preds, state = self.forward(inputs, X_lens_batch, state)
+                        state = (torch.autograd.Variable(state[0].data), torch.autograd.Variable(state[1].data))
+                    else:
+                        preds, _ = self.forward(inputs, X_lens_batch)
+
+                    loss = self.criterion(preds, labels)                   # cross entropy loss
+                    self.optimizer, lr = self.adjust_lr(self.optimizer, global_step, total_steps)
+                    self.optimizer.zero_grad()                             # clear gradients for this training step
+                    loss.backward()                                        # backpropagation, compute gradients
+                    torch.nn.utils.clip_grad_norm(self.parameters(), self.grad_clip)
+                    self.optimizer.step()                                  # apply gradients
+                meter.stop(X_batch, lr)
                 global_step += 1
 
                 preds = torch.max(preds,1)[1].data.numpy().squeeze()
@@ -2,6 +2,8 @@ import torch
 import numpy as np
 import math
 from sklearn.utils import shuffle
+from step_profiler import profiled_step
+from train_metrics import ThroughputMeter
 
 
 class RNNTextGen(torch.nn.Module):
@@ -34,7 +36,8 @@ class RNNTextGen(torch.nn.Module):
     # end method forward
 
 
-    def fit(self, start_word, n_gen=500, text_iter_step=1, n_epoch=1, batch_size=128):
+    def fit(self, start_word, n_gen=500, text_iter_step=1, n_epoch=1, batch_size=128, profiler=None, callbacks=None):
+        meter = ThroughputMeter(callbacks, pad_int=None)
         global_step = 0
         n_batch = (len(self.indexed) - self.seq_len*batch_size - 1) // text_iter_step
         total_steps = n_epoch * n_batch
@@ -45,16 +48,19 @@ class RNNTextGen(torch.nn.Module):
                 inputs = torch.autograd.Variable(torch.from_numpy(X_batch.astype(np.int64)))
                 labels = torch.autograd.Variable(torch.from_numpy(Y_batch.astype(np.int64)))
                 
-                if (self.stateful) and (len(X_batch) == batch_size):
-                    preds, state = self.forward(inputs, state)
-                    state = (torch.autograd.Variable(state[0].data), torch.autograd.Variable(state[1].data))
-                else:
-                    preds, _ = self.forward(inputs)
-
-                loss = self.criterion(preds.view(-1, self.vocab_size), labels.view(-1))
-                self.optimizer.zero_grad()                             # clear gradients for this training step
-                loss.backward()                                        # backpropagation, compute gradients
-                self.optimizer.step()                                  # apply gradients
+                meter.start()
+                with profiled_step(profiler):
+                    if (self.stateful) and (len(X_batch) == batch_size):
+                        preds, state = self.forward(inputs, state)
+                        state = (torch.autograd.Variable(state[0].data), torch.autograd.Variable(state[1].data))
+                    else:
+                        preds, _ = self.forward(inputs)
+
+                    loss = self.criterion(preds.view(-1, self.vocab_size), labels.view(-1))
+                    self.optimizer.zero_grad()                             # clear gradients for this training step
+                    loss.backward()                                        # backpropagation, compute gradients
+                    self.optimizer.step()                                  # apply gradients
+                meter.stop(X_batch)
                 global_step += 1
 
                 if local_step % 10 == 0:
@@ -62,6 +68,9 @@ class RNNTextGen(torch.nn.Module):
                            %(epoch+1, n_epoch, local_step, n_batch, loss.data[0]))
                 if local_step % 100 == 0:
                     print(self.infer(start_word, n_gen)+'\n')
+                    meter.pause()
+                    if profiler is not None:
+                        profiler.pause()
     # end method fit
 
 
@@ -0,0 +1,54 @@
+from __future__ import print_function
+import time
+import torch
+from seq2seq_attn import Encoder, Decoder
+
+
+BATCH_SIZE = 128
+RNN_SIZE = 50
+N_LAYERS = 2
+VOCAB_SIZE = 30
+N_STEPS = 50
+
+
+def loop_attention(decoder, hidden, encoder_output):
+    # the per-position projection the decoder used before, kept here as the baseline
+    weights = []
+    for i in range(encoder_output.size(1)):
+        m = decoder.proj_y(encoder_output[:, i, :]) + decoder.proj_h(hidden[0][-1])
+        weights.append(decoder.proj_m(torch.tanh(m)))
+    return torch.stack(weights).transpose(0, 1).squeeze(2)
+
+
+def vectorized_attention(decoder, hidden, memory):
+    return decoder.proj_m(torch.tanh(memory + decoder.proj_h(hidden[0][-1]).unsqueeze(1))).squeeze(2)
+
+
+def steps_per_sec(fn):
+    fn() # warm up
+    t0 = time.time()
+    for _ in range(N_STEPS):
+        fn()
+    return N_STEPS / (time.time() - t0)
+
+
+def main():
+    encoder = Encoder(VOCAB_SIZE, RNN_SIZE, RNN_SIZE, N_LAYERS)
+    decoder = Decoder(VOCAB_SIZE, RNN_SIZE, RNN_SIZE, N_LAYERS)
+    for src_len in [10, 50, 200]:
+        source = torch.randint(0, VOCAB_SIZE, (BATCH_SIZE, src_len)).long()
+        X_lens = [src_len] * BATCH_SIZE
+        decoder_input = torch.randint(0, VOCAB_SIZE, (BATCH_SIZE, 1)).long()
+        with torch.no_grad():
+            encoder_output, hidden = encoder(source, encoder.init_hidden(BATCH_SIZE), X_lens)
+            memory = decoder.project_memory(encoder_output)
+            loop = steps_per_sec(lambda: loop_attention(decoder, hidden, encoder_output))
+            vectorized = steps_per_sec(lambda: vectorized_attention(decoder, hidden, memory))
+            step = steps_per_sec(lambda: decoder(decoder_input, hidden, encoder_output, memory))
+        print('src_len %3d | attention steps/sec: loop %.1f, vectorized %.1f | full decoder steps/sec: %.1f'
+              % (src_len, loop, vectorized, step))
+# end function main
+
+
+if __name__ == '__main__':
+    main()
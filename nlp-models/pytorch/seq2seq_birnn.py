@@ -2,7 +2,9 @@ from __future__ import print_function
 from __future__ import division
 import numpy as np
 import torch
-from extras import nll
+from extras import sequence_nll
+from step_profiler import profiled_step
+from train_metrics import ThroughputMeter
 
 
 class Encoder(torch.nn.Module):
@@ -59,12 +61,30 @@ class Decoder(torch.nn.Module):
     # end method
 
 
-    def forward(self, inputs, hidden):
+    def forward(self, inputs, hidden, lens=None):
+        """
+        lens: lengths of the rows of `inputs`, if given the LSTM runs on a packed sequence and skips padding
+        """
         embedded = self.embedding(inputs)
-        output, hidden = self.lstm(embedded, hidden)
+        if lens is None:
+            output, hidden = self.lstm(embedded, hidden)
+        else:
+            output, hidden = self.packed_lstm(embedded, hidden, lens)
         output = self.out(output.contiguous().view(-1, self.hidden_size))
         return output, hidden
     # end method
+
+
+    def packed_lstm(self, embedded, hidden, lens):
+        # target rows follow the source order, so sort them for packing and restore the order after
+        lens, order = torch.LongTensor(list(lens)).sort(0, descending=True)
+        _, unsort = order.sort(0)
+        packed = torch.nn.utils.rnn.pack_padded_sequence(embedded.index_select(0, order), lens.tolist(),
+                                                         batch_first=True)
+        rnn_out, hidden = self.lstm(packed, tuple(h.index_select(1, order) for h in hidden))
+        output, _ = torch.nn.utils.rnn.pad_packed_sequence(rnn_out, batch_first=True)
+        return output.index_select(0, unsort), tuple(h.index_select(1, unsort) for h in hidden)
+    # end method
 # end class
 
 
@@ -93,21 +113,20 @@ class Seq2Seq:
     # end method
 
 
-    def train(self, source, target, X_lens, Y_masks):
+    def train(self, source, target, X_lens, Y_masks, teacher_forcing=1.0):
         self.encoder_optimizer.zero_grad()
         self.decoder_optimizer.zero_grad()
 
-        encoder_hidden = self.encoder.init_hidden(source.size(0))
-        encoder_output, encoder_hidden = self.encoder(source, encoder_hidden, X_lens)
-        
-        decoder_hidden = encoder_hidden
-
+        decoder_hidden, memory = self.encode(source, X_lens)
         decoder_input = self.process_decoder_input(target)
-        decoder_output, decoder_hidden = self.decoder(decoder_input, decoder_hidden)
-
-        losses = nll(torch.nn.functional.log_softmax(decoder_output), target.view(-1, 1))
-	Y_masks = torch.autograd.Variable(torch.FloatTensor(Y_masks)).view(-1)
-	loss = torch.mul(losses, Y_masks).sum() / source.size(0)
+        if teacher_forcing < 1.0:
+            decoder_output = self.decode_sampled(decoder_input, decoder_hidden, memory, teacher_forcing)
+        else:
+            # fully teacher-forced, the whole shifted target goes through the decoder in one call
+            decoder_output, _ = self.decoder(decoder_input, decoder_hidden, np.sum(Y_masks, 1))
+
+        Y_masks = torch.autograd.Variable(torch.FloatTensor(Y_masks))
+        loss = sequence_nll(decoder_output, target, Y_masks).sum() / source.size(0)
         loss.backward()
         torch.nn.utils.clip_grad_norm(self.encoder.parameters(), self.max_grad_norm)
         torch.nn.utils.clip_grad_norm(self.decoder.parameters(), self.max_grad_norm)
@@ -118,38 +137,157 @@ class Seq2Seq:
     # end method
 
 
+    def encode(self, source, X_lens):
+        encoder_hidden = self.encoder.init_hidden(source.size(0))
+        _, encoder_hidden = self.encoder(source, encoder_hidden, X_lens)
+        return encoder_hidden, ()
+    # end method
+
+
+    def decode_step(self, decoder_input, decoder_hidden, memory):
+        return self.decoder(decoder_input, decoder_hidden)
+    # end method
+
+
+    def decode_sampled(self, decoder_input, decoder_hidden, memory, teacher_forcing):
+        """
+        Step-wise decoding for scheduled sampling, at each step a row is fed its ground truth token
+        with probability `teacher_forcing` and its own previous prediction otherwise
+        """
+        decoder_output = []
+        step_input = decoder_input[:, :1]
+        for i in range(decoder_input.size(1)):
+            decoder_o, decoder_hidden = self.decode_step(step_input, decoder_hidden, memory)
+            decoder_output.append(decoder_o.unsqueeze(1))
+            if i + 1 < decoder_input.size(1):
+                step_input = decoder_input[:, i+1].unsqueeze(1)
+                if teacher_forcing < 1.0:
+                    sampled = (torch.rand(step_input.size(0)) >= teacher_forcing).unsqueeze(1)
+                    step_input = torch.where(sampled, decoder_o.max(1)[1].unsqueeze(1).detach(), step_input)
+        return torch.cat(decoder_output, 1).view(-1, len(self.Y_word2idx))
+    # end method
+
+
     def predict(self, source, maxlen=None):
-        if maxlen is None:
-            maxlen = 2 * source.size(1)
+        return self.predict_batch([source.data[0].tolist()], maxlen)[0]
+    # end method
+
+
+    def prepare_batch(self, sequences):
+        # the encoder packs its input, so rows go in by decreasing length
+        order = np.argsort([-len(seq) for seq in sequences], kind='mergesort')
+        padded, X_lens, _ = self.pad_sentence_batch([list(sequences[i]) for i in order], self._x_pad)
+        source = torch.autograd.Variable(torch.from_numpy(np.array(padded, np.int64)))
+        return source, X_lens, order
+    # end method
+
+
+    def row_maxlen(self, X_lens, maxlen=None):
+        # without a maxlen each row stops at twice its own length, the same output as decoding it alone
+        return torch.LongTensor([2 * x_len if maxlen is None else maxlen for x_len in X_lens])
+    # end method
+
+
+    def strip(self, out_indices, order):
+        # cut each row at its first EOS, then restore the input order
+        results = [None] * len(order)
+        for i, row in zip(order, out_indices):
+            is_eos = (row == self._y_eos) | (row == self._y_pad)
+            results[i] = row[:is_eos.argmax() if is_eos.any() else len(row)].tolist()
+        return results
+    # end method
+
+
+    def predict_batch(self, sequences, maxlen=None):
+        """
+        Greedy decoding of a whole padded batch, rows that already emitted EOS keep emitting PAD
+        Returns id lists in the order of `sequences`, EOS removed
+        """
+        source, X_lens, order = self.prepare_batch(sequences)
+        row_maxlen = self.row_maxlen(X_lens, maxlen)
+        batch_size = source.size(0)
+        with torch.no_grad():
+            decoder_hidden, memory = self.encode(source, X_lens)
+            decoder_input = (torch.zeros(batch_size, 1) + self._y_go).long()
+            finished = torch.zeros(batch_size) > 0
+            output_indices = []
+            for i in range(int(row_maxlen.max())):
+                decoder_output, decoder_hidden = self.decode_step(decoder_input, decoder_hidden, memory)
+                topi = decoder_output.max(1)[1].masked_fill(finished, self._y_pad)
+                output_indices.append(topi)
+                finished = finished | (topi == self._y_eos) | (row_maxlen <= i + 1)
+                if finished.all():
+                    break
+                decoder_input = topi.unsqueeze(1)
+        return self.strip(torch.stack(output_indices, 1).numpy(), order)
+    # end method
 
-        encoder_hidden = self.encoder.init_hidden(1)
-        encoder_output, encoder_hidden = self.encoder(source, encoder_hidden, [source.size(1)])
-        
-        decoder_hidden = encoder_hidden        
 
-        decoder_input = torch.autograd.Variable(torch.LongTensor([[self._y_go]]))
-        output_indices = []
-        for i in range(maxlen):
-            decoder_output, decoder_hidden = self.decoder(decoder_input, decoder_hidden)
-            decoder_output = torch.nn.functional.log_softmax(decoder_output)
-            topv, topi = decoder_output.data.topk(1)
-            topi = topi[0][0]
-            output_indices.append(topi)
-            decoder_input = torch.autograd.Variable(torch.LongTensor([[topi]]))
-            if topi == self._y_eos:
-                break
-        return output_indices
+    def beam_search(self, sequences, beam_width=5, maxlen=None):
+        """
+        Batched beam search, every sentence keeps beam_width rows. The encoder runs once per sentence,
+        its outputs and states are shared by the beams through index_select.
+        Returns the best id list for each sequence, EOS removed
+        """
+        source, X_lens, order = self.prepare_batch(sequences)
+        row_maxlen = self.row_maxlen(X_lens, maxlen)
+        batch_size, vocab_size = source.size(0), len(self.Y_word2idx)
+        with torch.no_grad():
+            decoder_hidden, memory = self.encode(source, X_lens)
+            beams = torch.arange(batch_size).long().unsqueeze(1).repeat(1, beam_width).view(-1)
+            decoder_hidden = tuple(h.index_select(1, beams) for h in decoder_hidden)
+            memory = tuple(m.index_select(0, beams) for m in memory)
+            beam_maxlen = row_maxlen.index_select(0, beams)
+
+            scores = torch.zeros(batch_size, beam_width)
+            scores[:, 1:] = -float('inf') # all beams start identical, only expand the first one
+            decoder_input = (torch.zeros(batch_size * beam_width, 1) + self._y_go).long()
+            finished = torch.zeros(batch_size * beam_width) > 0
+            offsets = (torch.arange(batch_size).long() * beam_width).unsqueeze(1)
+            tokens, parents = [], []
+            for i in range(int(row_maxlen.max())):
+                decoder_output, decoder_hidden = self.decode_step(decoder_input, decoder_hidden, memory)
+                log_probs = torch.nn.functional.log_softmax(decoder_output, 1)
+                # a finished beam can only be extended by PAD, at no cost
+                log_probs = log_probs.masked_fill(finished.unsqueeze(1), -float('inf'))
+                log_probs[:, self._y_pad] = log_probs[:, self._y_pad].masked_fill(finished, 0.0)
+
+                candidates = (scores.view(-1, 1) + log_probs).view(batch_size, -1)
+                scores, flat = candidates.topk(beam_width, 1)
+                rows = (offsets + flat // vocab_size).view(-1)
+                topi = (flat % vocab_size).view(-1)
+                tokens.append(topi.numpy())
+                parents.append(rows.numpy())
+
+                decoder_hidden = tuple(h.index_select(1, rows) for h in decoder_hidden)
+                finished = finished.index_select(0, rows) | (topi == self._y_eos) | (beam_maxlen <= i + 1)
+                if finished.all():
+                    break
+                decoder_input = topi.unsqueeze(1)
+
+        # follow the back pointers of the best beam (topk is sorted, so beam 0) of each sentence
+        rows = np.arange(batch_size) * beam_width
+        output_indices = np.zeros([batch_size, len(tokens)], np.int64)
+        for t in reversed(range(len(tokens))):
+            output_indices[:, t] = tokens[t][rows]
+            rows = parents[t][rows]
+        return self.strip(output_indices, order)
     # end method
 
 
-    def fit(self, X_train, Y_train, n_epoch=60, display_step=100, batch_size=128):
+    def fit(self, X_train, Y_train, n_epoch=60, display_step=100, batch_size=128, teacher_forcing=1.0,
+            profiler=None, callbacks=None):
+        meter = ThroughputMeter(callbacks, pad_int=self._x_pad)
         X_train, Y_train = self.sort(X_train, Y_train)
         for epoch in range(1, n_epoch+1):
             for local_step, (X_train_batch, Y_train_batch, X_train_batch_lens, Y_train_batch_masks) in enumerate(
                 self.next_batch(X_train, Y_train, batch_size)):
                 source = torch.autograd.Variable(torch.from_numpy(X_train_batch.astype(np.int64)))
                 target = torch.autograd.Variable(torch.from_numpy(Y_train_batch.astype(np.int64)))
-                loss = self.train(source, target, X_train_batch_lens, Y_train_batch_masks)
+                meter.start()
+                with profiled_step(profiler):
+                    loss = self.train(source, target, X_train_batch_lens, Y_train_batch_masks, teacher_forcing)
+                meter.stop(X_train_batch)
                 if local_step % display_step == 0:
                     print("Epoch %d/%d | Batch %d/%d | train_loss: %.3f |" % 
                           (epoch, n_epoch, local_step, len(X_train)//batch_size, loss))       
@@ -158,8 +296,7 @@ class Seq2Seq:
 
     def infer(self, input_word, X_idx2word, Y_idx2word):        
         input_indices = [self.X_word2idx.get(char, self._x_unk) for char in input_word]
-        source = torch.autograd.Variable(torch.from_numpy(np.atleast_2d(input_indices).astype(np.int64)))
-        out_indices = self.predict(source)
+        out_indices = self.predict_batch([input_indices])[0]
         
         print('\nSource')
         print('Word: {}'.format([i for i in input_indices]))
@@ -174,7 +311,7 @@ class Seq2Seq:
     def pad_sentence_batch(self, sentence_batch, pad_int):
         padded_seqs = []
         seq_lens = []
-	masks = []
+        masks = []
         max_sentence_len = max([len(sentence) for sentence in sentence_batch])
         for sentence in sentence_batch:
             padded_seqs.append(sentence + [pad_int] * (max_sentence_len - len(sentence)))
@@ -217,7 +354,7 @@ class Seq2Seq:
 
     def process_decoder_input(self, target):
         target = target[:, :-1]
-	go = torch.autograd.Variable((torch.zeros(target.size(0), 1) + self._y_go).long())
+        go = torch.autograd.Variable((torch.zeros(target.size(0), 1) + self._y_go).long())
         decoder_input = torch.cat((go, target), 1)
         return decoder_input
     # end method
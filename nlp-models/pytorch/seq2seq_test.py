@@ -52,6 +52,12 @@ def main():
     model.infer('common', X_idx2char, Y_idx2char)
     model.infer('apple', X_idx2char, Y_idx2char)
     model.infer('zhedong', X_idx2char, Y_idx2char)
+
+    # a batch decodes each row as far as it would be decoded alone
+    words = ['common', 'apple', 'zhedong']
+    sequences = [[X_char2idx.get(char, X_char2idx['<UNK>']) for char in word] for word in words]
+    assert model.predict_batch(sequences) == [model.predict_batch([seq])[0] for seq in sequences]
+    assert model.beam_search(sequences) == [model.beam_search([seq])[0] for seq in sequences]
 # end function main
 
 
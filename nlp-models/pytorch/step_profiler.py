@@ -0,0 +1,120 @@
+"""
+Opt-in profiling of the fit loops, the counterpart of tensorflow/step_profiler.py
+
+    profiler = StepProfiler(trace_steps=[20], report_every=100)
+    model.fit(X_train, y_train, profiler=profiler)
+    print(profiler.summary())
+
+Every training step is split into
+    host_ms      time between two steps: batching, numpy -> tensor conversion, logging
+                 (a fit calls pause() after its validation, the step right after it is left out)
+    compute_ms   forward, backward and the optimizer update
+The trace_steps run under torch.autograd.profiler, which writes a Chrome trace (chrome://tracing) to trace_dir
+and prints the ops taking the most time
+"""
+from __future__ import print_function
+import os
+import time
+import contextlib
+import torch
+
+
+class StepProfiler:
+    def __init__(self, trace_steps=(), trace_dir='./temp/timeline', report_every=None, n_top_ops=15):
+        """
+        Parameters:
+        -----------
+        trace_steps: list of int
+            Steps (counted from 0 over the whole fit) run under the autograd profiler
+        trace_dir: str
+            Where the Chrome traces step_<n>.json are written
+        report_every: int
+            Print the host/compute split every this many steps, None to stay quiet
+        n_top_ops: int
+            Rows of the op table printed for a traced step
+        """
+        self.trace_steps = set(trace_steps)
+        self.trace_dir = trace_dir
+        self.report_every = report_every
+        self.n_top_ops = n_top_ops
+        self.n_steps = 0
+        self.n_timed = 0
+        self.host_ms = 0.
+        self.compute_ms = 0.
+        self.traces = []
+        self._last_end = None
+    # end constructor
+
+
+    @contextlib.contextmanager
+    def step(self):
+        start = time.time()
+        host_ms = None if self._last_end is None else 1000 * (start - self._last_end)
+        if self.n_steps in self.trace_steps:
+            with torch.autograd.profiler.profile() as prof:
+                yield
+            self.write_trace(prof, 1000 * (time.time() - start))
+        else:
+            yield
+            compute_ms = 1000 * (time.time() - start)
+            if host_ms is not None: # traced steps are slower, they stay out of the averages
+                self.n_timed += 1
+                self.host_ms += host_ms
+                self.compute_ms += compute_ms
+        self.n_steps += 1
+        if self.report_every is not None and self.n_steps % self.report_every == 0:
+            print(self.report())
+        self._last_end = time.time()
+    # end method step
+
+
+    def pause(self):
+        """
+        Call after work in between the training steps that is not part of them (validation, sampling),
+        the next step stays out of the averages instead of counting that work as host time
+        """
+        self._last_end = None
+    # end method pause
+
+
+    def write_trace(self, prof, compute_ms):
+        if not os.path.isdir(self.trace_dir):
+            os.makedirs(self.trace_dir)
+        path = os.path.join(self.trace_dir, 'step_%d.json' % self.n_steps)
+        prof.export_chrome_trace(path)
+        self.traces.append({'step': self.n_steps, 'path': path, 'compute_ms': compute_ms})
+        print("Step %d traced to %s | compute: %.1f ms" % (self.n_steps, path, compute_ms))
+        table = prof.key_averages().table(sort_by='cpu_time_total')
+        print('\n'.join(table.split('\n')[:self.n_top_ops + 3]))
+    # end method write_trace
+
+
+    def summary(self):
+        n = max(1, self.n_timed)
+        host_ms, compute_ms = self.host_ms / n, self.compute_ms / n
+        return {'steps': self.n_steps,
+                'host_ms': host_ms,
+                'compute_ms': compute_ms,
+                'host_fraction': host_ms / max(1e-9, host_ms + compute_ms),
+                'traces': self.traces}
+    # end method summary
+
+
+    def report(self):
+        summary = self.summary()
+        return "Profiler | step %d | host: %.2f ms | compute: %.2f ms | host share: %.1f%%" % (
+            summary['steps'], summary['host_ms'], summary['compute_ms'], 100 * summary['host_fraction'])
+    # end method report
+# end class
+
+
+@contextlib.contextmanager
+def _not_profiled():
+    yield
+
+
+def profiled_step(profiler):
+    """
+    Context of one training step in a fit loop, a no-op when profiler is None
+    """
+    return _not_profiled() if profiler is None else profiler.step()
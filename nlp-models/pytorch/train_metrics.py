@@ -0,0 +1,218 @@
+"""
+Throughput metrics of the fit loops, the counterpart of tensorflow/train_metrics.py
+
+    ring = RingBuffer(1000)
+    with JSONLSink('./temp/train.jsonl') as jsonl:
+        model.fit(X_train, y_train, callbacks=[ring, jsonl])
+    print(ring.mean('tokens_per_sec'))
+
+After every training step each callback gets a dict with the fields of FIELDS
+    step             steps counted from 0 over the whole fit
+    time             unix time at the end of the step
+    wall_ms          since the end of the previous step
+    data_wait_ms     the part of wall_ms spent before the step started: batching, feed conversion, logging
+                     (0 for the step right after a validation, the fit calls pause() once it is done)
+    compute_ms       the training step itself
+    examples         batch size
+    tokens           non-pad tokens of the batch (all of them when the model has no padding)
+    examples_per_sec examples / wall_ms
+    tokens_per_sec   tokens / wall_ms
+    lr               learning rate of the step, None when the model keeps a fixed one
+"""
+import csv
+import json
+import time
+import collections
+import numpy as np
+
+
+FIELDS = ['step', 'time', 'wall_ms', 'data_wait_ms', 'compute_ms', 'examples', 'tokens',
+          'examples_per_sec', 'tokens_per_sec', 'lr']
+
+
+class Callback:
+    def on_step(self, metrics):
+        pass
+    # end method on_step
+
+
+    def close(self):
+        pass
+    # end method close
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+# end class
+
+
+class RingBuffer(Callback):
+    def __init__(self, capacity=1000):
+        self.steps = collections.deque(maxlen=capacity)
+    # end constructor
+
+
+    def on_step(self, metrics):
+        self.steps.append(metrics)
+    # end method on_step
+
+
+    def last(self, n=1):
+        return list(self.steps)[-n:]
+    # end method last
+
+
+    def mean(self, field, n=None):
+        values = [m[field] for m in (self.steps if n is None else self.last(n)) if m[field] is not None]
+        return sum(values) / len(values) if len(values) > 0 else None
+    # end method mean
+# end class
+
+
+class CSVSink(Callback):
+    def __init__(self, path, flush_every=100):
+        """
+        Parameters:
+        -----------
+        path: str
+            The file is overwritten, with a header row of FIELDS
+        flush_every: int
+            Rows are buffered and written out every this many steps, and on close
+        """
+        self.f = open(path, 'w')
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(FIELDS)
+        self.flush_every = flush_every
+        self.n_rows = 0
+    # end constructor
+
+
+    def on_step(self, metrics):
+        self.writer.writerow(['' if metrics[k] is None else metrics[k] for k in FIELDS])
+        self.n_rows += 1
+        if self.n_rows % self.flush_every == 0:
+            self.f.flush()
+    # end method on_step
+
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+    # end method close
+# end class
+
+
+class JSONLSink(Callback):
+    def __init__(self, path, flush_every=100):
+        """
+        Parameters:
+        -----------
+        path: str
+            The file is overwritten, one JSON object per step
+        flush_every: int
+            Lines are buffered and written out every this many steps, and on close
+        """
+        self.f = open(path, 'w')
+        self.flush_every = flush_every
+        self.n_rows = 0
+    # end constructor
+
+
+    def on_step(self, metrics):
+        self.f.write(json.dumps(metrics) + '\n')
+        self.n_rows += 1
+        if self.n_rows % self.flush_every == 0:
+            self.f.flush()
+    # end method on_step
+
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+    # end method close
+# end class
+
+
+class ThroughputMeter:
+    def __init__(self, callbacks=None, pad_int=0):
+        """
+        Parameters:
+        -----------
+        callbacks: list of Callback
+            None or empty turns start() and stop() into no-ops
+        pad_int: int
+            Index of the padding token left out of the token count, None to count every position
+        """
+        self.callbacks = list(callbacks) if callbacks else []
+        self.pad_int = pad_int
+        self.step = 0
+        self._start = None
+        self._last_end = None
+    # end constructor
+
+
+    def start(self):
+        """
+        Call when the batch is ready, right before the training step
+        """
+        if self.callbacks:
+            self._start = time.time()
+    # end method start
+
+
+    def stop(self, tokens, lr=None):
+        """
+        Call right after the training step
+
+        Parameters:
+        -----------
+        tokens: array-like
+            The token indices fed to the step, batch first
+        lr: float
+            The learning rate of the step
+        """
+        if not self.callbacks:
+            return
+        end = time.time()
+        n_tokens = self.count_tokens(tokens)
+        data_wait = 0. if self._last_end is None else self._start - self._last_end
+        wall = max(1e-9, end - self._start + data_wait)
+        metrics = {'step': self.step,
+                   'time': end,
+                   'wall_ms': 1000 * wall,
+                   'data_wait_ms': 1000 * data_wait,
+                   'compute_ms': 1000 * (end - self._start),
+                   'examples': len(tokens),
+                   'tokens': n_tokens,
+                   'examples_per_sec': len(tokens) / wall,
+                   'tokens_per_sec': n_tokens / wall,
+                   'lr': None if lr is None else float(lr)}
+        for callback in self.callbacks:
+            callback.on_step(metrics)
+        self.step += 1
+        self._last_end = time.time()
+    # end method stop
+
+
+    def pause(self):
+        """
+        Call once a validation or sampling run between two training steps is done, the next step then
+        reports no data wait rather than the time of that run
+        """
+        self._last_end = None
+    # end method pause
+
+
+    def count_tokens(self, tokens):
+        if isinstance(tokens, np.ndarray):
+            return int(tokens.size if self.pad_int is None else np.count_nonzero(tokens != self.pad_int))
+        # padded lists as built by pad_sentence_batch, np.asarray on them would cost more than the count
+        if self.pad_int is None:
+            return sum(len(row) for row in tokens)
+        return sum(len(row) - row.count(self.pad_int) for row in tokens)
+    # end method count_tokens
+# end class
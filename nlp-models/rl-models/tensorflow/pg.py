@@ -1,15 +1,16 @@
 import tensorflow as tf
 import numpy as np
+from session_config import new_session
 
 
 class PolicyGradient:
-    def __init__(self, env, n_in, hidden_net, n_out, lr=0.01, sess=tf.Session()):
+    def __init__(self, env, n_in, hidden_net, n_out, lr=0.01, sess=None):
         self.env = env
         self.n_in = n_in
         self.hidden_net = hidden_net
         self.n_out = n_out
         self.lr = lr
-        self.sess = sess
+        self.sess = new_session() if sess is None else sess
         self.build_graph()
     # end constructor
 
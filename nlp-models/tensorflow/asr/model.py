@@ -1,12 +1,14 @@
 import tensorflow as tf
+from rnn_cells import gru_cell
 
 
 class Model:
-    def __init__(self, num_classes, rnn_size=50, num_features=13, clip_norm=5.0):
+    def __init__(self, num_classes, rnn_size=50, num_features=13, clip_norm=5.0, cell_backend='basic'):
         self.num_classes = num_classes
         self.rnn_size = rnn_size
         self.num_features = num_features
         self.clip_norm = clip_norm
+        self.cell_backend = cell_backend # 'basic' or 'block' GRU kernels, see rnn_cells.py
         self.build_graph()
         
     def build_graph(self):
@@ -38,7 +40,7 @@ class Model:
         self.train_op = tf.train.AdamOptimizer().apply_gradients(zip(clipped_grads, params))
 
     def rnn_cell(self):
-        return tf.nn.rnn_cell.GRUCell(self.rnn_size,
+        return gru_cell(self.rnn_size, self.cell_backend,
             kernel_initializer=tf.orthogonal_initializer())
 
     def train_batch(self, sess, inputs, seq_lens, sparse_targets):
@@ -2,6 +2,7 @@ from data_loader import DataLoader
 from model import Model
 
 import tensorflow as tf
+from session_config import new_session
 import numpy as np
 
 
@@ -12,7 +13,7 @@ def main():
     dl = DataLoader(batch_size=batch_size)
     model = Model(dl.num_classes)
 
-    sess = tf.Session()
+    sess = new_session()
     sess.run(tf.global_variables_initializer())
 
     n_batch = len(dl.inputs) // batch_size
@@ -0,0 +1,108 @@
+"""
+Evaluation on a background thread while the fit loop keeps training
+
+    evaluator = AsyncEvaluator(self.sess, self.build_replica, lambda replica: replica.evaluate(X_test, Y_test))
+    ...
+    evaluator.submit(global_step)          # snapshot of the weights, training goes on right away
+    for step, result in evaluator.poll():  # evaluations finished so far, with the step of their snapshot
+        ...
+    for step, result in evaluator.close(): # waits for the ones still running
+        ...
+
+The replica is the same model built in a graph and session of its own, so its evaluation never touches the
+training session. A snapshot is one sess.run fetching the trainable variables, loading them into the replica
+and the evaluation itself happen on the background thread. At most one snapshot waits behind the running
+evaluation, submit() blocks beyond that rather than piling up copies of the weights.
+Both sessions share the cores, see session_config.configure to split them
+"""
+import threading
+import tensorflow as tf
+from session_config import new_session
+try:
+    import queue
+except ImportError: # python 2
+    import Queue as queue
+
+
+class AsyncEvaluator:
+    def __init__(self, sess, build_replica, evaluate):
+        """
+        Parameters:
+        -----------
+        sess: object
+            tf.Session() the model is trained in
+        build_replica: function
+            sess -> model, builds the same architecture in the default graph with the given session
+        evaluate: function
+            replica -> result, run on the background thread once the replica holds a snapshot
+        """
+        self.sess = sess
+        self.evaluate = evaluate
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.replica = build_replica(new_session(self.graph))
+            self.replica_vars = tf.trainable_variables()
+        train_vars = {v.op.name: v for v in sess.graph.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES)}
+        missing = [v.op.name for v in self.replica_vars if v.op.name not in train_vars]
+        if len(missing) > 0:
+            raise ValueError("Variables of the replica not found in the trained graph: %s" % ', '.join(missing))
+        self.train_vars = [train_vars[v.op.name] for v in self.replica_vars]
+        self.pending = queue.Queue(maxsize=1)
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self.work)
+        self.thread.daemon = True
+        self.thread.start()
+    # end constructor
+
+
+    def submit(self, step):
+        """
+        Snapshots the current weights to be evaluated, step is reported along with the result
+        """
+        self.pending.put((step, self.sess.run(self.train_vars)))
+    # end method submit
+
+
+    def work(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            step, values = item
+            try:
+                for var, value in zip(self.replica_vars, values):
+                    var.load(value, self.replica.sess) # feeds the initializer, adds no op to the graph
+                result = self.evaluate(self.replica)
+            except Exception as e: # raised again by poll() on the training thread
+                result = e
+            self.results.put((step, result))
+    # end method work
+
+
+    def poll(self):
+        """
+        Returns the list of (step, result) finished since the last call
+        """
+        finished = []
+        while True:
+            try:
+                step, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(result, Exception):
+                raise result
+            finished.append((step, result))
+        return finished
+    # end method poll
+
+
+    def close(self):
+        """
+        Waits for the submitted evaluations and returns the list of (step, result) not polled yet
+        """
+        self.pending.put(None)
+        self.thread.join()
+        self.replica.sess.close()
+        return self.poll()
+    # end method close
+# end class
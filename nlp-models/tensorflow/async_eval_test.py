@@ -0,0 +1,23 @@
+from __future__ import print_function
+from rnn_text_clf import RNNTextClassifier
+import tensorflow as tf
+import time
+
+
+vocab_size = 20000
+batch_size = 32
+
+
+if __name__ == '__main__':
+    (X_train, y_train), (X_test, y_test) = tf.keras.datasets.imdb.load_data(num_words=vocab_size)
+    X_train, y_train = X_train[:5000], y_train[:5000]
+    X_test, y_test = X_test[:5000], y_test[:5000]
+
+    for async_eval in [False, True]:
+        tf.reset_default_graph()
+        clf = RNNTextClassifier(vocab_size, 2)
+        t0 = time.time()
+        log = clf.fit(X_train, y_train, n_epoch=2, batch_size=batch_size, val_data=(X_test, y_test),
+                      async_eval=async_eval)
+        print("async_eval=%s | fit: %.1f sec |" % (async_eval, time.time() - t0),
+              ' | '.join("step %d: test_acc %.4f" % (s, a) for s, a in zip(log['val_step'], log['val_acc'])))
@@ -0,0 +1,268 @@
+from __future__ import division
+import os
+import time
+import pickle
+import struct
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+try:
+    import fcntl
+except ImportError: # windows
+    fcntl = None
+    import msvcrt
+
+
+class ResponseCache:
+    def __init__(self, max_size=10000, ttl=None, pad_id=None, shared=None, namespace=None):
+        """
+        LRU cache for decoded responses, placed in front of an inference call
+
+        Parameters:
+        -----------
+        max_size: int
+            Max number of entries kept in this process
+        ttl: float
+            Seconds an entry stays valid, None means forever
+        pad_id: int
+            Padding id stripped from input ids before they are used as key
+        shared: object
+            Optional SharedMemoryBackend, consulted on a local miss so that several
+            worker processes reuse each other's results
+        namespace: str
+            Names the model in every key, so different models can share one backend.
+            The weights are told apart by the decode config, e.g. get_or_compute(..., checkpoint=path)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.pad_id = pad_id
+        self.shared = shared
+        self.namespace = namespace
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+    # end constructor
+
+
+    def make_key(self, input_ids, **decode_config):
+        ids = [int(i) for i in input_ids if i != self.pad_id]
+        return (self.namespace, tuple(ids), tuple(sorted(decode_config.items())))
+    # end method make_key
+
+
+    def get(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and not self._expired(entry):
+            self._entries[key] = entry # most recently used goes last
+            self.hits += 1
+            return entry[1]
+        if self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not None and not self._expired(entry):
+                self._store(key, entry)
+                self.shared_hits += 1
+                return entry[1]
+        self.misses += 1
+        return None
+    # end method get
+
+
+    def put(self, key, value):
+        entry = (time.time(), value)
+        self._store(key, entry)
+        if self.shared is not None:
+            self.shared.put(key, entry)
+    # end method put
+
+
+    def get_or_compute(self, inputs, compute_fn, **decode_config):
+        """
+        Parameters:
+        -----------
+        inputs: list
+            Input id lists
+        compute_fn: function
+            Called once with the list of inputs that missed, returns their results in order
+        Returns:
+        -----------
+        Results for all inputs, in order
+        """
+        keys = [self.make_key(x, **decode_config) for x in inputs]
+        found = {}
+        missed = OrderedDict() # each distinct key is computed once
+        for x, key in zip(inputs, keys):
+            if key in found or key in missed:
+                continue
+            value = self.get(key)
+            if value is None:
+                missed[key] = x
+            else:
+                found[key] = value
+        if len(missed) > 0:
+            computed = compute_fn(list(missed.values()))
+            for key, value in zip(missed, computed):
+                self.put(key, value)
+                found[key] = value
+        return [found[key] for key in keys]
+    # end method get_or_compute
+
+
+    def stats(self):
+        total = self.hits + self.shared_hits + self.misses
+        return {'size': len(self._entries), 'hits': self.hits, 'shared_hits': self.shared_hits,
+                'misses': self.misses, 'hit_rate': (self.hits + self.shared_hits) / max(1, total)}
+    # end method stats
+
+
+    def clear(self):
+        """
+        Drops the entries of this process. Entries in the shared backend are only kept apart from
+        the new weights by a checkpoint in the decode config, a counter of this process would not
+        tell the checkpoints of different processes apart
+        """
+        self._entries.clear()
+    # end method clear
+
+
+    def _store(self, key, entry):
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False) # least recently used
+    # end method _store
+
+
+    def _expired(self, entry):
+        return (self.ttl is not None) and (time.time() - entry[0] > self.ttl)
+    # end method _expired
+# end class
+
+
+class SharedMemoryBackend:
+    _created = set() # blocks created by this process, tracked as theirs
+    TABLE = struct.Struct('<QQ')  # n_slots, slot_size, at the start of the block
+    HEADER = struct.Struct('<QI') # per slot: write sequence number, payload length
+
+    def __init__(self, name, n_slots=4096, slot_size=1024, create=False):
+        """
+        Direct-mapped table in a named shared memory block (Python >= 3.8).
+        One process creates it with create=True, the others attach by name and pick up its shape.
+        A key hashes to one slot, a newer entry overwrites the older one. Each slot is
+        guarded by a sequence number, a reader that sees a write in progress treats it as a miss.
+        Writers lock the slot (a byte range of a lock file next to the block), a put that finds
+        the slot locked by another writer is dropped rather than waiting.
+        """
+        from multiprocessing import shared_memory
+        self.name = name
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                                  size=self.TABLE.size + n_slots*slot_size)
+            self.shm.buf[:] = bytes(self.shm.size)
+            self.TABLE.pack_into(self.shm.buf, 0, n_slots, slot_size)
+            SharedMemoryBackend._created.add(name)
+        else:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, track=False) # python >= 3.13
+            except TypeError:
+                self.shm = shared_memory.SharedMemory(name=name)
+                if os.name == 'posix' and name not in SharedMemoryBackend._created:
+                    # attaching registers the block with the resource tracker as well, which would
+                    # unlink it for every process when this one exits, only the creator owns it
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.n_slots, self.slot_size = self.TABLE.unpack_from(self.shm.buf, 0)
+        self.lock_path = os.path.join(tempfile.gettempdir(), name + '.lock')
+        self.lock_file = open(self.lock_path, 'a+b')
+        self.thread_lock = threading.Lock() # the file locks belong to the process, not to a thread
+    # end constructor
+
+
+    def _slot(self, key):
+        digest = hashlib.md5(pickle.dumps(key, 2)).digest()
+        return struct.unpack('<Q', digest[:8])[0] % self.n_slots
+    # end method _slot
+
+
+    def _offset(self, key):
+        return self.TABLE.size + self._slot(key) * self.slot_size
+    # end method _offset
+
+
+    def lock_slot(self, slot):
+        """
+        Returns False when another process holds the slot
+        """
+        try:
+            if fcntl is not None:
+                fcntl.lockf(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+            else:
+                self.lock_file.seek(slot)
+                msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except (IOError, OSError):
+            return False
+        return True
+    # end method lock_slot
+
+
+    def unlock_slot(self, slot):
+        if fcntl is not None:
+            fcntl.lockf(self.lock_file, fcntl.LOCK_UN, 1, slot)
+        else:
+            self.lock_file.seek(slot)
+            msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    # end method unlock_slot
+
+
+    def get(self, key):
+        offset = self._offset(key)
+        buf = self.shm.buf
+        seq, length = self.HEADER.unpack_from(buf, offset)
+        if seq % 2 == 1 or length == 0:
+            return None
+        start = offset + self.HEADER.size
+        payload = bytes(buf[start : start+length])
+        if self.HEADER.unpack_from(buf, offset)[0] != seq: # overwritten while reading
+            return None
+        try:
+            stored_key, entry = pickle.loads(payload)
+        except Exception:
+            return None
+        return entry if stored_key == key else None
+    # end method get
+
+
+    def put(self, key, entry):
+        payload = pickle.dumps((key, entry), 2)
+        if len(payload) > self.slot_size - self.HEADER.size:
+            return False # too large for a slot, stays process-local
+        slot = self._slot(key)
+        offset = self.TABLE.size + slot * self.slot_size
+        buf = self.shm.buf
+        with self.thread_lock:
+            if not self.lock_slot(slot): # another process is writing it
+                return False
+            try:
+                seq = self.HEADER.unpack_from(buf, offset)[0]
+                seq += 1 if seq % 2 == 0 else 2
+                self.HEADER.pack_into(buf, offset, seq, 0)
+                start = offset + self.HEADER.size
+                buf[start : start+len(payload)] = payload
+                self.HEADER.pack_into(buf, offset, seq + 1, len(payload))
+            finally:
+                self.unlock_slot(slot)
+        return True
+    # end method put
+
+
+    def close(self, unlink=False):
+        self.shm.close()
+        self.lock_file.close()
+        if unlink:
+            self.shm.unlink()
+            SharedMemoryBackend._created.discard(self.name)
+            if os.path.exists(self.lock_path):
+                os.remove(self.lock_path)
+    # end method close
+# end class
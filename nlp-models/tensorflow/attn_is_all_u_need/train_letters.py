@@ -1,7 +1,7 @@
 from model import tf_estimator_model_fn
 from config import args
 from data import DataLoader
-from utils import greedy_decode, prepare_params
+from utils import greedy_decode, make_predictor, prepare_params
 import json
 import numpy as np
 import tensorflow as tf
@@ -17,6 +17,7 @@ def main():
     
     tf_estimator = tf.estimator.Estimator(
         tf_estimator_model_fn, params=prepare_params(dl), model_dir=args.model_dir)
+    predictor = None
     
     for epoch in range(args.num_epochs):
         tf_estimator.train(tf.estimator.inputs.numpy_input_fn(
@@ -24,7 +25,9 @@ def main():
             batch_size = args.batch_size,
             num_epochs = None,
             shuffle = True), steps=1000)
-        greedy_decode(['apple', 'common', 'zhedong'], tf_estimator, dl)
+        if predictor is None: # the first checkpoint exists now, later ones are reloaded by the predictor
+            predictor = make_predictor(tf_estimator)
+        greedy_decode(['apple', 'common', 'zhedong'], predictor, dl)
 
 
 if __name__ == '__main__':
@@ -2,26 +2,55 @@ from config import args
 
 import tensorflow as tf
 import numpy as np
+from warm_predictor import WarmPredictor
 
 
-def greedy_decode(test_words, tf_estimator, dl):
-    test_indices = []
-    for test_word in test_words:
-        test_idx = [dl.source_word2idx[c] for c in test_word] + \
-                   [dl.source_word2idx['<pad>']] * (args.source_max_len - len(test_word))
-        test_indices.append(test_idx)
-    test_indices = np.atleast_2d(test_indices)
-    
-    zeros = np.zeros([len(test_words), args.target_max_len], np.int64)
+def greedy_decode(test_words, tf_estimator, dl, cache=None):
+    """
+    tf_estimator: tf.estimator.Estimator, or a WarmPredictor from make_predictor to skip
+                  rebuilding the graph and restoring the checkpoint on every call
+    cache: optional response_cache.ResponseCache, answers already decoded are served from it
+    """
+    test_indices = [[dl.source_word2idx[c] for c in test_word] for test_word in test_words]
+    decode_fn = lambda indices: decode_indices(indices, tf_estimator, dl)
+    if cache is None:
+        answers = decode_fn(test_indices)
+    else:
+        # the checkpoint is part of the key, answers of older weights are never served
+        if isinstance(tf_estimator, WarmPredictor):
+            checkpoint = tf_estimator.current_checkpoint()
+        else:
+            checkpoint = tf.train.latest_checkpoint(tf_estimator.model_dir)
+        answers = cache.get_or_compute(test_indices, decode_fn, checkpoint=checkpoint,
+                                       decoder='greedy', target_max_len=args.target_max_len)
+    for test_word, ans in zip(test_words, answers):
+        print(test_word, '->', ans)
+    return answers
+
+
+def decode_indices(test_indices, tf_estimator, dl):
+    test_indices = np.atleast_2d([idx + [dl.source_word2idx['<pad>']] * (args.source_max_len - len(idx))
+                                  for idx in test_indices])
+    zeros = np.zeros([len(test_indices), args.target_max_len], np.int64)
 
-    pred_ids = tf_estimator.predict(tf.estimator.inputs.numpy_input_fn(
-        x={'source':test_indices, 'target':zeros}, batch_size=len(test_words), shuffle=False))
-    pred_ids = list(pred_ids)
+    if isinstance(tf_estimator, WarmPredictor):
+        pred_ids = tf_estimator.predict({'source': test_indices, 'target': zeros})
+    else:
+        pred_ids = tf_estimator.predict(tf.estimator.inputs.numpy_input_fn(
+            x={'source':test_indices, 'target':zeros}, batch_size=len(test_indices), shuffle=False))
+        pred_ids = list(pred_ids)
     
     target_idx2word = {i: w for w, i in dl.target_word2idx.items()}
-    for i, test_word in enumerate(test_words):
-        ans = ''.join([target_idx2word[id] for id in pred_ids[i]])
-        print(test_word, '->', ans.replace('<end>', '').replace('<start>', ''))
+    answers = []
+    for ids in pred_ids:
+        ans = ''.join([target_idx2word[id] for id in ids])
+        answers.append(ans.replace('<end>', '').replace('<start>', ''))
+    return answers
+
+
+def make_predictor(tf_estimator):
+    return WarmPredictor(tf_estimator, {'source': (tf.int64, [None, args.source_max_len]),
+                                        'target': (tf.int64, [None, args.target_max_len])})
 
 
 def prepare_params(dl):
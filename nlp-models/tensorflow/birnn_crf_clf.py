@@ -2,10 +2,15 @@ import tensorflow as tf
 import numpy as np
 import math
 from sklearn.utils import shuffle
+from inference_graph import export_inference_graph
+from session_config import new_session, jit_scope, no_jit_scope
+from rnn_cells import bidirectional_dynamic_lstm
+from train_metrics import step_runner
 
 
 class BiRNN_CRF:
-    def __init__(self, vocab_size, n_out, embedding_dims=128, cell_size=128, n_layer=1, sess=tf.Session()):
+    def __init__(self, vocab_size, n_out, embedding_dims=128, cell_size=128, n_layer=1, sess=None,
+                 cell_backend='basic', jit=False):
         """
         Parameters:
         -----------
@@ -16,18 +21,25 @@ class BiRNN_CRF:
         n_out: int
             Output dimensions
         sess: object
-            tf.Session() object
+            tf.Session() object, by default a new one from session_config.new_session()
         stateful: boolean
             If true, the final state for each batch will be used as the initial state for the next batch 
+        cell_backend: str
+            'basic', 'block' or 'fused' RNN kernels, see rnn_cells.py
+        jit: boolean
+            Compile the graph with XLA, see session_config.jit_scope
         """
         self.vocab_size = vocab_size
         self.embedding_dims = embedding_dims
         self.cell_size = cell_size
         self.n_layer = n_layer
         self.n_out = n_out
-        self.sess = sess
+        self.cell_backend = cell_backend
+        self.jit = jit
+        self.sess = new_session() if sess is None else sess
         self._pointer = None
-        self.build_graph()
+        with jit_scope(self.jit):
+            self.build_graph()
     # end constructor
 
 
@@ -59,21 +71,19 @@ class BiRNN_CRF:
     # end method add_word_embedding_layer
 
 
-    def lstm_cell(self):
-        return tf.nn.rnn_cell.LSTMCell(self.cell_size, initializer=tf.orthogonal_initializer())
-    # end method lstm_cell
-
-
     def add_bidirectional_dynamic_rnn(self):
-        birnn_out = self._pointer
-        for n in range(self.n_layer):
-            (out_fw, out_bw), _ = tf.nn.bidirectional_dynamic_rnn(
-                cell_fw = self.lstm_cell(), cell_bw = self.lstm_cell(),
-                inputs = birnn_out,
-                dtype = tf.float32,
-                scope = 'birnn%d'%n)
-            birnn_out = tf.concat((out_fw, out_bw), 2)
-        self._pointer = birnn_out
+        with no_jit_scope():
+            birnn_out = self._pointer
+            for n in range(self.n_layer):
+                (out_fw, out_bw), _ = bidirectional_dynamic_lstm(
+                    inputs = birnn_out,
+                    sequence_length = self.X_seq_len,
+                    num_units = self.cell_size,
+                    backend = self.cell_backend,
+                    initializer = tf.orthogonal_initializer(),
+                    scope = 'birnn%d'%n)
+                birnn_out = tf.concat((out_fw, out_bw), 2)
+            self._pointer = birnn_out
     # end method add_dynamic_rnn
 
 
@@ -83,16 +93,17 @@ class BiRNN_CRF:
 
 
     def add_crf_layer(self):
-        logits = tf.reshape(self.logits, [tf.shape(self.X)[0], -1, self.n_out])
-        with tf.variable_scope('crf_loss'):
-            self.log_likelihood, _ = tf.contrib.crf.crf_log_likelihood(
-                inputs = logits,
-                tag_indices = self.Y,
-                sequence_lengths = self.X_seq_len)
-        with tf.variable_scope('crf_loss', reuse=True):
-            transition_params = tf.get_variable('transitions', [self.n_out, self.n_out])
-        self.viterbi_sequence, _ = tf.contrib.crf.crf_decode(
-            logits, transition_params, self.X_seq_len)
+        with no_jit_scope():
+            logits = tf.reshape(self.logits, [tf.shape(self.X)[0], -1, self.n_out])
+            with tf.variable_scope('crf_loss'):
+                self.log_likelihood, _ = tf.contrib.crf.crf_log_likelihood(
+                    inputs = logits,
+                    tag_indices = self.Y,
+                    sequence_lengths = self.X_seq_len)
+            with tf.variable_scope('crf_loss', reuse=True):
+                transition_params = tf.get_variable('transitions', [self.n_out, self.n_out])
+            self.viterbi_sequence, _ = tf.contrib.crf.crf_decode(
+                logits, transition_params, self.X_seq_len)
     # end method add_crf_layer
 
 
@@ -103,7 +114,9 @@ class BiRNN_CRF:
     # end method add_backward_path
 
 
-    def fit(self, X, Y, n_epoch=10, batch_size=128, en_exp_decay=True, en_shuffle=True, keep_prob=1.0):
+    def fit(self, X, Y, n_epoch=10, batch_size=128, en_exp_decay=True, en_shuffle=True, keep_prob=1.0,
+            profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr, pad_int=None)
         global_step = 0
         self.sess.run(tf.global_variables_initializer()) # initialize all variables
         for epoch in range(n_epoch): # batch training
@@ -113,10 +126,10 @@ class BiRNN_CRF:
             for local_step, (X_batch, Y_batch) in enumerate(zip(self.gen_batch(X, batch_size),
                                                                 self.gen_batch(Y, batch_size))):
                 lr = self.decrease_lr(en_exp_decay, global_step, n_epoch, len(X), batch_size)           
-                _, loss, acc = self.sess.run([self.train_op, self.loss, self.acc],
-                                             {self.X: X_batch, self.Y: Y_batch, self.lr: lr,
-                                              self.X_seq_len: [X.shape[1]]*len(X_batch),
-                                              self.keep_prob: keep_prob})
+                _, loss, acc = run([self.train_op, self.loss, self.acc],
+                                   {self.X: X_batch, self.Y: Y_batch, self.lr: lr,
+                                    self.X_seq_len: [X.shape[1]]*len(X_batch),
+                                    self.keep_prob: keep_prob})
                 global_step += 1
                 if local_step % 50 == 0:
                     print ('Epoch %d/%d | Step %d/%d | train_loss: %.4f | train_acc: %.4f | lr: %.4f'
@@ -148,6 +161,14 @@ class BiRNN_CRF:
     # end method infer
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X, 'X_seq_len': self.X_seq_len},
+            outputs = {'viterbi_sequence': self.viterbi_sequence},
+            constants = {self.keep_prob: 1.0})
+    # end method export_inference_graph
+
+
     def gen_batch(self, arr, batch_size):
         for i in range(0, len(arr), batch_size):
             yield arr[i : i+batch_size]
@@ -1,11 +1,13 @@
 import tensorflow as tf
 import numpy as np
+from session_config import new_session
+from train_metrics import step_runner
 
 
 class RNNTextGen:
     def __init__(self, text, seq_len, embedding_dims=30, rnn_size=256, n_layers=2, grad_clip=5.,
-                 beam_width=3, sess=tf.Session()):
-        self.sess = sess
+                 beam_width=3, sess=None):
+        self.sess = new_session() if sess is None else sess
         self.text = text
         self.seq_len = seq_len
         self.embedding_dims = embedding_dims
@@ -107,20 +109,22 @@ class RNNTextGen:
     # end method
 
 
-    def fit(self, text_iter_step=25, n_epoch=1, batch_size=128):
+    def fit(self, text_iter_step=25, n_epoch=1, batch_size=128, profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.sequence, pad_int=None)
         n_batch = (len(self.indexed) - self.seq_len*batch_size - 1) // text_iter_step
         self.sess.run(tf.global_variables_initializer()) # initialize all variables
         
         for epoch in range(n_epoch):
             for local_step, seq_batch in enumerate(self.next_batch(batch_size, text_iter_step)):
-                _, train_loss = self.sess.run([self.train_op, self.loss],
-                                              {self.sequence: seq_batch,
-                                               self.sequence_length: [self.seq_len]*len(seq_batch)})
+                _, train_loss = run([self.train_op, self.loss],
+                                    {self.sequence: seq_batch,
+                                     self.sequence_length: [self.seq_len]*len(seq_batch)})
                 if local_step % 10 == 0:
                     print ('Epoch %d/%d | Batch %d/%d | train loss: %.4f' %
                           (epoch+1, n_epoch, local_step, n_batch, train_loss))
                 if local_step % 100 == 0:
                     self.decode()
+                    run.pause()
     # end method
 
 
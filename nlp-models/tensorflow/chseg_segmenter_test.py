@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import chseg
+import jieba
+import tensorflow as tf
+from birnn_crf_clf import BiRNN_CRF
+from chseg_birnn_crf_test import to_train_seq, N_CLASS, N_EPOCH, BATCH_SIZE
+
+
+CKPT_PATH = './saved/chseg_birnn_crf.ckpt'
+VOCAB_PATH = './saved/chseg_vocab.txt'
+
+
+def benchmark(name, fn, sentences):
+    t0 = time.time()
+    res = fn(sentences)
+    elapsed = time.time() - t0
+    n_chars = sum(len(s) for s in sentences)
+    print('%s: %.2f secs | %.1f sents/sec | %.1f chars/sec'
+          % (name, elapsed, len(sentences)/elapsed, n_chars/elapsed))
+    return res
+
+
+if __name__ == '__main__':
+    x_train, y_train, x_test, y_test, vocab_size, char2idx, idx2char = chseg.load_data()
+    X_train, Y_train = to_train_seq(x_train, y_train)
+
+    clf = BiRNN_CRF(vocab_size, N_CLASS)
+    clf.fit(X_train, Y_train, n_epoch=N_EPOCH, batch_size=BATCH_SIZE)
+    if not os.path.exists('./saved'):
+        os.makedirs('./saved')
+    tf.train.Saver().save(clf.sess, CKPT_PATH)
+    chseg.save_vocab(char2idx, VOCAB_PATH)
+
+    segmenter = chseg.Segmenter(clf, VOCAB_PATH, ckpt_path=CKPT_PATH, batch_size=BATCH_SIZE)
+    sentences = chseg.load_test_sentences()
+    print('%d test sentences' % len(sentences))
+
+    jieba.initialize()
+    jieba_res = benchmark('jieba', lambda xs: [list(jieba.cut(x)) for x in xs], sentences)
+    our_res = benchmark('Segmenter', segmenter.segment, sentences)
+    for i in range(3):
+        print('jieba:     ' + ' '.join(jieba_res[i]))
+        print('Segmenter: ' + ' '.join(our_res[i]))
@@ -0,0 +1,344 @@
+"""
+Micro-batching HTTP server for the text classifiers (Python 3)
+
+    clf = RNNTextClassifier(vocab_size, 2)
+    clf.fit(X_train, y_train)
+    ClassifierServer(rnn_clf_predict_fn(clf), max_batch_size=64, max_wait_ms=5.).run(port=8000)
+
+    POST /predict   {"ids": [12, 7, 256, ...]}   ->   {"label": 1, "probs": [0.12, 0.88]}
+    GET  /stats     batch size, queue wait, session time and request latency histograms
+
+Requests are grouped by length into buckets of `bucket_width`. A bucket is sent to the session as one
+padded batch when it holds max_batch_size requests or its oldest request has waited max_wait_ms.
+"""
+import json
+import time
+import bisect
+import asyncio
+import numpy as np
+import tensorflow as tf
+from concurrent.futures import ThreadPoolExecutor
+from warm_predictor import WarmPredictor
+
+
+def pad_batch(sequences, bucket_width=1, pad_int=0, fixed_len=None):
+    """
+    Pads at the end. fixed_len is the width of models with a fixed input length,
+    longer sequences keep their first fixed_len ids as in their training batches
+    """
+    if fixed_len is None:
+        max_len = max(len(seq) for seq in sequences)
+        max_len = -(-max_len // bucket_width) * bucket_width # round up, so only a few shapes reach the session
+    else:
+        max_len = fixed_len
+        sequences = [seq[:fixed_len] for seq in sequences]
+    padded = np.full([len(sequences), max_len], pad_int, np.int32)
+    for i, seq in enumerate(sequences):
+        padded[i, :len(seq)] = seq
+    return padded, np.array([len(seq) for seq in sequences], np.int32)
+
+
+def rnn_clf_predict_fn(clf, bucket_width=32):
+    """
+    For the classifiers fed by X and X_seq_lens: RNNTextClassifier, rnn_attn_text_clf, conv_rnn_text_clf.
+    conv_rnn_text_clf takes a fixed width, its batches are padded or truncated to max_seq_len instead of bucketed
+    """
+    with clf.sess.graph.as_default():
+        probs = tf.nn.softmax(clf.logits)
+    fixed_len = getattr(clf, 'max_seq_len', None)
+    def predict_fn(sequences):
+        padded, lens = pad_batch(sequences, bucket_width, fixed_len=fixed_len)
+        return clf.sess.run(probs, {clf.X: padded, clf.X_seq_lens: lens, clf.keep_prob: 1.0})
+    return predict_fn
+
+
+def conv_clf_predict_fn(clf):
+    """
+    For the classifiers with a fixed seq_len: Conv1DClassifier and its variants.
+    Same as keras pad_sequences used in training, short inputs are padded in front and long ones keep their end
+    """
+    with clf.sess.graph.as_default():
+        probs = tf.nn.softmax(clf.logits)
+    def predict_fn(sequences):
+        padded = np.zeros([len(sequences), clf.seq_len], np.int32)
+        for i, seq in enumerate(sequences):
+            seq = seq[-clf.seq_len:]
+            padded[i, clf.seq_len-len(seq):] = seq
+        return clf.sess.run(probs, {clf.X: padded, clf.keep_prob: 1.0})
+    return predict_fn
+
+
+def estimator_predict_fn(estimator, bucket_width=32):
+    """
+    For Estimator models predicting from features['data'], e.g. rnn_attn_estimator
+    """
+    predictor = WarmPredictor(estimator, {'data': (tf.int64, [None, None])})
+    def predict_fn(sequences):
+        padded, _ = pad_batch(sequences, bucket_width)
+        return predictor.predict({'data': padded.astype(np.int64)})
+    return predict_fn
+
+
+class QueueFullError(Exception):
+    pass
+# end class
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.n = 0
+        self.total = 0.
+    # end constructor
+
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.n += 1
+        self.total += value
+    # end method add
+
+
+    def percentile(self, q):
+        # upper bound of the bucket holding the q-th percentile
+        target, seen = q / 100. * self.n, 0
+        for bound, count in zip(self.bounds + [float('inf')], self.counts):
+            seen += count
+            if seen >= target and count > 0:
+                return bound
+        return 0.
+    # end method percentile
+
+
+    def to_dict(self):
+        labels = ['<=%g' % b for b in self.bounds] + ['>%g' % self.bounds[-1]]
+        return {'count': self.n, 'mean': self.total / max(1, self.n),
+                'p50': self.percentile(50), 'p90': self.percentile(90), 'p99': self.percentile(99),
+                'buckets': dict(zip(labels, self.counts))}
+    # end method to_dict
+# end class
+
+
+class ServingStats:
+    LATENCY_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+    BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+    def __init__(self):
+        self.batch_size = Histogram(self.BATCH_SIZES)
+        self.queue_ms = Histogram(self.LATENCY_MS)
+        self.session_ms = Histogram(self.LATENCY_MS)
+        self.request_ms = Histogram(self.LATENCY_MS)
+        self.rejected = 0
+    # end constructor
+
+
+    def to_dict(self):
+        return {'batch_size': self.batch_size.to_dict(), 'queue_ms': self.queue_ms.to_dict(),
+                'session_ms': self.session_ms.to_dict(), 'request_ms': self.request_ms.to_dict(),
+                'rejected': self.rejected}
+    # end method to_dict
+# end class
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5., max_queue=1024, bucket_width=32):
+        """
+        Parameters:
+        -----------
+        predict_fn: function
+            List of id lists -> array of results, [batch_size, n_class] probabilities or [batch_size] labels
+        max_batch_size: int
+            A bucket is flushed as soon as it holds this many requests
+        max_wait_ms: float
+            Otherwise it is flushed when its oldest request has waited this long
+        max_queue: int
+            Requests waiting beyond this are rejected with QueueFullError
+        bucket_width: int
+            Requests whose lengths fall in the same multiple of bucket_width are batched together
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.
+        self.max_queue = max_queue
+        self.bucket_width = bucket_width
+        self.pending = {} # bucket -> [(sequence, future, arrival time)]
+        self.n_pending = 0
+        self.stats = ServingStats()
+        self.executor = ThreadPoolExecutor(1) # one session call at a time, requests keep queueing meanwhile
+        self._wakeup = None # asyncio.Event, made in the loop by whichever of submit() and run() comes first
+    # end constructor
+
+
+    def wakeup(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+    # end method wakeup
+
+
+    async def submit(self, sequence):
+        if self.n_pending >= self.max_queue:
+            self.stats.rejected += 1
+            raise QueueFullError()
+        future = asyncio.get_event_loop().create_future()
+        bucket = len(sequence) // self.bucket_width
+        self.pending.setdefault(bucket, []).append((sequence, future, time.time()))
+        self.n_pending += 1
+        self.wakeup().set()
+        return await future
+    # end method submit
+
+
+    async def run(self):
+        wakeup = self.wakeup()
+        while True:
+            batch = self.next_batch()
+            if batch is None:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.time_to_flush())
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_batch(batch)
+    # end method run
+
+
+    def next_batch(self):
+        # a full bucket goes first, then the bucket whose oldest request has waited longest past max_wait
+        ready = None
+        for bucket, items in self.pending.items():
+            if len(items) >= self.max_batch_size:
+                ready = bucket
+                break
+            if time.time() - items[0][2] >= self.max_wait:
+                if ready is None or items[0][2] < self.pending[ready][0][2]:
+                    ready = bucket
+        if ready is None:
+            return None
+        batch = self.pending[ready][:self.max_batch_size]
+        rest = self.pending[ready][self.max_batch_size:]
+        if len(rest) > 0:
+            self.pending[ready] = rest
+        else:
+            del self.pending[ready]
+        self.n_pending -= len(batch)
+        return batch
+    # end method next_batch
+
+
+    def time_to_flush(self):
+        if len(self.pending) == 0:
+            return None
+        oldest = min(items[0][2] for items in self.pending.values())
+        return max(0., oldest + self.max_wait - time.time())
+    # end method time_to_flush
+
+
+    async def run_batch(self, batch):
+        start = time.time()
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(
+                self.executor, self.predict_fn, [sequence for sequence, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.stats.batch_size.add(len(batch))
+        self.stats.session_ms.add(1000 * (time.time() - start))
+        for (_, future, arrival), result in zip(batch, results):
+            self.stats.queue_ms.add(1000 * (start - arrival))
+            if not future.done():
+                future.set_result(self.to_response(result))
+    # end method run_batch
+
+
+    def to_response(self, result):
+        result = np.asarray(result)
+        if result.ndim == 0:
+            return {'label': int(result)}
+        return {'label': int(result.argmax()), 'probs': result.tolist()}
+    # end method to_response
+# end class
+
+
+class ClassifierServer:
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5., max_queue=1024, bucket_width=32):
+        self.batcher = MicroBatcher(predict_fn, max_batch_size, max_wait_ms, max_queue, bucket_width)
+        self.server = None
+    # end constructor
+
+
+    async def start(self, host='127.0.0.1', port=8000):
+        self.batcher_task = asyncio.ensure_future(self.batcher.run())
+        self.server = await asyncio.start_server(self.handle, host, port)
+    # end method start
+
+
+    def run(self, host='127.0.0.1', port=8000):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.start(host, port))
+            print("Serving on http://%s:%d" % (host, port))
+            loop.run_forever()
+        finally:
+            loop.close()
+    # end method run
+
+
+    async def handle(self, reader, writer):
+        # minimal HTTP/1.1 with keep-alive, enough for JSON requests from a load balancer or benchmark
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, value = line.decode('latin-1').split(':', 1)
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, payload = await self.route(method, path, body)
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(('HTTP/1.1 %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                              % (status, len(data))).encode('latin-1') + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+    # end method handle
+
+
+    async def route(self, method, path, body):
+        if method == 'GET' and path == '/stats':
+            return '200 OK', self.batcher.stats.to_dict()
+        if method != 'POST' or path != '/predict':
+            return '404 Not Found', {'error': 'POST /predict or GET /stats'}
+        start = time.time()
+        try:
+            ids = [int(i) for i in json.loads(body.decode('utf-8'))['ids']]
+        except (ValueError, KeyError, TypeError):
+            return '400 Bad Request', {'error': 'expected {"ids": [int, ...]}'}
+        if len(ids) == 0:
+            return '400 Bad Request', {'error': 'empty input'}
+        try:
+            result = await self.batcher.submit(ids)
+        except QueueFullError:
+            return '503 Service Unavailable', {'error': 'queue full'}
+        except Exception as e:
+            return '500 Internal Server Error', {'error': repr(e)}
+        self.batcher.stats.request_ms.add(1000 * (time.time() - start))
+        return '200 OK', result
+    # end method route
+# end class
@@ -0,0 +1,105 @@
+from __future__ import print_function
+from rnn_text_clf import RNNTextClassifier
+from clf_server import ClassifierServer, MicroBatcher, rnn_clf_predict_fn
+import json
+import time
+import asyncio
+import threading
+import numpy as np
+import tensorflow as tf
+
+
+vocab_size = 20000
+batch_size = 32
+n_requests = 2000
+concurrency = 64
+
+
+def sort_by_len(x, y):
+    idx = sorted(range(len(x)), key=lambda i: len(x[i]))
+    return x[idx], y[idx]
+
+
+def start_server(server, port):
+    loop = asyncio.new_event_loop()
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start(port=port))
+        loop.run_forever()
+    threading.Thread(target=serve, daemon=True).start()
+    time.sleep(0.5)
+    return loop
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+    writer.write(('%s %s HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                  % (method, path, len(body))).encode('latin-1') + body)
+    await writer.drain()
+    status = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        if line.lower().startswith(b'content-length'):
+            length = int(line.split(b':')[1])
+    return int(status.split()[1]), json.loads((await reader.readexactly(length)).decode('utf-8'))
+
+
+async def client(port, reviews, latencies, results):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for i, review in reviews:
+        t0 = time.time()
+        status, results[i] = await request(reader, writer, 'POST', '/predict', {'ids': review})
+        latencies.append(1000 * (time.time() - t0))
+    writer.close()
+
+
+async def load_test(port, reviews):
+    # each client keeps one connection and sends its next request when the previous one is answered
+    latencies, results = [], [None] * len(reviews)
+    indexed = list(enumerate(reviews))
+    t0 = time.time()
+    await asyncio.gather(*[client(port, indexed[c::concurrency], latencies, results) for c in range(concurrency)])
+    elapsed = time.time() - t0
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    _, stats = await request(reader, writer, 'GET', '/stats')
+    writer.close()
+    return len(reviews) / elapsed, np.percentile(latencies, [50, 99]), results, stats
+
+
+async def submit_before_run():
+    # a request that arrives before the batcher runs waits for it
+    batcher = MicroBatcher(lambda sequences: [len(sequence) for sequence in sequences], max_wait_ms=1.)
+    pending = asyncio.ensure_future(batcher.submit([4, 5, 6]))
+    await asyncio.sleep(0.01)
+    task = asyncio.ensure_future(batcher.run())
+    result = await pending
+    task.cancel()
+    return result
+
+
+if __name__ == '__main__':
+    assert asyncio.new_event_loop().run_until_complete(submit_before_run()) == {'label': 3}
+
+    (X_train, y_train), (X_test, y_test) = tf.keras.datasets.imdb.load_data(num_words=vocab_size)
+    X_train, y_train = sort_by_len(X_train, y_train)
+
+    clf = RNNTextClassifier(vocab_size, 2)
+    clf.fit(X_train, y_train, n_epoch=1, batch_size=batch_size, keep_prob=0.8, en_exp_decay=True)
+
+    # reviews in random order, as they would arrive
+    idx = np.random.permutation(len(X_test))[:n_requests]
+    reviews, labels = [list(map(int, X_test[i])) for i in idx], y_test[idx]
+
+    client_loop = asyncio.new_event_loop()
+    for port, (max_batch_size, max_wait_ms) in enumerate([(1, 0.), (16, 2.), (64, 5.), (128, 10.)], 8700):
+        server = ClassifierServer(rnn_clf_predict_fn(clf), max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        loop = start_server(server, port)
+        throughput, (p50, p99), results, stats = client_loop.run_until_complete(load_test(port, reviews))
+        loop.call_soon_threadsafe(loop.stop)
+        acc = np.mean([r['label'] == y for r, y in zip(results, labels)])
+        print("max_batch_size %d, max_wait %.0f ms | %.1f requests/sec | latency p50 %.1f ms, p99 %.1f ms | "
+              "mean batch %.1f | acc %.3f" % (max_batch_size, max_wait_ms, throughput, p50, p99,
+                                             stats['batch_size']['mean'], acc))
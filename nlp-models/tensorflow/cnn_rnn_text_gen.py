@@ -1,12 +1,14 @@
 import tensorflow as tf
 import numpy as np
 import sys
+from session_config import new_session
+from train_metrics import step_runner
 
 
 class ConvRNNTextGen:
     def __init__(self, text, seq_len=50, embedding_dims=15, cell_size=128, n_layer=2, grad_clip=5.0,
-                 n_filters=[8, 16, 32, 64, 128], kernel_sizes=[1, 2, 3, 4, 5], sess=tf.Session()):
-        self.sess = sess
+                 n_filters=[8, 16, 32, 64, 128], kernel_sizes=[1, 2, 3, 4, 5], sess=None):
+        self.sess = new_session() if sess is None else sess
         self.text = text
         self.seq_len = seq_len
         self.embedding_dims = embedding_dims
@@ -145,8 +147,11 @@ class ConvRNNTextGen:
     # end method
 
 
-    def fit(self, start_word, text_iter_step=25, n_gen=50, n_epoch=1, batch_size=128, en_exp_decay=False):
+    def fit(self, start_word, text_iter_step=25, n_gen=50, n_epoch=1, batch_size=128, en_exp_decay=False,
+            profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.Y, pad_int=None)
         global_step = 0
+        log = {'loss': []}
         n_batch = (len(self.word_indexed) - self.seq_len*batch_size - 1) // text_iter_step
         self.sess.run(tf.global_variables_initializer()) # initialize all variables
         """
@@ -157,14 +162,16 @@ class ConvRNNTextGen:
         for epoch in range(n_epoch):
             next_state = self.sess.run(self.init_state, {self.batch_size: batch_size})
             for local_step, (X_batch, Y_batch) in enumerate(self.next_batch(batch_size, text_iter_step)):
-                _, train_loss, next_state = self.sess.run([self.train_op, self.loss, self.final_state],
-                                                          {self.X: X_batch,
-                                                           self.Y: Y_batch,
-                                                           self.init_state: next_state})
+                _, train_loss, next_state = run([self.train_op, self.loss, self.final_state],
+                                                {self.X: X_batch,
+                                                 self.Y: Y_batch,
+                                                 self.init_state: next_state})
+                log['loss'].append(train_loss)
                 print ('Epoch %d/%d | Batch %d/%d | train loss: %.4f'
                         % (epoch+1, n_epoch, local_step, n_batch, train_loss))
                 if local_step % 10 == 0:
                     print('\n'+self.infer(start_word, n_gen)+'\n')
+                    run.pause()
                     """
                     save_path = self.saver.save(self.sess, self.model_path)
                     print("Model saved in file: %s" % save_path)
@@ -2,11 +2,14 @@ import tensorflow as tf
 import numpy as np
 import math
 import sklearn
+from inference_graph import export_inference_graph
+from session_config import new_session, jit_scope
+from train_metrics import step_runner
 
 
 class HighwayClassifier:
-    def __init__(self, seq_len, vocab_size, n_out, sess=tf.Session(),
-                 embedding_dims=50, n_filters=50, kernel_size=3, padding='valid'):
+    def __init__(self, seq_len, vocab_size, n_out, sess=None,
+                 embedding_dims=50, n_filters=50, kernel_size=3, padding='valid', jit=False):
         """
         Parameters:
         -----------
@@ -25,7 +28,9 @@ class HighwayClassifier:
         n_out: int
             Output dimensions
         sess: object
-            tf.Session() object 
+            tf.Session() object, by default a new one from session_config.new_session()
+        jit: boolean
+            Compile the graph with XLA, see session_config.jit_scope
         """
         self.seq_len = seq_len
         self.vocab_size = vocab_size
@@ -34,9 +39,11 @@ class HighwayClassifier:
         self.kernel_size = kernel_size
         self.padding = padding
         self.n_out = n_out
-        self.sess = sess
+        self.jit = jit
+        self.sess = new_session() if sess is None else sess
         self._pointer = None
-        self.build_graph()
+        with jit_scope(self.jit):
+            self.build_graph()
     # end constructor
  
  
@@ -104,7 +111,8 @@ class HighwayClassifier:
 
 
     def fit(self, X, Y, val_data=None, n_epoch=10, batch_size=128, keep_prob=1.0, en_exp_decay=True,
-            en_shuffle=True):
+            en_shuffle=True, profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr)
         if val_data is None:
             print("Train %d samples" % len(X))
         else:
@@ -122,9 +130,9 @@ class HighwayClassifier:
             for local_step, (X_batch, Y_batch) in enumerate(zip(self.gen_batch(X, batch_size),
                                                                 self.gen_batch(Y, batch_size))):
                 lr = self.decrease_lr(global_step, total_steps) if en_exp_decay else 1e-3 
-                _, loss, acc = self.sess.run([self.train_op, self.loss, self.acc],
-                                             {self.X:X_batch, self.Y:Y_batch,
-                                              self.lr:lr, self.keep_prob:keep_prob})
+                _, loss, acc = run([self.train_op, self.loss, self.acc],
+                                   {self.X:X_batch, self.Y:Y_batch,
+                                    self.lr:lr, self.keep_prob:keep_prob})
                 global_step += 1
                 if local_step % 50 == 0:
                     print ("Epoch %d/%d | Step %d/%d | train_loss: %.4f | train_acc: %.4f | lr: %.4f"
@@ -140,6 +148,7 @@ class HighwayClassifier:
                     val_loss_list.append(v_loss)
                     val_acc_list.append(v_acc)
                 val_loss, val_acc = self.list_avg(val_loss_list), self.list_avg(val_acc_list)
+                run.pause()
 
             # append to log
             log['loss'].append(loss)
@@ -170,6 +179,14 @@ class HighwayClassifier:
     # end method predict
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X},
+            outputs = {'logits': self.logits},
+            constants = {self.keep_prob: 1.0})
+    # end method export_inference_graph
+
+
     def gen_batch(self, arr, batch_size):
         for i in range(0, len(arr), batch_size):
             yield arr[i : i+batch_size]
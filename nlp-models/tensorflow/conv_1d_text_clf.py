@@ -2,20 +2,26 @@ import tensorflow as tf
 import numpy as np
 import math
 import sklearn
+from inference_graph import export_inference_graph
+from session_config import new_session, jit_scope
+from train_metrics import step_runner
+from async_eval import AsyncEvaluator
 
 
 class Conv1DClassifier:
-    def __init__(self, seq_len, vocab_size, n_out, sess=tf.Session(),
-                 embedding_dims=50, n_filters=250, kernel_size=3):
+    def __init__(self, seq_len, vocab_size, n_out, sess=None,
+                 embedding_dims=50, n_filters=250, kernel_size=3, jit=False):
         self.seq_len = seq_len
         self.vocab_size = vocab_size
         self.embedding_dims = embedding_dims
         self.n_filters = n_filters
         self.kernel_size = kernel_size
         self.n_out = n_out
-        self.sess = sess
+        self.jit = jit
+        self.sess = new_session() if sess is None else sess
         self._pointer = None
-        self.build_graph()
+        with jit_scope(self.jit):
+            self.build_graph()
     # end constructor
  
  
@@ -80,15 +86,20 @@ class Conv1DClassifier:
 
 
     def fit(self, X, Y, val_data=None, n_epoch=10, batch_size=128, keep_prob=1.0, en_exp_decay=True,
-            en_shuffle=True):
+            en_shuffle=True, profiler=None, callbacks=None, async_eval=False):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr)
         if val_data is None:
             print("Train %d samples" % len(X))
         else:
             print("Train %d samples | Test %d samples" % (len(X), len(val_data[0])))
-        log = {'loss':[], 'acc':[], 'val_loss':[], 'val_acc':[]}
+        log = {'loss':[], 'acc':[], 'val_loss':[], 'val_acc':[], 'val_step':[]}
         global_step = 0
 
         self.sess.run(tf.global_variables_initializer()) # initialize all variables
+        evaluator = None
+        if (val_data is not None) and async_eval: # evaluate on a background thread, see async_eval.py
+            evaluator = AsyncEvaluator(self.sess, self.build_replica,
+                                       lambda replica: replica.evaluate(val_data[0], val_data[1], batch_size))
         for epoch in range(n_epoch):
             if en_shuffle:
                 X, Y = sklearn.utils.shuffle(X, Y)
@@ -96,33 +107,32 @@ class Conv1DClassifier:
             for local_step, (X_batch, Y_batch) in enumerate(zip(self.next_batch(X, batch_size),
                                                                 self.next_batch(Y, batch_size))):
                 lr = self.decrease_lr(en_exp_decay, global_step, n_epoch, len(X), batch_size) 
-                _, loss, acc = self.sess.run([self.train_op, self.loss, self.acc],
-                                             {self.X:X_batch, self.Y:Y_batch,
-                                              self.lr:lr, self.keep_prob:keep_prob})
+                _, loss, acc = run([self.train_op, self.loss, self.acc],
+                                   {self.X:X_batch, self.Y:Y_batch,
+                                    self.lr:lr, self.keep_prob:keep_prob})
                 global_step += 1
                 if local_step % 50 == 0:
                     print ("Epoch %d/%d | Step %d/%d | train_loss: %.4f | train_acc: %.4f | lr: %.4f"
                         %(epoch+1, n_epoch, local_step, int(len(X)/batch_size), loss, acc, lr))
+                if evaluator is not None:
+                    self.log_async_eval(log, evaluator.poll())
 
-            if val_data is not None: # go through test dara, compute averaged validation loss and acc
-                val_loss_list, val_acc_list = [], []
-                for X_test_batch, Y_test_batch in zip(self.next_batch(val_data[0], batch_size),
-                                                      self.next_batch(val_data[1], batch_size)):
-                    v_loss, v_acc = self.sess.run([self.loss, self.acc],
-                                                  {self.X:X_test_batch, self.Y:Y_test_batch,
-                                                   self.keep_prob:1.0})
-                    val_loss_list.append(v_loss)
-                    val_acc_list.append(v_acc)
-                val_loss, val_acc = self.list_avg(val_loss_list), self.list_avg(val_acc_list)
+            if evaluator is not None: # snapshot the weights, the next epoch starts right away
+                evaluator.submit(global_step)
+                run.pause()
+            elif val_data is not None: # go through test dara, compute averaged validation loss and acc
+                val_loss, val_acc = self.evaluate(val_data[0], val_data[1], batch_size)
+                run.pause()
 
             # append to log
             log['loss'].append(loss)
             log['acc'].append(acc)
-            if val_data is not None:
+            if (val_data is not None) and (evaluator is None):
                 log['val_loss'].append(val_loss)
                 log['val_acc'].append(val_acc)
+                log['val_step'].append(global_step)
             # verbose
-            if val_data is None:
+            if (val_data is None) or (evaluator is not None):
                 print ("Epoch %d/%d | train_loss: %.4f | train_acc: %.4f |" % (epoch+1, n_epoch, loss, acc),
                     "lr: %.4f" % (lr) )
             else:
@@ -130,11 +140,41 @@ class Conv1DClassifier:
                     "test_loss: %.4f | test_acc: %.4f |" % (val_loss, val_acc),
                     "lr: %.4f" % (lr) )
         # end "for epoch in range(n_epoch):"
+        if evaluator is not None:
+            self.log_async_eval(log, evaluator.close())
 
         return log
     # end method fit
 
 
+    def evaluate(self, X_test, Y_test, batch_size=128):
+        val_loss_list, val_acc_list = [], []
+        for X_test_batch, Y_test_batch in zip(self.next_batch(X_test, batch_size),
+                                              self.next_batch(Y_test, batch_size)):
+            v_loss, v_acc = self.sess.run([self.loss, self.acc],
+                                          {self.X:X_test_batch, self.Y:Y_test_batch,
+                                           self.keep_prob:1.0})
+            val_loss_list.append(v_loss)
+            val_acc_list.append(v_acc)
+        return self.list_avg(val_loss_list), self.list_avg(val_acc_list)
+    # end method evaluate
+
+
+    def build_replica(self, sess):
+        return Conv1DClassifier(self.seq_len, self.vocab_size, self.n_out, sess, self.embedding_dims,
+                                self.n_filters, self.kernel_size, self.jit)
+    # end method build_replica
+
+
+    def log_async_eval(self, log, finished):
+        for step, (val_loss, val_acc) in finished:
+            log['val_loss'].append(val_loss)
+            log['val_acc'].append(val_acc)
+            log['val_step'].append(step)
+            print ("Step %d | test_loss: %.4f | test_acc: %.4f" % (step, val_loss, val_acc))
+    # end method log_async_eval
+
+
     def predict(self, X_test, batch_size=128):
         batch_pred_list = []
         for X_test_batch in self.next_batch(X_test, batch_size):
@@ -144,6 +184,14 @@ class Conv1DClassifier:
     # end method predict
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X},
+            outputs = {'logits': self.logits},
+            constants = {self.keep_prob: 1.0})
+    # end method export_inference_graph
+
+
     def next_batch(self, arr, batch_size):
         for i in range(0, len(arr), batch_size):
             yield arr[i : i+batch_size]
@@ -2,12 +2,15 @@ import tensorflow as tf
 import numpy as np
 import math
 import sklearn
+from inference_graph import export_inference_graph
+from session_config import new_session, jit_scope, no_jit_scope
+from train_metrics import step_runner
 
 
 class ConvLSTMClassifier:
-    def __init__(self, max_seq_len, vocab_size, n_out=2, sess=tf.Session(),
+    def __init__(self, max_seq_len, vocab_size, n_out=2, sess=None,
                  embedding_dims=128, n_filters=64, kernel_size=5, pool_size=4, padding='valid',
-                 cell_size=64):
+                 cell_size=64, jit=False):
         """
         Parameters:
         -----------
@@ -28,7 +31,9 @@ class ConvLSTMClassifier:
         n_out: int
             Output dimensions
         sess: object
-            tf.Session() object 
+            tf.Session() object, by default a new one from session_config.new_session()
+        jit: boolean
+            Compile the graph with XLA, see session_config.jit_scope
         """
         self.max_seq_len = max_seq_len
         self.vocab_size = vocab_size
@@ -39,9 +44,11 @@ class ConvLSTMClassifier:
         self.padding = padding
         self.cell_size = cell_size
         self.n_out = n_out
-        self.sess = sess
+        self.jit = jit
+        self.sess = new_session() if sess is None else sess
         self._pointer = None         # used to point to the forefront of neural network
-        self.build_graph()
+        with jit_scope(self.jit):
+            self.build_graph()
     # end constructor
  
  
@@ -102,10 +109,11 @@ class ConvLSTMClassifier:
 
 
     def add_dynamic_rnn(self):      
-        _, self._pointer = tf.nn.dynamic_rnn(self.cell, self._pointer,
-                                            dtype = tf.float32,
-                                            sequence_length = (self.X_seq_lens // self.pool_size),
-                                            time_major = False)
+        with no_jit_scope():
+            _, self._pointer = tf.nn.dynamic_rnn(self.cell, self._pointer,
+                                                dtype = tf.float32,
+                                                sequence_length = (self.X_seq_lens // self.pool_size),
+                                                time_major = False)
     # end method add_dynamic_rnn
 
 
@@ -121,7 +129,9 @@ class ConvLSTMClassifier:
     # end method add_backward_path
 
 
-    def fit(self, X, Y, val_data=None, n_epoch=10, batch_size=128, keep_prob=1.0, en_exp_decay=True):
+    def fit(self, X, Y, val_data=None, n_epoch=10, batch_size=128, keep_prob=1.0, en_exp_decay=True,
+            profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr)
         if val_data is None:
             print("Train %d samples" % len(X))
         else:
@@ -134,11 +144,11 @@ class ConvLSTMClassifier:
             for local_step, ((X_batch, X_batch_lens), Y_batch) in enumerate(
                 zip(self.next_batch(X, batch_size), self.gen_batch(Y, batch_size))):
                 lr = self.decrease_lr(en_exp_decay, global_step, n_epoch, len(X), batch_size) 
-                _, loss, acc = self.sess.run([self.train_op, self.loss, self.acc],
-                                             {self.X: X_batch, self.Y: Y_batch,
-                                              self.X_seq_lens: X_batch_lens,
-                                              self.lr: lr,
-                                              self.keep_prob: keep_prob})
+                _, loss, acc = run([self.train_op, self.loss, self.acc],
+                                   {self.X: X_batch, self.Y: Y_batch,
+                                    self.X_seq_lens: X_batch_lens,
+                                    self.lr: lr,
+                                    self.keep_prob: keep_prob})
                 global_step += 1
                 if local_step % 50 == 0:
                     print ("Epoch %d/%d | Step %d/%d | train_loss: %.4f | train_acc: %.4f | lr: %.4f"
@@ -155,6 +165,7 @@ class ConvLSTMClassifier:
                     val_loss_list.append(v_loss)
                     val_acc_list.append(v_acc)
                 val_loss, val_acc = self.list_avg(val_loss_list), self.list_avg(val_acc_list)
+                run.pause()
 
             # append to log
             log['loss'].append(loss)
@@ -187,6 +198,14 @@ class ConvLSTMClassifier:
     # end method predict
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X, 'X_seq_lens': self.X_seq_lens},
+            outputs = {'logits': self.logits},
+            constants = {self.keep_prob: 1.0})
+    # end method export_inference_graph
+
+
     def pad_sentence_batch(self, sentence_batch, pad_int=0):
         padded_seqs = []
         seq_lens = []
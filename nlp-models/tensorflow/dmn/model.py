@@ -33,7 +33,6 @@ class MemoryNetwork:
 
     def forward(self):
         embedding = tf.get_variable('lookup_table', [self.params['vocab_size'], args.embed_dim], tf.float32)
-        embedding = self.zero_index_pad(embedding)
 
         fact_vecs = self.input_module(embedding)
         q_vec = self.question_module(embedding)
@@ -60,7 +59,7 @@ class MemoryNetwork:
 
     def input_module(self, embedding):
         with tf.variable_scope('input_module'):
-            inputs = tf.nn.embedding_lookup(embedding, self.placeholders['inputs'])       # (B, I, S, D)
+            inputs = self.embedding_lookup(embedding, self.placeholders['inputs'])       # (B, I, S, D)
             position = self.position_encoding(self.params['max_sent_len'], args.embed_dim)
             inputs = tf.reduce_sum(inputs * position, 2)                                  # (B, I, D)
             birnn_out, _ = tf.nn.bidirectional_dynamic_rnn(                                             
@@ -75,7 +74,7 @@ class MemoryNetwork:
 
     def question_module(self, embedding):
         with tf.variable_scope('question_module'):
-            questions = tf.nn.embedding_lookup(embedding, self.placeholders['questions'])
+            questions = self.embedding_lookup(embedding, self.placeholders['questions'])
             _, q_vec = tf.nn.dynamic_rnn(
                 self.GRU(), questions, self.placeholders['questions_len'], dtype=np.float32)
             return q_vec
@@ -130,7 +129,7 @@ class MemoryNetwork:
         
         with tf.variable_scope('answer_module'):
             helper = tf.contrib.seq2seq.TrainingHelper(
-                inputs = tf.nn.embedding_lookup(embedding, answer_inputs),
+                inputs = self.embedding_lookup(embedding, answer_inputs),
                 sequence_length = self.placeholders['answers_len'])
             decoder = tf.contrib.seq2seq.BasicDecoder(
                 cell = self.GRU(),
@@ -143,7 +142,7 @@ class MemoryNetwork:
 
         with tf.variable_scope('answer_module', reuse=True):
             helper = tf.contrib.seq2seq.GreedyEmbeddingHelper(
-                embedding = embedding,
+                embedding = lambda ids: self.embedding_lookup(embedding, ids),
                 start_tokens = tf.tile(
                     tf.constant([self.params['<start>']], dtype=tf.int32), [self.batch_size]),
                 end_token = self.params['<end>'])
@@ -172,8 +171,10 @@ class MemoryNetwork:
             rnn_size, kernel_initializer=tf.orthogonal_initializer(), reuse=reuse)
 
 
-    def zero_index_pad(self, embedding):
-        return tf.concat((tf.zeros([1, args.embed_dim]), embedding[1:, :]), axis=0)
+    def embedding_lookup(self, embedding, ids):
+        # index 0 is padding, its looked-up rows are zeroed instead of copying the table with a zero first row
+        outputs = tf.nn.embedding_lookup(embedding, ids)
+        return outputs * tf.expand_dims(tf.to_float(tf.not_equal(ids, 0)), -1)
 
 
     def position_encoding(self, sentence_size, embedding_size):
@@ -3,6 +3,7 @@ from data import DataLoader
 from model import MemoryNetwork
 
 import tensorflow as tf
+from session_config import new_session
 import numpy as np
 import json
 
@@ -15,7 +16,7 @@ def main():
         is_training=False, vocab=train_dl.vocab, params=train_dl.params)
 
     model = MemoryNetwork(train_dl.params)
-    sess = tf.Session()
+    sess = new_session()
     sess.run(tf.global_variables_initializer())
 
     n_batch = train_dl.data['size'] // args.batch_size
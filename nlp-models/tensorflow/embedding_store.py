@@ -0,0 +1,168 @@
+"""
+Single-file binary store for trained embeddings
+
+Layout (little endian, every section starts at a multiple of ALIGN bytes):
+    header   magic, version, vocab_size, dim, dtype code, vocab byte length
+    vocab    utf-8 words joined by '\n', line number == row index
+    scales   float32[vocab_size], int8 only: row i is stored as round(v / scales[i])
+    matrix   [vocab_size, dim] of float32 / float16 / int8
+"""
+import struct
+import numpy as np
+import tensorflow as tf
+
+
+MAGIC = b'FEMB'
+VERSION = 1
+ALIGN = 64
+HEADER = struct.Struct('<4sIQQIQ')
+DTYPES = {0: np.float32, 1: np.float16, 2: np.int8}
+DTYPE_CODES = {'float32': 0, 'float16': 1, 'int8': 2}
+
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save(path, words, matrix, dtype='float32'):
+    """
+    Parameters:
+    -----------
+    path: str
+        Output file
+    words: list of str or dict
+        Row labels, or an idx2word dict
+    matrix: 2D array
+        [vocab_size, dim] embedding matrix
+    dtype: str
+        'float32', 'float16' or 'int8' (per-row symmetric quantization)
+    """
+    if isinstance(words, dict):
+        words = [words[i] for i in range(len(words))]
+    matrix = np.asarray(matrix, np.float32)
+    if len(words) != matrix.shape[0]:
+        raise ValueError("%d words for a matrix of %d rows" % (len(words), matrix.shape[0]))
+    if matrix.size == 0: # np.memmap cannot map an empty matrix, such a store could not be opened
+        raise ValueError("Nothing to save, the matrix is %d x %d" % matrix.shape)
+    vocab = u'\n'.join(words).encode('utf-8')
+    code = DTYPE_CODES[dtype]
+
+    scales = None
+    if dtype == 'int8':
+        scales = np.abs(matrix).max(1) / 127.0
+        scales[scales == 0] = 1.0
+        matrix = np.round(matrix / scales[:, np.newaxis])
+    matrix = matrix.astype(DTYPES[code])
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, matrix.shape[0], matrix.shape[1], code, len(vocab)))
+        f.write(vocab)
+        if scales is not None:
+            f.seek(_aligned(f.tell()))
+            f.write(scales.astype(np.float32).tobytes())
+        f.seek(_aligned(f.tell()))
+        f.write(matrix.tobytes())
+
+
+def export(sess, path, words, var_name='encoder', dtype='float32'):
+    """
+    Writes a trained embedding variable to path, e.g. 'embedding' for SkipGram / CBOW,
+    'encoder' for the classifiers, '.../lookup_table' for models built on utils.embed_seq
+    """
+    var = [v for v in tf.global_variables() if v.op.name == var_name]
+    if len(var) != 1:
+        raise ValueError("Expected one variable named %s, found %d" % (var_name, len(var)))
+    save(path, words, sess.run(var[0]), dtype)
+
+
+class EmbeddingStore:
+    def __init__(self, path):
+        """
+        The matrix is memory-mapped, rows are only read (and dequantized) when looked up
+        """
+        with open(path, 'rb') as f:
+            magic, version, vocab_size, dim, code, vocab_len = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("%s is not an embedding store (version %d)" % (path, VERSION))
+            vocab = f.read(vocab_len).decode('utf-8')
+        self.idx2word = vocab.split(u'\n') if vocab_size > 0 else []
+        self.word2idx = {w: i for i, w in enumerate(self.idx2word)}
+        self.vocab_size = vocab_size
+        self.dim = dim
+        self.dtype = DTYPES[code]
+
+        offset = _aligned(HEADER.size + vocab_len)
+        self.scales = None
+        if self.dtype == np.int8:
+            self.scales = np.memmap(path, np.float32, 'r', offset, (vocab_size,))
+            offset = _aligned(offset + 4*vocab_size)
+        self.matrix = np.memmap(path, self.dtype, 'r', offset, (vocab_size, dim))
+    # end constructor
+
+
+    def __len__(self):
+        return self.vocab_size
+    # end method __len__
+
+
+    def __contains__(self, word):
+        return word in self.word2idx
+    # end method __contains__
+
+
+    def __getitem__(self, word):
+        return self.rows([self.word2idx[word]])[0]
+    # end method __getitem__
+
+
+    def rows(self, indices):
+        indices = np.asarray(indices)
+        rows = self.matrix[indices].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[indices][:, np.newaxis]
+        return rows
+    # end method rows
+
+
+    def lookup(self, words, default=None):
+        """
+        Returns [len(words), dim], words out of vocab map to the row of `default` (zeros if None)
+        """
+        fallback = self.word2idx.get(default, -1)
+        indices = np.array([self.word2idx.get(w, fallback) for w in words])
+        out = np.zeros([len(indices), self.dim], np.float32)
+        found = indices >= 0
+        if found.any():
+            out[found] = self.rows(indices[found])
+        return out
+    # end method lookup
+
+
+    def most_similar(self, word, top_k=5, chunk_size=65536):
+        # cosine similarity, scanned chunk by chunk so only one chunk is dequantized at a time
+        query = self[word]
+        query /= np.linalg.norm(query) + 1e-12
+        sims = np.empty(self.vocab_size, np.float32)
+        for i in range(0, self.vocab_size, chunk_size):
+            chunk = self.rows(np.arange(i, min(i+chunk_size, self.vocab_size)))
+            sims[i : i+len(chunk)] = chunk.dot(query) / (np.linalg.norm(chunk, axis=1) + 1e-12)
+        sims[self.word2idx[word]] = -np.inf
+        best = np.argsort(-sims)[:top_k]
+        return [(self.idx2word[i], float(sims[i])) for i in best]
+    # end method most_similar
+
+
+    def warm_start(self, sess, var, word2idx):
+        """
+        Loads the stored vectors into `var` for the words of the target vocab that are found here,
+        rows of unseen words keep their current values
+        """
+        value = sess.run(var)
+        target = np.array([i for w, i in word2idx.items() if w in self.word2idx])
+        source = np.array([self.word2idx[w] for w, i in word2idx.items() if w in self.word2idx])
+        if len(target) > 0:
+            value[target] = self.rows(source)
+        var.load(value, sess)
+        return len(target)
+    # end method warm_start
+# end class
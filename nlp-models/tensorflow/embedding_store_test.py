@@ -0,0 +1,30 @@
+import os
+import time
+import string
+import numpy as np
+from word2vec_skipgram import SkipGram
+from embedding_store import EmbeddingStore, save
+
+
+if __name__ == '__main__':
+    with open('temp/ptb_train.txt') as f:
+        text = f.read()
+    sample_words = ['six', 'gold', 'japan', 'college']
+
+    model = SkipGram(text, sample_words, useless_words=string.punctuation)
+    model.fit(n_epoch=1)
+
+    for dtype in ['float32', 'float16', 'int8']:
+        path = './temp/skipgram_%s.emb' % dtype
+        model.export_embedding(path, dtype)
+        t0 = time.time()
+        store = EmbeddingStore(path)
+        print('%s | %.1f KB | loaded in %.2f ms' % (dtype, os.path.getsize(path)/1024, 1000*(time.time()-t0)))
+        for word in sample_words:
+            print('Nearest to [%s]: %s' % (word, ', '.join(w for w, _ in store.most_similar(word))))
+
+    try:
+        save('./temp/empty.emb', [], np.zeros([0, 8]))
+        raise AssertionError("an empty vocabulary was saved")
+    except ValueError as e:
+        print('Empty vocabulary | %s' % e)
@@ -1,13 +1,14 @@
 from tensorflow.python.layers import core as core_layers
 import tensorflow as tf
 import numpy as np
+from session_config import new_session
 
 
 class Image2Seq:
     def __init__(self, img_size, word2idx,
                  img_ch=3, data_format='channels_last', kernel_size=(5,5), pool_size=(2,2), padding='valid',
                  embedding_dim=256, rnn_size=256, n_layers=2, grad_clip=5.,
-                 sess=tf.Session()):
+                 sess=None):
         self.img_size = img_size
         self.word2idx = word2idx
         self.embedding_dim = embedding_dim
@@ -22,7 +23,7 @@ class Image2Seq:
         self.n_layers = n_layers
         self.grad_clip = grad_clip
 
-        self.sess = sess
+        self.sess = new_session() if sess is None else sess
         self.build_graph()
     # end constructor
 
@@ -1,6 +1,7 @@
 from tensorflow.python.layers import core as core_layers
 import tensorflow as tf
 import numpy as np
+from session_config import new_session
 
 
 class Image2Seq:
@@ -8,7 +9,7 @@ class Image2Seq:
                  img_ch=3, data_format='channels_last', kernel_size=(5,5), pool_size=(2,2), padding='valid',
                  embedding_dim=256, rnn_size=256, n_layers=2, grad_clip=5.,
                  force_teaching_ratio=0.8, beam_width=5,
-                 sess=tf.Session()):
+                 sess=None):
         self.img_size = img_size
         self.word2idx = word2idx
         self.embedding_dim = embedding_dim
@@ -25,7 +26,7 @@ class Image2Seq:
         self.force_teaching_ratio = force_teaching_ratio
         self.beam_width = beam_width
 
-        self.sess = sess
+        self.sess = new_session() if sess is None else sess
         self._pointer = None
         self._img_size = self.img_size
         self._n_filter = None
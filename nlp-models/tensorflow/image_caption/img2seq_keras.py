@@ -1,13 +1,14 @@
 from tensorflow.python.layers import core as core_layers
 import tensorflow as tf
 import numpy as np
+from session_config import new_session
 
 
 class Image2Seq:
     def __init__(self, img_size, word2idx, img_ch=3,
                  embedding_dim=256, rnn_size=256, n_layers=2, grad_clip=5.,
                  force_teaching_ratio=0.8, beam_width=5,
-                 sess=tf.Session()):
+                 sess=None):
         self.img_size = img_size
         self.img_ch = img_ch
         self.word2idx = word2idx
@@ -19,7 +20,7 @@ class Image2Seq:
         self.force_teaching_ratio = force_teaching_ratio
         self.beam_width = beam_width
 
-        self.sess = sess
+        self.sess = new_session() if sess is None else sess
         self._pointer = None
         self._img_size = self.img_size
         self._n_filter = None
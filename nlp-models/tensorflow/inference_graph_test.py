@@ -0,0 +1,37 @@
+from __future__ import print_function
+from rnn_text_clf import RNNTextClassifier
+from inference_graph import InferenceGraph
+import time
+import numpy as np
+import tensorflow as tf
+
+
+vocab_size = 20000
+batch_size = 32
+
+
+def sort_by_len(x, y):
+    idx = sorted(range(len(x)), key=lambda i: len(x[i]))
+    return x[idx], y[idx]
+
+
+if __name__ == '__main__':
+    (X_train, y_train), (X_test, y_test) = tf.keras.datasets.imdb.load_data(num_words=vocab_size)
+    X_train, y_train = sort_by_len(X_train, y_train)
+    X_test, y_test = sort_by_len(X_test, y_test)
+
+    clf = RNNTextClassifier(vocab_size, 2)
+    clf.fit(X_train, y_train, n_epoch=1, batch_size=batch_size, keep_prob=0.8, en_exp_decay=True)
+    y_pred = clf.predict(X_test, batch_size)
+    clf.export_inference_graph('./temp/rnn_text_clf.pb')
+
+    t0 = time.time()
+    graph = InferenceGraph('./temp/rnn_text_clf.pb')
+    print("Frozen graph loaded in %.1f ms" % (1000 * (time.time() - t0)))
+
+    frozen_pred = []
+    for X_batch, X_batch_lens in clf.next_batch(X_test, batch_size):
+        frozen_pred.append(graph.run('logits', {'X': X_batch, 'X_seq_lens': X_batch_lens}).argmax(1))
+    frozen_pred = np.concatenate(frozen_pred)
+    print("Same predictions as the training graph: %s" % np.array_equal(y_pred, frozen_pred))
+    print("final testing accuracy: %.4f" % (frozen_pred == y_test).mean())
@@ -3,11 +3,14 @@ import tensorflow as tf
 import numpy as np
 import math
 import sklearn
+from inference_graph import export_inference_graph
+from session_config import new_session, jit_scope
+from train_metrics import step_runner
 
 
 class Conv1DClassifier:
-    def __init__(self, seq_len, vocab_size, n_out, sess=tf.Session(),
-                 n_filters=250, embedding_dims=50, padding='valid', top_k=5):
+    def __init__(self, seq_len, vocab_size, n_out, sess=None,
+                 n_filters=250, embedding_dims=50, padding='valid', top_k=5, jit=False):
         """
         Parameters:
         -----------
@@ -26,7 +29,9 @@ class Conv1DClassifier:
         n_out: int
             Output dimensions
         sess: object
-            tf.Session() object 
+            tf.Session() object, by default a new one from session_config.new_session()
+        jit: boolean
+            Compile the graph with XLA, see session_config.jit_scope
         """
         self.seq_len = seq_len
         self.vocab_size = vocab_size
@@ -35,9 +40,11 @@ class Conv1DClassifier:
         self.padding = padding
         self.n_out = n_out
         self.top_k = top_k
-        self.sess = sess
+        self.jit = jit
+        self.sess = new_session() if sess is None else sess
         self._pointer = None
-        self.build_graph()
+        with jit_scope(self.jit):
+            self.build_graph()
     # end constructor
 
 
@@ -123,7 +130,8 @@ class Conv1DClassifier:
 
 
     def fit(self, X, Y, val_data=None, n_epoch=10, batch_size=128, keep_prob=0.8, en_exp_decay=True,
-            en_shuffle=True):
+            en_shuffle=True, profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr)
         if val_data is None:
             print("Train %d samples" % len(X))
         else:
@@ -140,9 +148,9 @@ class Conv1DClassifier:
             for X_batch, Y_batch in zip(self.gen_batch(X, batch_size),
                                         self.gen_batch(Y, batch_size)): # batch training
                 lr = self.decrease_lr(en_exp_decay, global_step, n_epoch, len(X), batch_size) 
-                _, loss, acc = self.sess.run([self.train_op, self.loss, self.acc],
-                                             {self.X:X_batch, self.Y:Y_batch,
-                                              self.lr:lr, self.keep_prob:keep_prob})
+                _, loss, acc = run([self.train_op, self.loss, self.acc],
+                                   {self.X:X_batch, self.Y:Y_batch,
+                                    self.lr:lr, self.keep_prob:keep_prob})
                 local_step += 1
                 global_step += 1
                 if local_step % 50 == 0:
@@ -159,6 +167,7 @@ class Conv1DClassifier:
                     val_loss_list.append(v_loss)
                     val_acc_list.append(v_acc)
                 val_loss, val_acc = self.list_avg(val_loss_list), self.list_avg(val_acc_list)
+                run.pause()
 
             # append to log
             log['loss'].append(loss)
@@ -189,6 +198,14 @@ class Conv1DClassifier:
     # end method predict
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X},
+            outputs = {'logits': self.logits},
+            constants = {self.keep_prob: 1.0})
+    # end method export_inference_graph
+
+
     def gen_batch(self, arr, batch_size):
         for i in range(0, len(arr), batch_size):
             yield arr[i : i+batch_size]
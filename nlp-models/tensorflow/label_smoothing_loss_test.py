@@ -0,0 +1,55 @@
+import time
+import numpy as np
+import tensorflow as tf
+from session_config import new_session
+from utils import label_smoothing, label_smoothing_sequence_loss
+
+
+BATCH_SIZE = 64
+SEQ_LEN = 30
+VOCAB_SIZE = 20000
+
+
+def one_hot_sequence_loss(logits, targets, weights, label_depth, average_across_timesteps, average_across_batch):
+    # the dense reference: softmax cross entropy against smoothed one-hot targets
+    targets = label_smoothing(tf.one_hot(targets, depth=label_depth))
+    crossent = tf.nn.softmax_cross_entropy_with_logits(labels=targets, logits=logits) * weights
+    if average_across_timesteps and average_across_batch:
+        return tf.reduce_sum(crossent) / (tf.reduce_sum(weights) + 1e-12)
+    if average_across_timesteps:
+        return tf.reduce_sum(crossent, 1) / (tf.reduce_sum(weights, 1) + 1e-12)
+    if average_across_batch:
+        return tf.reduce_sum(crossent, 0) / (tf.reduce_sum(weights, 0) + 1e-12)
+    return crossent
+
+
+def timeit(sess, op, n_runs=20):
+    sess.run(op)
+    t0 = time.time()
+    for _ in range(n_runs):
+        sess.run(op)
+    return 1000 * (time.time() - t0) / n_runs
+
+
+if __name__ == '__main__':
+    logits = tf.Variable(3 * np.random.randn(BATCH_SIZE, SEQ_LEN, VOCAB_SIZE).astype(np.float32))
+    targets = tf.constant(np.random.randint(0, VOCAB_SIZE, [BATCH_SIZE, SEQ_LEN]))
+    lens = np.random.randint(1, SEQ_LEN+1, BATCH_SIZE)
+    weights = tf.constant((np.arange(SEQ_LEN)[np.newaxis, :] < lens[:, np.newaxis]).astype(np.float32))
+
+    sess = new_session()
+    sess.run(tf.global_variables_initializer())
+    for across_timesteps, across_batch in [(True, True), (True, False), (False, True), (False, False)]:
+        ref = one_hot_sequence_loss(logits, targets, weights, VOCAB_SIZE, across_timesteps, across_batch)
+        new = label_smoothing_sequence_loss(logits, targets, weights, VOCAB_SIZE, across_timesteps, across_batch)
+        ref_grad, new_grad = tf.gradients(tf.reduce_sum(ref), logits)[0], tf.gradients(tf.reduce_sum(new), logits)[0]
+        ref_val, new_val, ref_g, new_g = sess.run([ref, new, ref_grad, new_grad])
+        print("average_across_timesteps=%s, average_across_batch=%s | max loss diff: %.2e | max grad diff: %.2e" % (
+            across_timesteps, across_batch, np.abs(ref_val - new_val).max(), np.abs(ref_g - new_g).max()))
+        assert np.allclose(ref_val, new_val, rtol=1e-4, atol=1e-5)
+        assert np.allclose(ref_g, new_g, rtol=1e-4, atol=1e-6)
+
+    ref_train = tf.gradients(one_hot_sequence_loss(logits, targets, weights, VOCAB_SIZE, True, True), logits)
+    new_train = tf.gradients(label_smoothing_sequence_loss(logits, targets, weights, VOCAB_SIZE), logits)
+    print("one-hot loss + grad: %.1f ms" % timeit(sess, ref_train))
+    print("closed-form loss + grad: %.1f ms" % timeit(sess, new_train))
@@ -3,11 +3,14 @@ import numpy as np
 import math
 from sklearn.utils import shuffle
 from utils import embed_seq, learned_positional_encoding, pointwise_feedforward, layer_norm
+from inference_graph import export_inference_graph
+from session_config import new_session, jit_scope, no_jit_scope
+from train_metrics import step_runner
 
 
 class Tagger:
     def __init__(self, vocab_size, n_out, seq_len,
-                 dropout_rate=0.1, hidden_units=128, num_heads=8, num_blocks=1, sess=tf.Session()):
+                 dropout_rate=0.1, hidden_units=128, num_heads=8, num_blocks=1, sess=None, jit=False):
         self.vocab_size = vocab_size
         self.n_out = n_out
         self.seq_len = seq_len
@@ -15,9 +18,11 @@ class Tagger:
         self.hidden_units = hidden_units
         self.num_heads = num_heads
         self.num_blocks = num_blocks
-        self.sess = sess
+        self.jit = jit
+        self.sess = new_session() if sess is None else sess
         self._pointer = None
-        self.build_graph()
+        with jit_scope(self.jit):
+            self.build_graph()
     # end constructor
 
 
@@ -64,15 +69,16 @@ class Tagger:
 
 
     def add_crf_layer(self):
-        with tf.variable_scope('crf_loss'):
-            self.log_likelihood, _ = tf.contrib.crf.crf_log_likelihood(
-                inputs = self.logits,
-                tag_indices = self.Y,
-                sequence_lengths = self.X_seq_len)
-        with tf.variable_scope('crf_loss', reuse=True):
-            transition_params = tf.get_variable('transitions', [self.n_out, self.n_out])
-        self.viterbi_sequence, _ = tf.contrib.crf.crf_decode(
-            self.logits, transition_params, self.X_seq_len)
+        with no_jit_scope():
+            with tf.variable_scope('crf_loss'):
+                self.log_likelihood, _ = tf.contrib.crf.crf_log_likelihood(
+                    inputs = self.logits,
+                    tag_indices = self.Y,
+                    sequence_lengths = self.X_seq_len)
+            with tf.variable_scope('crf_loss', reuse=True):
+                transition_params = tf.get_variable('transitions', [self.n_out, self.n_out])
+            self.viterbi_sequence, _ = tf.contrib.crf.crf_decode(
+                self.logits, transition_params, self.X_seq_len)
     # end method add_crf_layer
 
 
@@ -83,7 +89,9 @@ class Tagger:
     # end method add_backward_path
 
 
-    def fit(self, X, Y, val_data, n_epoch=10, batch_size=128, en_exp_decay=True, en_shuffle=True):
+    def fit(self, X, Y, val_data, n_epoch=10, batch_size=128, en_exp_decay=True, en_shuffle=True,
+            profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr)
         global_step = 0
         self.sess.run(tf.global_variables_initializer()) # initialize all variables
         for epoch in range(n_epoch): # batch training
@@ -93,10 +101,10 @@ class Tagger:
             for local_step, (X_batch, Y_batch) in enumerate(zip(self.gen_batch(X, batch_size),
                                                                 self.gen_batch(Y, batch_size))):
                 lr = self.decrease_lr(en_exp_decay, global_step, n_epoch, len(X), batch_size)           
-                _, loss, acc = self.sess.run([self.train_op, self.loss, self.acc],
-                                             {self.X: X_batch, self.Y: Y_batch, self.lr: lr,
-                                              self.X_seq_len: [X.shape[1]]*len(X_batch),
-                                              self.is_training: True})
+                _, loss, acc = run([self.train_op, self.loss, self.acc],
+                                   {self.X: X_batch, self.Y: Y_batch, self.lr: lr,
+                                    self.X_seq_len: [X.shape[1]]*len(X_batch),
+                                    self.is_training: True})
                 global_step += 1
                 if local_step % 50 == 0:
                     print ('Epoch %d/%d | Step %d/%d | train_loss: %.4f | train_acc: %.4f | lr: %.4f'
@@ -108,6 +116,7 @@ class Tagger:
             y_pred = self.predict(X_test, batch_size=batch_size)
             final_acc = (y_pred == Y_test).astype(np.float32).mean()
             print("final testing accuracy: %.4f" % final_acc)
+            run.pause()
     # end method fit
 
 
@@ -132,6 +141,14 @@ class Tagger:
     # end method infer
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X, 'X_seq_len': self.X_seq_len},
+            outputs = {'viterbi_sequence': self.viterbi_sequence},
+            constants = {self.is_training: False})
+    # end method export_inference_graph
+
+
     def gen_batch(self, arr, batch_size):
         for i in range(0, len(arr), batch_size):
             yield arr[i : i+batch_size]
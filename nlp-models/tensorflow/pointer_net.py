@@ -1,16 +1,19 @@
 import tensorflow as tf
 import numpy as np
+from inference_graph import export_inference_graph
+from session_config import new_session
+from train_metrics import step_runner
 
 
 class PointerNetwork:
     def __init__(self, max_len, rnn_size, X_word2idx, embedding_dim,
-                 sess=tf.Session(), grad_clip=5.0):
+                 sess=None, grad_clip=5.0):
         self.max_len = max_len
         self.rnn_size = rnn_size
         self.grad_clip = grad_clip
         self.X_word2idx = X_word2idx
         self.embedding_dim = embedding_dim
-        self.sess = sess
+        self.sess = new_session() if sess is None else sess
         self.register_symbols()
         self.build_graph()
     # end constructor
@@ -105,7 +108,9 @@ class PointerNetwork:
     # end method add_backward_path
 
 
-    def fit(self, X_train, X_train_len, Y_train, Y_train_len, val_data, n_epoch=50, display_step=50, batch_size=128):
+    def fit(self, X_train, X_train_len, Y_train, Y_train_len, val_data, n_epoch=50, display_step=50, batch_size=128,
+            profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, pad_int=self._x_pad)
         X_test_batch, X_test_batch_lens, Y_test_batch, Y_test_batch_lens = val_data
         self.sess.run(tf.global_variables_initializer())
 
@@ -113,10 +118,10 @@ class PointerNetwork:
             for local_step, (X_train_batch, X_train_batch_lens, Y_train_batch, Y_train_batch_lens) in enumerate(
                 zip(self.gen_batch(X_train, batch_size), self.gen_batch(X_train_len, batch_size),
                     self.gen_batch(Y_train, batch_size), self.gen_batch(Y_train_len, batch_size))):
-                _, loss = self.sess.run([self.train_op, self.loss], {self.X: X_train_batch,
-                                                                     self.Y: Y_train_batch,
-                                                                     self.X_seq_len: X_train_batch_lens,
-                                                                     self.Y_seq_len: Y_train_batch_lens})
+                _, loss = run([self.train_op, self.loss], {self.X: X_train_batch,
+                                                           self.Y: Y_train_batch,
+                                                           self.X_seq_len: X_train_batch_lens,
+                                                           self.Y_seq_len: Y_train_batch_lens})
                 if local_step % display_step == 0:
                     val_loss = self.sess.run(self.loss, {self.X: X_test_batch,
                                                          self.Y: Y_test_batch,
@@ -124,29 +129,73 @@ class PointerNetwork:
                                                          self.Y_seq_len: Y_test_batch_lens})
                     print("Epoch %d/%d | Batch %d/%d | train_loss: %.3f | test_loss: %.3f"
                         % (epoch, n_epoch, local_step, len(X_train)//batch_size, loss, val_loss))
+                    run.pause()
     # end method fit
 
 
-    def infer(self, input_word, X_idx2word, batch_size=128):        
-        source = [self.X_word2idx.get(char, self._x_unk) for char in input_word] + [self._x_eos]
-        seq_len = len(source)
-        _input = source + [self._x_pad]*(self.max_len-seq_len)
-        out_indices = self.sess.run(self.predicting_ids, {
-            self.X: [_input],
-            self.X_seq_len: [seq_len]})[0]
+    def predict(self, sequences, batch_size=128):
+        """
+        Decodes many inputs together, each padded to max_len, one sess.run per batch
+
+        Parameters:
+        -----------
+        sequences: list
+            Input id lists without <EOS>, at most max_len-1 ids each
+        batch_size: int
+            Number of inputs decoded in one sess.run
+        Returns:
+        -----------
+        perms: list of 1D arrays, the pointed positions (<EOS> included) of each input
+        outputs: list of 1D arrays, the input ids gathered in the pointed order
+        valid: 1D bool array, True where the pointers use every position exactly once
+        """
+        sources = [list(seq) + [self._x_eos] for seq in sequences]
+        seq_lens = np.array([len(source) for source in sources])
+        if seq_lens.max() > self.max_len:
+            raise ValueError("Inputs must be shorter than max_len (%d)" % self.max_len)
+        padded = np.full([len(sources), self.max_len], self._x_pad, np.int32)
+        for i, source in enumerate(sources):
+            padded[i, :len(source)] = source
+
+        pointers = np.concatenate([self.sess.run(self.predicting_ids, {
+            self.X: padded[i : i+batch_size],
+            self.X_seq_len: seq_lens[i : i+batch_size]}) for i in range(0, len(sources), batch_size)])
+
+        # a valid permutation points inside the input and hits each of its positions once
+        steps = np.arange(self.max_len)[np.newaxis, :] < seq_lens[:, np.newaxis]
+        counts = np.zeros([len(sources), self.max_len], np.int32)
+        rows = np.repeat(np.arange(len(sources))[:, np.newaxis], self.max_len, 1)
+        np.add.at(counts, (rows[steps], pointers[steps]), 1)
+        valid = np.all((counts == 1) == steps, 1)
+
+        perms = [pointers[i, :n] for i, n in enumerate(seq_lens)]
+        outputs = [padded[i, perm] for i, perm in enumerate(perms)]
+        return perms, outputs, valid
+    # end method predict
+
+
+    def infer(self, input_word, X_idx2word):
+        source = [self.X_word2idx.get(char, self._x_unk) for char in input_word]
+        _, outputs, _ = self.predict([source])
+        source = source + [self._x_eos]
+        output = [X_idx2word[i] for i in outputs[0]]
         
         print('\nSource')
-        #print('Word: {}'.format([i for i in source]))
         print('IN: {}'.format(' '.join([X_idx2word[i] for i in source])))
         
         print('\nTarget')
-        #print('Word: {}'.format([i for i in out_indices]))
-        idx = out_indices[:len(source)]
-        output = np.array(source)[idx]
-        print('OUT: {}'.format(' '.join([X_idx2word[i] for i in output])))
+        print('OUT: {}'.format(' '.join(output)))
+        return output
     # end method infer
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X, 'X_seq_len': self.X_seq_len},
+            outputs = {'predicting_ids': self.predicting_ids})
+    # end method export_inference_graph
+
+
     def gen_batch(self, arr, batch_size):
         for i in range(0, len(arr), batch_size):
             yield arr[i : i+batch_size]
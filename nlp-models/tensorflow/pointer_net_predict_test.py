@@ -0,0 +1,30 @@
+import time
+import numpy as np
+from pointer_net import PointerNetwork
+from pointer_net_test import preprocess_data, train_test_split
+
+
+if __name__ == '__main__':
+    BATCH_SIZE = 128
+    MAX_LEN = 15
+    X_indices, X_seq_len, Y_indices, Y_seq_len, X_char2idx, X_idx2char = preprocess_data(MAX_LEN)
+    (X_train, X_train_len, Y_train, Y_train_len), (X_test, X_test_len, Y_test, Y_test_len) \
+        = train_test_split(X_indices, X_seq_len, Y_indices, Y_seq_len, BATCH_SIZE)
+
+    model = PointerNetwork(max_len=MAX_LEN, rnn_size=50, X_word2idx=X_char2idx, embedding_dim=15)
+    model.fit(X_train, X_train_len, Y_train, Y_train_len,
+        val_data=(X_test, X_test_len, Y_test, Y_test_len), batch_size=BATCH_SIZE, n_epoch=10)
+
+    # inputs without <EOS>, as a sorting service would receive them
+    sequences = [list(x[:n-1]) for x, n in zip(X_indices, X_seq_len)][:10000]
+    perms, outputs, valid = model.predict(sequences[:BATCH_SIZE])
+    correct = [np.array_equal(perm, y[:len(perm)]) for perm, y in zip(perms, Y_test)]
+    print("valid permutations: %.1f%% | exact: %.1f%%" % (100*valid.mean(), 100*np.mean(correct)))
+    for seq, out in list(zip(sequences, outputs))[:3]:
+        print('%s -> %s' % (''.join(X_idx2char[i] for i in seq), ''.join(X_idx2char[i] for i in out[:-1])))
+
+    for batch_size in [1, 16, 128, 1024]:
+        n_seqs = min(len(sequences), 100 * batch_size)
+        t0 = time.time()
+        model.predict(sequences[:n_seqs], batch_size)
+        print("batch_size %d | %.1f sequences/sec" % (batch_size, n_seqs / (time.time() - t0)))
@@ -0,0 +1,97 @@
+from __future__ import print_function
+from response_cache import ResponseCache, SharedMemoryBackend
+import subprocess
+import time
+import sys
+
+
+SHM_NAME = 'response_cache_test'
+
+
+def test_lru():
+    cache = ResponseCache(max_size=2)
+    cache.put(cache.make_key([1]), 'a')
+    cache.put(cache.make_key([2]), 'b')
+    cache.get(cache.make_key([1]))      # 1 is now the most recently used
+    cache.put(cache.make_key([3]), 'c') # evicts 2
+    assert cache.get(cache.make_key([2])) is None
+    assert cache.get(cache.make_key([1])) == 'a'
+    assert cache.get(cache.make_key([3])) == 'c'
+    print('LRU eviction | %s' % cache.stats())
+
+
+def test_ttl():
+    cache = ResponseCache(ttl=0.2)
+    key = cache.make_key([1, 2, 0, 0], beam_width=5)
+    cache.put(key, 'a')
+    assert cache.get(key) == 'a'
+    time.sleep(0.3)
+    assert cache.get(key) is None
+    print('TTL | %s' % cache.stats())
+
+
+def test_clear():
+    cache = ResponseCache(pad_id=0)
+    calls = []
+    compute = lambda xs: calls.append(len(xs)) or [sum(x) for x in xs]
+    assert cache.get_or_compute([[1, 2, 0], [1, 2], [3]], compute) == [3, 3, 3]
+    assert calls == [2] # padding stripped, [1, 2] decoded once
+    cache.clear()
+    cache.get_or_compute([[1, 2]], compute)
+    assert calls == [2, 1]
+    other = ResponseCache(namespace='another-model')
+    assert other.make_key([1, 2]) != ResponseCache().make_key([1, 2])
+    # two processes that cleared after loading different weights must not share keys
+    other.clear()
+    assert other.make_key([1, 2], checkpoint='ckpt-1') != other.make_key([1, 2], checkpoint='ckpt-2')
+    print('clear and namespace | %s' % cache.stats())
+
+
+def attach_and_put():
+    shared = SharedMemoryBackend(SHM_NAME)
+    assert shared.put(ResponseCache().make_key([4, 5, 6]), (time.time(), 'from worker'))
+    shared.close()
+
+
+def put_into_locked():
+    shared = SharedMemoryBackend(SHM_NAME)
+    assert not shared.put(ResponseCache().make_key([8, 9]), (time.time(), 'from worker'))
+    shared.close()
+
+
+def test_shared():
+    owner = SharedMemoryBackend(SHM_NAME, n_slots=64, slot_size=256, create=True)
+    try:
+        key = ResponseCache().make_key([4, 5, 6])
+        # a separate interpreter, with a resource tracker of its own like an independent worker process
+        assert subprocess.call([sys.executable, __file__, 'worker']) == 0
+        time.sleep(1.0) # a tracker cleans up after its process asynchronously
+        # the worker exited, the block must still be there for the others
+        cache = ResponseCache(shared=SharedMemoryBackend(SHM_NAME))
+        assert cache.get(key) == 'from worker'
+        assert cache.stats()['shared_hits'] == 1
+        cache.put(cache.make_key([7]), 'x' * 1000) # too large for a slot, kept locally only
+        assert owner.get(cache.make_key([7])) is None
+        # a writer holding the slot keeps the others out of it, their put is dropped
+        slot = owner._slot(cache.make_key([8, 9]))
+        assert owner.lock_slot(slot)
+        assert subprocess.call([sys.executable, __file__, 'locked']) == 0
+        owner.unlock_slot(slot)
+        assert owner.get(cache.make_key([8, 9])) is None
+        cache.shared.close()
+        print('shared get/put | %s' % cache.stats())
+    finally:
+        owner.close(unlink=True)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['worker']:
+        attach_and_put()
+        sys.exit(0)
+    if sys.argv[1:] == ['locked']:
+        put_into_locked()
+        sys.exit(0)
+    test_lru()
+    test_ttl()
+    test_clear()
+    test_shared()
@@ -3,11 +3,14 @@ import tensorflow as tf
 import sklearn
 import numpy as np
 import math
+from inference_graph import export_inference_graph
+from session_config import new_session, jit_scope, no_jit_scope
+from train_metrics import step_runner
 
 
 class RNNTextClassifier:
     def __init__(self, vocab_size, n_out, embedding_dims=128, cell_size=128, grad_clip=5.0,
-                 attn_size=50, sess=tf.Session()):
+                 attn_size=50, sess=None, jit=False):
         """
         Parameters:
         -----------
@@ -18,7 +21,9 @@ class RNNTextClassifier:
         n_out: int
             Output dimensions
         sess: object
-            tf.Session() object
+            tf.Session() object, by default a new one from session_config.new_session()
+        jit: boolean
+            Compile the graph with XLA, see session_config.jit_scope
         """
         self.vocab_size = vocab_size
         self.embedding_dims = embedding_dims
@@ -26,9 +31,11 @@ class RNNTextClassifier:
         self.grad_clip = grad_clip
         self.attn_size = attn_size
         self.n_out = n_out
-        self.sess = sess
+        self.jit = jit
+        self.sess = new_session() if sess is None else sess
         self._pointer = None
-        self.build_graph()
+        with jit_scope(self.jit):
+            self.build_graph()
     # end constructor
 
 
@@ -66,9 +73,10 @@ class RNNTextClassifier:
 
 
     def add_dynamic_rnn(self):       
-        self._pointer, self.final_state = tf.nn.dynamic_rnn(self.lstm_cell(), self._pointer,
-                                                            sequence_length=self.X_seq_lens,
-                                                            dtype=tf.float32)
+        with no_jit_scope():
+            self._pointer, self.final_state = tf.nn.dynamic_rnn(self.lstm_cell(), self._pointer,
+                                                                sequence_length=self.X_seq_lens,
+                                                                dtype=tf.float32)
     # end method add_dynamic_rnn
 
 
@@ -103,7 +111,9 @@ class RNNTextClassifier:
     # end method add_backward_path
 
 
-    def fit(self, X, Y, val_data=None, n_epoch=10, batch_size=128, en_exp_decay=True, keep_prob=1.0):
+    def fit(self, X, Y, val_data=None, n_epoch=10, batch_size=128, en_exp_decay=True, keep_prob=1.0,
+            profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr)
         if val_data is None:
             print("Train %d samples" % len(X) )
         else:
@@ -116,11 +126,11 @@ class RNNTextClassifier:
             for local_step, ((X_batch, X_batch_lens), Y_batch) in enumerate(zip(self.next_batch(X, batch_size),
                                                                                 self.gen_batch(Y, batch_size))):
                 lr = self.decrease_lr(en_exp_decay, global_step, n_epoch, len(X), batch_size)           
-                _, loss, acc = self.sess.run([self.train_op, self.loss, self.acc],
-                                             {self.X :X_batch, self.Y: Y_batch,
-                                              self.X_seq_lens: X_batch_lens,
-                                              self.lr: lr,
-                                              self.keep_prob: keep_prob})
+                _, loss, acc = run([self.train_op, self.loss, self.acc],
+                                   {self.X :X_batch, self.Y: Y_batch,
+                                    self.X_seq_lens: X_batch_lens,
+                                    self.lr: lr,
+                                    self.keep_prob: keep_prob})
                 global_step += 1
                 if local_step % 50 == 0:
                     print ("Epoch %d/%d | Step %d/%d | train_loss: %.4f | train_acc: %.4f | lr: %.4f"
@@ -137,6 +147,7 @@ class RNNTextClassifier:
                     val_loss_list.append(v_loss)
                     val_acc_list.append(v_acc)
                 val_loss, val_acc = self.list_avg(val_loss_list), self.list_avg(val_acc_list)
+                run.pause()
 
             # append to log
             log['loss'].append(loss)
@@ -170,6 +181,14 @@ class RNNTextClassifier:
     # end method predict
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X, 'X_seq_lens': self.X_seq_lens},
+            outputs = {'logits': self.logits},
+            constants = {self.keep_prob: 1.0})
+    # end method export_inference_graph
+
+
     def pad_sentence_batch(self, sentence_batch, pad_int=0):
         max_seq_len = max([len(sentence) for sentence in sentence_batch])
         padded_seqs = []
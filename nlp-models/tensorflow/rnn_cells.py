@@ -0,0 +1,126 @@
+"""
+Cell backends for the recurrent models, picked with the `cell_backend` constructor argument
+
+    'basic'  tf.nn.rnn_cell.LSTMCell / GRUCell, a handful of small ops per timestep
+    'block'  tf.contrib.rnn.LSTMBlockCell / GRUBlockCellV2, one fused kernel per timestep,
+             usable wherever an RNNCell is (MultiRNNCell, decoders, attention wrappers)
+    'fused'  tf.contrib.rnn.LSTMBlockFusedCell, one kernel for the whole sequence; only for encoder
+             runs where the full input is known up front (dynamic_lstm, bidirectional_dynamic_lstm,
+             stacked_dynamic_lstm),
+             cells stepped one timestep at a time fall back to 'block'
+
+The variables keep the names and layouts of the basic cells (lstm_cell/kernel, lstm_cell/bias,
+gru_cell/gates/kernel ...), so a checkpoint trained with one backend restores into another.
+The block kernels take no initializer argument, lstm_cell and gru_cell hand it to them through the variable
+scope their variables are created in, so it holds wherever the cell is used.
+"""
+import tensorflow as tf
+
+
+BACKENDS = ('basic', 'block', 'fused')
+
+
+def check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError("cell_backend must be one of %s, got %r" % (BACKENDS, backend))
+
+
+class _ScopeInitializer(object):
+    """
+    Mixed into the block cells: every call runs in the current variable scope with the given initializer,
+    the kernel is created by the first call and picks it up (the biases have initializers of their own)
+    """
+    def __call__(self, inputs, state, scope=None):
+        if self._kernel_initializer is None:
+            return super(_ScopeInitializer, self).__call__(inputs, state, scope)
+        with tf.variable_scope(tf.get_variable_scope(), initializer=self._kernel_initializer,
+                               auxiliary_name_scope=False):
+            return super(_ScopeInitializer, self).__call__(inputs, state, scope)
+# end class
+
+
+class LSTMBlockCell(_ScopeInitializer, tf.contrib.rnn.LSTMBlockCell):
+    def __init__(self, num_units, initializer=None, reuse=None):
+        super(LSTMBlockCell, self).__init__(num_units, reuse=reuse)
+        self._kernel_initializer = initializer
+# end class
+
+
+class GRUBlockCell(_ScopeInitializer, tf.contrib.rnn.GRUBlockCellV2):
+    def __init__(self, num_units, kernel_initializer=None, reuse=None):
+        super(GRUBlockCell, self).__init__(num_units, reuse=reuse)
+        self._kernel_initializer = kernel_initializer
+# end class
+
+
+def lstm_cell(num_units, backend='basic', initializer=None, reuse=None):
+    check_backend(backend)
+    if backend == 'basic':
+        return tf.nn.rnn_cell.LSTMCell(num_units, initializer=initializer, reuse=reuse)
+    return LSTMBlockCell(num_units, initializer, reuse)
+
+
+def gru_cell(num_units, backend='basic', kernel_initializer=None, reuse=None):
+    check_backend(backend)
+    if backend == 'basic':
+        return tf.nn.rnn_cell.GRUCell(num_units, kernel_initializer=kernel_initializer, reuse=reuse)
+    return GRUBlockCell(num_units, kernel_initializer, reuse) # there is no fused GRU over whole sequences
+
+
+def dynamic_lstm(inputs, sequence_length, num_units, backend='basic', initializer=None, initial_state=None,
+                 scope=None):
+    """
+    tf.nn.dynamic_rnn over a single lstm_cell: batch major inputs, returns (outputs, LSTMStateTuple),
+    outputs past sequence_length are zeros
+    """
+    check_backend(backend)
+    # re-entering the current scope only sets the default initializer, variable names are unchanged
+    with tf.variable_scope(tf.get_variable_scope(), initializer=initializer):
+        if backend != 'fused':
+            return tf.nn.dynamic_rnn(lstm_cell(num_units, backend, initializer), inputs, sequence_length,
+                                     initial_state, dtype=tf.float32, scope=scope)
+        with tf.variable_scope(scope or 'rnn'):
+            cell = tf.contrib.rnn.LSTMBlockFusedCell(num_units, name='lstm_cell')
+            outputs, (c, h) = cell(tf.transpose(inputs, [1, 0, 2]), initial_state, tf.float32, sequence_length)
+        return tf.transpose(outputs, [1, 0, 2]), tf.nn.rnn_cell.LSTMStateTuple(c, h)
+
+
+def bidirectional_dynamic_lstm(inputs, sequence_length, num_units, backend='basic', initializer=None, scope=None):
+    """
+    tf.nn.bidirectional_dynamic_rnn over two lstm_cells, returns ((out_fw, out_bw), (state_fw, state_bw))
+    """
+    check_backend(backend)
+    if backend != 'fused':
+        with tf.variable_scope(tf.get_variable_scope(), initializer=initializer):
+            return tf.nn.bidirectional_dynamic_rnn(
+                lstm_cell(num_units, backend, initializer), lstm_cell(num_units, backend, initializer),
+                inputs, sequence_length, dtype=tf.float32, scope=scope)
+    if sequence_length is None:
+        sequence_length = tf.fill([tf.shape(inputs)[0]], tf.shape(inputs)[1])
+    with tf.variable_scope(scope or 'bidirectional_rnn'):
+        out_fw, state_fw = dynamic_lstm(inputs, sequence_length, num_units, backend, initializer, scope='fw')
+        reversed_inputs = tf.reverse_sequence(inputs, sequence_length, seq_axis=1, batch_axis=0)
+        out_bw, state_bw = dynamic_lstm(reversed_inputs, sequence_length, num_units, backend, initializer,
+                                        scope='bw')
+        out_bw = tf.reverse_sequence(out_bw, sequence_length, seq_axis=1, batch_axis=0)
+    return (out_fw, out_bw), (state_fw, state_bw)
+
+
+def stacked_dynamic_lstm(inputs, sequence_length, num_units, n_layers, backend='basic', initializer=None,
+                         scope=None):
+    """
+    tf.nn.dynamic_rnn over a MultiRNNCell of n_layers lstm_cells, returns (outputs, tuple of LSTMStateTuple)
+    """
+    check_backend(backend)
+    with tf.variable_scope(tf.get_variable_scope(), initializer=initializer):
+        if backend != 'fused':
+            cell = tf.nn.rnn_cell.MultiRNNCell([lstm_cell(num_units, backend, initializer) for _ in range(n_layers)])
+            return tf.nn.dynamic_rnn(cell, inputs, sequence_length, dtype=tf.float32, scope=scope)
+        states = []
+        with tf.variable_scope(scope or 'rnn'):
+            for n in range(n_layers):
+                # same variable names as the layers of a MultiRNNCell
+                inputs, state = dynamic_lstm(inputs, sequence_length, num_units, backend, initializer,
+                                             scope='multi_rnn_cell/cell_%d' % n)
+                states.append(state)
+        return inputs, tuple(states)
@@ -0,0 +1,95 @@
+from __future__ import print_function
+from rnn_text_clf import RNNTextClassifier
+from birnn_crf_clf import BiRNN_CRF
+from seq2seq import Seq2Seq
+from rnn_cells import lstm_cell, gru_cell
+from session_config import new_session
+import time
+import numpy as np
+import tensorflow as tf
+
+
+VOCAB_SIZE = 10000
+BATCH_SIZE = 64
+SEQ_LEN = 100
+N_STEPS = 50
+
+
+def random_batch(vocab_size):
+    X = np.random.randint(1, vocab_size, [BATCH_SIZE, SEQ_LEN])
+    X_lens = np.random.randint(SEQ_LEN // 2, SEQ_LEN + 1, BATCH_SIZE)
+    X[np.arange(SEQ_LEN)[np.newaxis, :] >= X_lens[:, np.newaxis]] = 0
+    return X, X_lens
+
+
+def build(name, backend):
+    if name == 'rnn_text_clf':
+        model = RNNTextClassifier(VOCAB_SIZE, 2, cell_backend=backend)
+        X, X_lens = random_batch(VOCAB_SIZE)
+        feed = {model.X: X, model.X_seq_lens: X_lens, model.Y: np.random.randint(0, 2, BATCH_SIZE),
+                model.keep_prob: 1.0, model.lr: 1e-3}
+        return model, feed, model.logits
+    if name == 'birnn_crf_clf':
+        model = BiRNN_CRF(VOCAB_SIZE, 10, cell_backend=backend)
+        X, X_lens = random_batch(VOCAB_SIZE)
+        feed = {model.X: X, model.X_seq_len: X_lens, model.Y: np.random.randint(0, 10, [BATCH_SIZE, SEQ_LEN]),
+                model.keep_prob: 1.0, model.lr: 1e-3}
+        return model, feed, model.logits
+    if name == 'seq2seq':
+        word2idx = {w: i for i, w in enumerate(['<PAD>', '<UNK>', '<GO>', '<EOS>'] + list(range(996)))}
+        model = Seq2Seq(128, 2, word2idx, 64, word2idx, 64, cell_backend=backend)
+        X, X_lens = random_batch(len(word2idx))
+        Y, Y_lens = random_batch(len(word2idx))
+        feed = {model.X: X, model.X_seq_len: X_lens, model.Y: Y, model.Y_seq_len: Y_lens}
+        return model, feed, model.training_logits
+    raise ValueError(name)
+
+
+def check_initializer(backend):
+    # a cell used outside dynamic_lstm (decoders, stacked cells) still gets its orthogonal kernel,
+    # an orthogonal kernel has orthonormal rows or columns, whichever are fewer
+    with tf.Graph().as_default():
+        inputs = tf.zeros([1, 16])
+        for name, cell in [('lstm', lstm_cell(32, backend, tf.orthogonal_initializer())),
+                           ('gru', gru_cell(32, backend, tf.orthogonal_initializer()))]:
+            with tf.variable_scope(name):
+                cell(inputs, cell.zero_state(1, tf.float32))
+        with new_session() as sess:
+            sess.run(tf.global_variables_initializer())
+            for var in tf.trainable_variables():
+                if var.op.name.endswith('kernel'):
+                    kernel = sess.run(var)
+                    gram = kernel.dot(kernel.T) if kernel.shape[0] <= kernel.shape[1] else kernel.T.dot(kernel)
+                    error = np.abs(gram - np.eye(len(gram))).max()
+                    assert error < 1e-4, "%s | %s kernel is not orthogonal" % (backend, var.op.name)
+    print("%s | lstm and gru kernels orthogonal" % backend)
+
+
+def steps_per_sec(model, feed):
+    model.sess.run(model.train_op, feed) # graph warm-up
+    t0 = time.time()
+    for _ in range(N_STEPS):
+        model.sess.run(model.train_op, feed)
+    return N_STEPS / (time.time() - t0)
+
+
+if __name__ == '__main__':
+    for backend in ['basic', 'block']:
+        check_initializer(backend)
+    for name in ['rnn_text_clf', 'birnn_crf_clf', 'seq2seq']:
+        reference = None
+        for backend in ['basic', 'block', 'fused']:
+            with tf.Graph().as_default():
+                model, feed, output = build(name, backend)
+                saver = tf.train.Saver()
+                if reference is None:
+                    model.sess.run(tf.global_variables_initializer())
+                    saver.save(model.sess, './temp/rnn_cells_%s' % name)
+                    reference = model.sess.run(output, feed)
+                    diff = 0.
+                else: # restore the basic checkpoint, the variable names have to match
+                    saver.restore(model.sess, './temp/rnn_cells_%s' % name)
+                    diff = np.abs(model.sess.run(output, feed) - reference).max()
+                print("%s | %s | %.2f steps/sec | max output diff vs basic: %.2e" % (
+                    name, backend, steps_per_sec(model, feed), diff))
+                model.sess.close()
@@ -2,10 +2,13 @@ import tensorflow as tf
 import numpy as np
 import math
 from sklearn.utils import shuffle
+from inference_graph import export_inference_graph
+from session_config import new_session
+from train_metrics import step_runner
 
 
 class RNNTextClassifier:
-    def __init__(self, vocab_size, n_out, embedding_dims=128, cell_size=128, stateful=False, sess=tf.Session()):
+    def __init__(self, vocab_size, n_out, embedding_dims=128, cell_size=128, stateful=False, sess=None):
         """
         Parameters:
         -----------
@@ -16,7 +19,7 @@ class RNNTextClassifier:
         n_out: int
             Output dimensions
         sess: object
-            tf.Session() object
+            tf.Session() object, by default a new one from session_config.new_session()
         stateful: boolean
             If true, the final state for each batch will be used as the initial state for the next batch 
         """
@@ -24,7 +27,7 @@ class RNNTextClassifier:
         self.embedding_dims = embedding_dims
         self.cell_size = cell_size
         self.n_out = n_out
-        self.sess = sess
+        self.sess = new_session() if sess is None else sess
         self.stateful = stateful
         self._pointer = None
         self.build_graph()
@@ -92,7 +95,8 @@ class RNNTextClassifier:
 
 
     def fit(self, X, Y, val_data=None, n_epoch=10, batch_size=128, en_exp_decay=True, en_shuffle=True,
-            rnn_keep_prob=1.0):
+            rnn_keep_prob=1.0, profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr, pad_int=None)
         if val_data is None:
             print("Train %d samples" % len(X) )
         else:
@@ -111,14 +115,14 @@ class RNNTextClassifier:
                                                                 self.gen_batch(Y, batch_size))):
                 lr = self.decrease_lr(en_exp_decay, global_step, n_epoch, len(X), batch_size)
                 if (self.stateful) and (len(X_batch) == batch_size):
-                    _, next_state, loss, acc = self.sess.run([self.train_op, self.final_state, self.loss, self.acc],
-                                                             {self.X:X_batch, self.Y:Y_batch, self.lr:lr,
-                                                              self.rnn_keep_prob:rnn_keep_prob,
-                                                              self.init_state:next_state})
+                    _, next_state, loss, acc = run([self.train_op, self.final_state, self.loss, self.acc],
+                                                   {self.X:X_batch, self.Y:Y_batch, self.lr:lr,
+                                                    self.rnn_keep_prob:rnn_keep_prob,
+                                                    self.init_state:next_state})
                 else:             
-                    _, loss, acc = self.sess.run([self.train_op, self.loss, self.acc],
-                                                 {self.X:X_batch, self.Y:Y_batch, self.lr:lr,
-                                                  self.rnn_keep_prob:rnn_keep_prob})
+                    _, loss, acc = run([self.train_op, self.loss, self.acc],
+                                       {self.X:X_batch, self.Y:Y_batch, self.lr:lr,
+                                        self.rnn_keep_prob:rnn_keep_prob})
                 global_step += 1
                 if local_step % 50 == 0:
                     print ('Epoch %d/%d | Step %d/%d | train_loss: %.4f | train_acc: %.4f | lr: %.4f'
@@ -141,6 +145,7 @@ class RNNTextClassifier:
                     val_loss_list.append(v_loss)
                     val_acc_list.append(v_acc)
                 val_loss, val_acc = self.list_avg(val_loss_list), self.list_avg(val_acc_list)
+                run.pause()
 
             # append to log
             log['loss'].append(loss)
@@ -187,6 +192,14 @@ class RNNTextClassifier:
     # end method infer
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X},
+            outputs = {'logits': self.logits},
+            constants = {self.rnn_keep_prob: 1.0})
+    # end method export_inference_graph
+
+
     def gen_batch(self, arr, batch_size):
         for i in range(0, len(arr), batch_size):
             yield arr[i : i+batch_size]
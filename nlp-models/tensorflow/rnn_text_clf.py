@@ -3,11 +3,16 @@ import tensorflow as tf
 import sklearn
 import numpy as np
 import math
+from inference_graph import export_inference_graph
+from session_config import new_session, jit_scope, no_jit_scope
+from rnn_cells import dynamic_lstm
+from train_metrics import step_runner
+from async_eval import AsyncEvaluator
 
 
 class RNNTextClassifier:
     def __init__(self, vocab_size, n_out, embedding_dims=128, cell_size=128, grad_clip=5.0,
-                 sess=tf.Session()):
+                 sess=None, cell_backend='basic', jit=False):
         """
         Parameters:
         -----------
@@ -18,16 +23,23 @@ class RNNTextClassifier:
         n_out: int
             Output dimensions
         sess: object
-            tf.Session() object
+            tf.Session() object, by default a new one from session_config.new_session()
+        cell_backend: str
+            'basic', 'block' or 'fused' RNN kernels, see rnn_cells.py
+        jit: boolean
+            Compile the graph with XLA, see session_config.jit_scope
         """
         self.vocab_size = vocab_size
         self.embedding_dims = embedding_dims
         self.cell_size = cell_size
         self.grad_clip = grad_clip
         self.n_out = n_out
-        self.sess = sess
+        self.cell_backend = cell_backend
+        self.jit = jit
+        self.sess = new_session() if sess is None else sess
         self._pointer = None
-        self.build_graph()
+        with jit_scope(self.jit):
+            self.build_graph()
     # end constructor
 
 
@@ -58,15 +70,10 @@ class RNNTextClassifier:
     # end method add_word_embedding_layer
 
 
-    def lstm_cell(self):
-        return tf.nn.rnn_cell.LSTMCell(self.cell_size, initializer=tf.orthogonal_initializer())
-    # end method lstm_cell
-
-
     def add_dynamic_rnn(self):       
-        _, self._pointer = tf.nn.dynamic_rnn(self.lstm_cell(), self._pointer,
-                                             sequence_length=self.X_seq_lens,
-                                             dtype=tf.float32)
+        with no_jit_scope():
+            _, self._pointer = dynamic_lstm(self._pointer, self.X_seq_lens, self.cell_size, self.cell_backend,
+                                            tf.orthogonal_initializer())
     # end method add_dynamic_rnn
 
 
@@ -88,15 +95,20 @@ class RNNTextClassifier:
 
 
     def fit(self, X, Y, val_data=None, n_epoch=10, batch_size=128, en_exp_decay=True, en_shuffle=True, 
-            keep_prob=1.0):
+            keep_prob=1.0, profiler=None, callbacks=None, async_eval=False):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr)
         if val_data is None:
             print("Train %d samples" % len(X) )
         else:
             print("Train %d samples | Test %d samples" % (len(X), len(val_data[0])))
-        log = {'loss':[], 'acc':[], 'val_loss':[], 'val_acc':[]}
+        log = {'loss':[], 'acc':[], 'val_loss':[], 'val_acc':[], 'val_step':[]}
         global_step = 0
 
         self.sess.run(tf.global_variables_initializer()) # initialize all variables
+        evaluator = None
+        if (val_data is not None) and async_eval: # evaluate on a background thread, see async_eval.py
+            evaluator = AsyncEvaluator(self.sess, self.build_replica,
+                                       lambda replica: replica.evaluate(val_data[0], val_data[1], batch_size))
         for epoch in range(n_epoch): # batch training
             if en_shuffle:
                 X, Y = sklearn.utils.shuffle(X, Y)
@@ -104,48 +116,77 @@ class RNNTextClassifier:
             for local_step, ((X_batch, X_batch_lens), Y_batch) in enumerate(zip(self.next_batch(X, batch_size),
                                                                                 self.gen_batch(Y, batch_size))):
                 lr = self.decrease_lr(en_exp_decay, global_step, n_epoch, len(X), batch_size)           
-                _, loss, acc = self.sess.run([self.train_op, self.loss, self.acc],
-                                             {self.X :X_batch, self.Y: Y_batch,
-                                              self.X_seq_lens: X_batch_lens,
-                                              self.lr: lr,
-                                              self.keep_prob: keep_prob})
+                _, loss, acc = run([self.train_op, self.loss, self.acc],
+                                   {self.X :X_batch, self.Y: Y_batch,
+                                    self.X_seq_lens: X_batch_lens,
+                                    self.lr: lr,
+                                    self.keep_prob: keep_prob})
                 global_step += 1
                 if local_step % 50 == 0:
                     print ("Epoch %d/%d | Step %d/%d | train_loss: %.4f | train_acc: %.4f | lr: %.4f"
                            %(epoch+1, n_epoch, local_step, int(len(X)/batch_size), loss, acc, lr))
+                if evaluator is not None:
+                    self.log_async_eval(log, evaluator.poll())
 
-            if val_data is not None: # go through testing data, average validation loss and ac 
-                val_loss_list, val_acc_list = [], []
-                for (X_test_batch, X_test_batch_lens), Y_test_batch in zip(self.next_batch(val_data[0], batch_size),
-                                                                           self.gen_batch(val_data[1], batch_size)):
-                    v_loss, v_acc = self.sess.run([self.loss, self.acc],
-                                                  {self.X: X_test_batch, self.Y: Y_test_batch,
-                                                   self.X_seq_lens: X_test_batch_lens,
-                                                   self.keep_prob: 1.0})
-                    val_loss_list.append(v_loss)
-                    val_acc_list.append(v_acc)
-                val_loss, val_acc = self.list_avg(val_loss_list), self.list_avg(val_acc_list)
+            if evaluator is not None: # snapshot the weights, the next epoch starts right away
+                evaluator.submit(global_step)
+                run.pause()
+            elif val_data is not None: # go through testing data, average validation loss and ac 
+                val_loss, val_acc = self.evaluate(val_data[0], val_data[1], batch_size)
+                run.pause()
 
             # append to log
             log['loss'].append(loss)
             log['acc'].append(acc)
-            if val_data is not None:
+            if (val_data is not None) and (evaluator is None):
                 log['val_loss'].append(val_loss)
                 log['val_acc'].append(val_acc)
+                log['val_step'].append(global_step)
 
             # verbose
-            if val_data is None:
+            if (val_data is None) or (evaluator is not None):
                 print ("Epoch %d/%d | train_loss: %.4f | train_acc: %.4f |" % (epoch+1, n_epoch, loss, acc),
                        "lr: %.4f" % (lr) )
             else:
                 print ("Epoch %d/%d | train_loss: %.4f | train_acc: %.4f |" % (epoch+1, n_epoch, loss, acc),
                        "test_loss: %.4f | test_acc: %.4f |" % (val_loss, val_acc), "lr: %.4f" % (lr) )
         # end "for epoch in range(n_epoch)"
+        if evaluator is not None:
+            self.log_async_eval(log, evaluator.close())
 
         return log
     # end method fit
 
 
+    def evaluate(self, X_test, Y_test, batch_size=128):
+        val_loss_list, val_acc_list = [], []
+        for (X_test_batch, X_test_batch_lens), Y_test_batch in zip(self.next_batch(X_test, batch_size),
+                                                                   self.gen_batch(Y_test, batch_size)):
+            v_loss, v_acc = self.sess.run([self.loss, self.acc],
+                                          {self.X: X_test_batch, self.Y: Y_test_batch,
+                                           self.X_seq_lens: X_test_batch_lens,
+                                           self.keep_prob: 1.0})
+            val_loss_list.append(v_loss)
+            val_acc_list.append(v_acc)
+        return self.list_avg(val_loss_list), self.list_avg(val_acc_list)
+    # end method evaluate
+
+
+    def build_replica(self, sess):
+        return RNNTextClassifier(self.vocab_size, self.n_out, self.embedding_dims, self.cell_size, self.grad_clip,
+                                 sess, self.cell_backend, self.jit)
+    # end method build_replica
+
+
+    def log_async_eval(self, log, finished):
+        for step, (val_loss, val_acc) in finished:
+            log['val_loss'].append(val_loss)
+            log['val_acc'].append(val_acc)
+            log['val_step'].append(step)
+            print ("Step %d | test_loss: %.4f | test_acc: %.4f" % (step, val_loss, val_acc))
+    # end method log_async_eval
+
+
     def predict(self, X_test, batch_size=128):
         batch_pred_list = []
         for (X_test_batch, X_test_batch_lens) in self.next_batch(X_test, batch_size):
@@ -158,6 +199,14 @@ class RNNTextClassifier:
     # end method predict
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X, 'X_seq_lens': self.X_seq_lens},
+            outputs = {'logits': self.logits},
+            constants = {self.keep_prob: 1.0})
+    # end method export_inference_graph
+
+
     def pad_sentence_batch(self, sentence_batch, pad_int=0):
         max_seq_len = max([len(sentence) for sentence in sentence_batch])
         padded_seqs = []
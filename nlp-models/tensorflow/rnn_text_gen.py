@@ -1,16 +1,19 @@
 import tensorflow as tf
 import numpy as np
 import math
+from session_config import new_session
+from rnn_cells import lstm_cell
+from train_metrics import step_runner
 
 
 class RNNTextGen:
     def __init__(self, text, seq_len, embedding_dims=128, cell_size=128, n_layer=2,
-                 grad_clip=5.0, sess=tf.Session()):
+                 grad_clip=5.0, sess=None, cell_backend='basic'):
         """
         Parameters:
         -----------
         sess: object
-            tf.Session() object
+            tf.Session() object, by default a new one from session_config.new_session()
         text: string
             corpus in one long string, usually obtained by file.read()
         seq_len: int
@@ -23,14 +26,18 @@ class RNNTextGen:
             Number of layers of stacked rnn cells
         useless_words: list of characters
             all the useless_words which will be removed from text, usually punctuations
+        cell_backend: str
+            'basic' or 'block' RNN kernels, see rnn_cells.py ('fused' runs as 'block', the state is carried
+            across batches)
         """
-        self.sess = sess
+        self.sess = new_session() if sess is None else sess
         self.text = text
         self.seq_len = seq_len
         self.embedding_dims = embedding_dims
         self.cell_size = cell_size
         self.n_layer = n_layer
         self.grad_clip = grad_clip
+        self.cell_backend = cell_backend
         self._pointer = None
         self.preprocessing()
         self.build_graph()
@@ -66,7 +73,7 @@ class RNNTextGen:
 
 
     def add_lstm_cells(self):
-        lstm = lambda x : tf.nn.rnn_cell.LSTMCell(x, initializer=tf.orthogonal_initializer())
+        lstm = lambda x : lstm_cell(x, self.cell_backend, tf.orthogonal_initializer())
         self.cells = tf.nn.rnn_cell.MultiRNNCell([lstm(self.cell_size) for _ in range(self.n_layer)])
     # end method add_rnn_cells
 
@@ -128,7 +135,9 @@ class RNNTextGen:
     # end method next_batch
 
 
-    def fit(self, start_word, n_gen, text_iter_step=25, n_epoch=1, batch_size=128, en_exp_decay=False):
+    def fit(self, start_word, n_gen, text_iter_step=25, n_epoch=1, batch_size=128, en_exp_decay=False,
+            profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr, pad_int=None)
         global_step = 0
         n_batch = (len(self.indexed) - self.seq_len*batch_size - 1) // text_iter_step
         total_steps = n_epoch * n_batch
@@ -138,12 +147,12 @@ class RNNTextGen:
             next_state = self.sess.run(self.init_state, {self.batch_size: batch_size})
             for local_step, (X_batch, Y_batch) in enumerate(self.next_batch(batch_size, text_iter_step)):
                 lr = self.adjust_lr(global_step, total_steps) if en_exp_decay else 0.001
-                _, train_loss, next_state = self.sess.run([self.train_op, self.loss, self.final_state],
-                                                          {self.X: X_batch,
-                                                           self.Y: Y_batch,
-                                                           self.init_state: next_state,
-                                                           self.lr: lr,
-                                                           self.is_training: True})
+                _, train_loss, next_state = run([self.train_op, self.loss, self.final_state],
+                                                {self.X: X_batch,
+                                                 self.Y: Y_batch,
+                                                 self.init_state: next_state,
+                                                 self.lr: lr,
+                                                 self.is_training: True})
                 if local_step % 10 == 0:
                     print ('Epoch %d/%d | Batch %d/%d | train loss: %.4f | lr: %.4f'
                             % (epoch+1, n_epoch, local_step, n_batch, train_loss, lr))
@@ -151,6 +160,7 @@ class RNNTextGen:
                     print()
                     print(self.infer(start_word, n_gen))
                     print()
+                    run.pause()
                 global_step += 1
     # end method fit
 
@@ -1,16 +1,18 @@
 import tensorflow as tf
 import numpy as np
 import math
+from session_config import new_session
+from train_metrics import step_runner
 
 
 class RNNTextGen:
     def __init__(self, text, seq_len=50, embedding_dims=128, cell_size=256, n_layer=2, grad_clip=5., 
-                 sess=tf.Session()):
+                 sess=None):
         """
         Parameters:
         -----------
         sess: object
-            tf.Session() object
+            tf.Session() object, by default a new one from session_config.new_session()
         text: string
             corpus in one long string, usually obtained by file.read()
         seq_len: int
@@ -24,7 +26,7 @@ class RNNTextGen:
         useless_words: list of characters
             all the useless_words which will be removed from text, usually punctuations
         """
-        self.sess = sess
+        self.sess = new_session() if sess is None else sess
         self.text = text
         self.seq_len = seq_len
         self.embedding_dims = embedding_dims
@@ -127,7 +129,9 @@ class RNNTextGen:
     # end method next_batch
 
 
-    def fit(self, start_word, text_iter_step=1, n_gen=500, n_epoch=1, batch_size=128, en_exp_decay=False):
+    def fit(self, start_word, text_iter_step=1, n_gen=500, n_epoch=1, batch_size=128, en_exp_decay=False,
+            profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, lr=self.lr, pad_int=None)
         global_step = 0
         n_batch = (len(self.indexed) - self.seq_len*batch_size - 1) // text_iter_step
         total_steps = n_epoch * n_batch
@@ -137,16 +141,17 @@ class RNNTextGen:
             next_state = self.sess.run(self.init_state, {self.batch_size: batch_size})
             for local_step, (X_batch, Y_batch) in enumerate(self.next_batch(batch_size, text_iter_step)):
                 lr = self.adjust_lr(global_step, total_steps) if en_exp_decay else 0.001
-                _, train_loss, next_state = self.sess.run([self.train_op, self.loss, self.final_state],
-                                                          {self.X: X_batch,
-                                                           self.Y: Y_batch,
-                                                           self.init_state: next_state,
-                                                           self.lr: lr})
+                _, train_loss, next_state = run([self.train_op, self.loss, self.final_state],
+                                                {self.X: X_batch,
+                                                 self.Y: Y_batch,
+                                                 self.init_state: next_state,
+                                                 self.lr: lr})
                 if local_step % 10 == 0:
                     print ('Epoch %d/%d | Batch %d/%d | train loss: %.4f | lr: %.4f'
                             % (epoch+1, n_epoch, local_step, n_batch, train_loss, lr))
                 if local_step % 100 == 0:
                     print(self.infer(start_word, n_gen)+'\n')
+                    run.pause()
                 global_step += 1
     # end method fit
 
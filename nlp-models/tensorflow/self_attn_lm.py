@@ -1,12 +1,15 @@
 from utils import learned_positional_encoding, embed_seq, pointwise_feedforward, layer_norm
 import tensorflow as tf
 import numpy as np
+from session_config import new_session, jit_scope
+from train_metrics import step_runner
 
 
 class LM:
     def __init__(self, text, seq_len, embedding_dims=30, hidden_units=128, n_layers=2,
-                 num_heads=8, dropout_rate=0.1, sess=tf.Session()):
-        self.sess = sess
+                 num_heads=8, dropout_rate=0.1, sess=None, jit=False):
+        self.jit = jit
+        self.sess = new_session() if sess is None else sess
         self.text = text
         self.seq_len = seq_len
         self.embedding_dims = embedding_dims
@@ -15,7 +18,8 @@ class LM:
         self.num_heads = num_heads
         self.dropout_rate = dropout_rate
         self.preprocessing()
-        self.build_graph()
+        with jit_scope(self.jit):
+            self.build_graph()
     # end constructor
 
 
@@ -93,20 +97,22 @@ class LM:
     # end method
 
 
-    def fit(self, text_iter_step=25, n_epoch=1, batch_size=64):
+    def fit(self, text_iter_step=25, n_epoch=1, batch_size=64, profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.sequence, pad_int=None)
         n_batch = (len(self.indexed) - self.seq_len*batch_size - 1) // text_iter_step
         self.sess.run(tf.global_variables_initializer()) # initialize all variables
         
         for epoch in range(n_epoch):
             for local_step, seq_batch in enumerate(self.next_batch(batch_size, text_iter_step)):
-                _, train_loss = self.sess.run([self.train_op, self.loss],
-                                              {self.sequence: seq_batch,
-                                               self.is_training: True})
+                _, train_loss = run([self.train_op, self.loss],
+                                    {self.sequence: seq_batch,
+                                     self.is_training: True})
                 if local_step % 10 == 0:
                     print ('Epoch %d/%d | Batch %d/%d | train loss: %.4f' %
                           (epoch+1, n_epoch, local_step, n_batch, train_loss))
                 if local_step % 100 == 0:
                     self.decode()
+                    run.pause()
     # end method
 
 
@@ -1,11 +1,15 @@
 from tensorflow.python.layers import core as core_layers
 import tensorflow as tf
 import numpy as np
+from inference_graph import export_inference_graph
+from session_config import new_session
+import rnn_cells
+from train_metrics import step_runner
 
 
 class Seq2Seq:
     def __init__(self, rnn_size, n_layers, X_word2idx, encoder_embedding_dim, Y_word2idx, decoder_embedding_dim,
-                 sess=tf.Session(), grad_clip=5.0):
+                 sess=None, grad_clip=5.0, cell_backend='basic'):
         self.rnn_size = rnn_size
         self.n_layers = n_layers
         self.grad_clip = grad_clip
@@ -13,7 +17,8 @@ class Seq2Seq:
         self.encoder_embedding_dim = encoder_embedding_dim
         self.Y_word2idx = Y_word2idx
         self.decoder_embedding_dim = decoder_embedding_dim
-        self.sess = sess
+        self.cell_backend = cell_backend # see rnn_cells.py
+        self.sess = new_session() if sess is None else sess
         self.register_symbols()
         self.build_graph()
     # end constructor
@@ -37,18 +42,20 @@ class Seq2Seq:
 
 
     def lstm_cell(self, reuse=False):
-        return tf.nn.rnn_cell.LSTMCell(self.rnn_size, initializer=tf.orthogonal_initializer(), reuse=reuse)
+        return rnn_cells.lstm_cell(self.rnn_size, self.cell_backend, tf.orthogonal_initializer(), reuse)
     # end method lstm_cell
 
 
     def add_encoder_layer(self):
         encoder_embedding = tf.get_variable('encoder_embedding', [len(self.X_word2idx), self.encoder_embedding_dim],
                                              tf.float32, tf.random_uniform_initializer(-1.0, 1.0))            
-        self.encoder_out, self.encoder_state = tf.nn.dynamic_rnn(
-            cell = tf.nn.rnn_cell.MultiRNNCell([self.lstm_cell() for _ in range(self.n_layers)]), 
+        self.encoder_out, self.encoder_state = rnn_cells.stacked_dynamic_lstm(
             inputs = tf.nn.embedding_lookup(encoder_embedding, self.X),
             sequence_length = self.X_seq_len,
-            dtype = tf.float32)
+            num_units = self.rnn_size,
+            n_layers = self.n_layers,
+            backend = self.cell_backend,
+            initializer = tf.orthogonal_initializer())
         self.encoder_state = tuple(self.encoder_state[-1] for _ in range(self.n_layers))
     # end method add_encoder_layer
     
@@ -150,7 +157,9 @@ class Seq2Seq:
     # end method next_batch
 
 
-    def fit(self, X_train, Y_train, val_data, n_epoch=60, display_step=50, batch_size=128):
+    def fit(self, X_train, Y_train, val_data, n_epoch=60, display_step=50, batch_size=128, profiler=None,
+            callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, pad_int=self._x_pad)
         X_test, Y_test = val_data
         X_test_batch, Y_test_batch, X_test_batch_lens, Y_test_batch_lens = next(
         self.next_batch(X_test, Y_test, batch_size))
@@ -159,11 +168,11 @@ class Seq2Seq:
         for epoch in range(1, n_epoch+1):
             for local_step, (X_train_batch, Y_train_batch, X_train_batch_lens, Y_train_batch_lens) in enumerate(
                 self.next_batch(X_train, Y_train, batch_size)):
-                _, loss = self.sess.run([self.train_op, self.loss], {self.X: X_train_batch,
-                                                                     self.Y: Y_train_batch,
-                                                                     self.X_seq_len: X_train_batch_lens,
-                                                                     self.Y_seq_len: Y_train_batch_lens,
-                                                                     self.batch_size: batch_size})
+                _, loss = run([self.train_op, self.loss], {self.X: X_train_batch,
+                                                           self.Y: Y_train_batch,
+                                                           self.X_seq_len: X_train_batch_lens,
+                                                           self.Y_seq_len: Y_train_batch_lens,
+                                                           self.batch_size: batch_size})
                 if local_step % display_step == 0:
                     val_loss = self.sess.run(self.loss, {self.X: X_test_batch,
                                                          self.Y: Y_test_batch,
@@ -172,15 +181,42 @@ class Seq2Seq:
                                                          self.batch_size: batch_size})
                     print("Epoch %d/%d | Batch %d/%d | train_loss: %.3f | test_loss: %.3f"
                         % (epoch, n_epoch, local_step, len(X_train)//batch_size, loss, val_loss))
+                    run.pause()
     # end method fit
 
 
-    def infer(self, input_word, X_idx2word, Y_idx2word, batch_size=128):        
+    def predict(self, sequences, batch_size=128, sep=''):
+        """
+        Parameters:
+        -----------
+        sequences: list
+            Source sequences, each a string or a list of source tokens
+        batch_size: int
+            Number of sequences decoded per sess.run
+        sep: str
+            Separator used to join target tokens into strings
+        Returns:
+        -----------
+        (list of id lists, list of strings), EOS and everything after it removed
+        """
+        indices = [[self.X_word2idx.get(token, self._x_unk) for token in seq] for seq in sequences]
+        out_indices = []
+        for i in range(0, len(indices), batch_size):
+            X_batch, X_batch_lens = self.pad_sentence_batch(indices[i : i+batch_size], self._x_pad)
+            out = self.sess.run(self.predicting_ids, {self.X: X_batch,
+                                                      self.X_seq_len: X_batch_lens,
+                                                      self.batch_size: len(X_batch)})
+            is_eos = (out == self._y_eos)
+            out_lens = np.where(is_eos.any(1), is_eos.argmax(1), out.shape[1])
+            out_indices.extend(row[:n].tolist() for row, n in zip(out, out_lens))
+        strings = [sep.join(self._y_idx2word[i] for i in out) for out in out_indices]
+        return out_indices, strings
+    # end method predict
+
+
+    def infer(self, input_word, X_idx2word, Y_idx2word):
         input_indices = [self.X_word2idx.get(char, self._x_unk) for char in input_word]
-        out_indices = self.sess.run(self.predicting_ids, {
-            self.X: [input_indices] * batch_size,
-            self.X_seq_len: [len(input_indices)] * batch_size,
-            self.batch_size: batch_size})[0]
+        out_indices = self.predict([input_word], batch_size=1)[0][0]
         
         print('\nSource')
         print('Word: {}'.format([i for i in input_indices]))
@@ -192,6 +228,13 @@ class Seq2Seq:
     # end method infer
 
 
+    def export_inference_graph(self, path):
+        export_inference_graph(self.sess, path,
+            inputs = {'X': self.X, 'X_seq_len': self.X_seq_len, 'batch_size': self.batch_size},
+            outputs = {'predicting_ids': self.predicting_ids})
+    # end method export_inference_graph
+
+
     def register_symbols(self):
         self._x_go = self.X_word2idx['<GO>']
         self._x_eos = self.X_word2idx['<EOS>']
@@ -202,5 +245,7 @@ class Seq2Seq:
         self._y_eos = self.Y_word2idx['<EOS>']
         self._y_pad = self.Y_word2idx['<PAD>']
         self._y_unk = self.Y_word2idx['<UNK>']
+
+        self._y_idx2word = {i: w for w, i in self.Y_word2idx.items()}
     # end method add_symbols
 # end class
\ No newline at end of file
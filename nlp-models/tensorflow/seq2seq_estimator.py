@@ -1,5 +1,7 @@
 import tensorflow as tf
 import numpy as np
+from warm_predictor import WarmPredictor
+from train_metrics import MeterHook
 tf.logging.set_verbosity(tf.logging.INFO)
 
 
@@ -13,6 +15,8 @@ class Estimator:
         self.Y_word2idx = Y_word2idx
         self.register_symbols()
         self.model = tf.estimator.Estimator(self.model_fn)
+        self.predictor = None
+        self.callbacks = None
     # end constructor
 
 
@@ -94,18 +98,22 @@ class Estimator:
         train_op = tf.train.AdamOptimizer().apply_gradients(zip(clipped_gradients, params),
                                                             global_step=tf.train.get_global_step())
         acc_op = tf.metrics.accuracy(labels=labels, predictions=predictions)
+        # the training steps run inside model.train, the meter reaches them as a hook
+        hooks = [MeterHook(self.callbacks, features['inputs'], self._x_pad)] if self.callbacks else None
 
         estim_specs = tf.estimator.EstimatorSpec(
             mode = mode,
             predictions = predictions,
             loss = loss_op,
             train_op = train_op,
-            eval_metric_ops = {'accuracy': acc_op})
+            eval_metric_ops = {'accuracy': acc_op},
+            training_hooks = hooks)
         return estim_specs
     # end method
 
 
-    def fit(self, x, x_seq_len, y, y_seq_len, batch_size=128, n_epoch=10):
+    def fit(self, x, x_seq_len, y, y_seq_len, batch_size=128, n_epoch=10, callbacks=None):
+        self.callbacks = callbacks # read by model_fn when model.train builds the graph
         input_fn = tf.estimator.inputs.numpy_input_fn(
             x={'inputs':x, 'in_lengths':x_seq_len, 'outputs':y, 'out_lengths':y_seq_len}, y=y,
             batch_size=batch_size, num_epochs=n_epoch, shuffle=True)
@@ -116,13 +124,15 @@ class Estimator:
     def infer(self, input_word, X_idx2word, Y_idx2word):
         input_indices = [self.X_word2idx.get(char, self._x_unk) for char in input_word]
 
-        input_fn = tf.estimator.inputs.numpy_input_fn(
-            x={'inputs': np.atleast_2d(input_indices).astype(np.int32),
-               'in_lengths': np.atleast_1d(len(input_indices)).astype(np.int32),
-               'outputs': np.atleast_2d(0).astype(np.int32),
-               'out_lengths': np.atleast_1d(0).astype(np.int32)},
-            shuffle=False)
-        out_indices = list(self.model.predict(input_fn))[0]
+        if self.predictor is None: # built once, picks up the checkpoints of later fit calls by itself
+            self.predictor = WarmPredictor(self.model, {
+                'inputs': (tf.int32, [None, None]), 'in_lengths': (tf.int32, [None]),
+                'outputs': (tf.int32, [None, None]), 'out_lengths': (tf.int32, [None])})
+        out_indices = self.predictor.predict({
+            'inputs': np.atleast_2d(input_indices).astype(np.int32),
+            'in_lengths': np.atleast_1d(len(input_indices)).astype(np.int32),
+            'outputs': np.atleast_2d(0).astype(np.int32),
+            'out_lengths': np.atleast_1d(0).astype(np.int32)})[0]
 
         print('IN: {}'.format(' '.join([X_idx2word[i] for i in input_indices])))
         print('OUT: {}'.format(' '.join([Y_idx2word[i] for i in out_indices])))
@@ -1,11 +1,17 @@
 import tensorflow as tf
 import numpy as np
+import hashlib
 from tensorflow.python.layers.core import Dense
+from inference_graph import export_inference_graph
+from session_config import new_session
+import rnn_cells
+from train_metrics import step_runner
 
 
 class Seq2Seq:
     def __init__(self, rnn_size, n_layers, X_word2idx, encoder_embedding_dim, Y_word2idx, decoder_embedding_dim,
-                 sess=tf.Session(), grad_clip=5.0, beam_width=5, force_teaching_ratio=0.5):
+                 sess=None, grad_clip=5.0, beam_width=5, force_teaching_ratio=0.5, cache=None,
+                 cell_backend='basic'):
         self.rnn_size = rnn_size
         self.n_layers = n_layers
         self.grad_clip = grad_clip
@@ -13,9 +19,12 @@ class Seq2Seq:
         self.encoder_embedding_dim = encoder_embedding_dim
         self.Y_word2idx = Y_word2idx
         self.decoder_embedding_dim = decoder_embedding_dim
+        self.cell_backend = cell_backend # see rnn_cells.py
         self.beam_width = beam_width
         self.force_teaching_ratio = force_teaching_ratio
-        self.sess = sess
+        self.cache = cache # response_cache.ResponseCache in front of beam_search
+        self._checkpoint = None # digest of the weights, computed when beam_search needs it
+        self.sess = new_session() if sess is None else sess
         self.register_symbols()
         self.build_graph()
     # end constructor
@@ -28,6 +37,8 @@ class Seq2Seq:
             self.add_decoder_for_training()
         with tf.variable_scope('decode', reuse=True):
             self.add_decoder_for_inference()
+        with tf.variable_scope('decode', reuse=True):
+            self.add_step_decoder()
         self.add_backward_path()
     # end method
 
@@ -43,7 +54,7 @@ class Seq2Seq:
 
     def lstm_cell(self, rnn_size=None, reuse=False):
         rnn_size = self.rnn_size if rnn_size is None else rnn_size
-        return tf.nn.rnn_cell.LSTMCell(rnn_size, initializer=tf.orthogonal_initializer(), reuse=reuse)
+        return rnn_cells.lstm_cell(rnn_size, self.cell_backend, tf.orthogonal_initializer(), reuse)
     # end method
 
 
@@ -52,12 +63,12 @@ class Seq2Seq:
                                              tf.float32, tf.random_uniform_initializer(-1.0, 1.0)) 
         self.encoder_out = tf.nn.embedding_lookup(encoder_embedding, self.X)
         for n in range(self.n_layers):
-            (out_fw, out_bw), (state_fw, state_bw) = tf.nn.bidirectional_dynamic_rnn(
-                cell_fw = self.lstm_cell(self.rnn_size // 2),
-                cell_bw = self.lstm_cell(self.rnn_size // 2),
+            (out_fw, out_bw), (state_fw, state_bw) = rnn_cells.bidirectional_dynamic_lstm(
                 inputs = self.encoder_out,
                 sequence_length = self.X_seq_len,
-                dtype = tf.float32,
+                num_units = self.rnn_size // 2,
+                backend = self.cell_backend,
+                initializer = tf.orthogonal_initializer(),
                 scope = 'bidirectional_rnn_'+str(n))
             self.encoder_out = tf.concat((out_fw, out_bw), 2)
         
@@ -148,6 +159,36 @@ class Seq2Seq:
     # end method
 
 
+    def add_step_decoder(self):
+        # a single decoder step on rows fed from python, beam_search drives it one step at a time
+        self.step_memory = tf.placeholder(tf.float32, [None, None, self.rnn_size])
+        self.step_memory_len = tf.placeholder(tf.int32, [None])
+        self.step_input = tf.placeholder(tf.int32, [None])
+        self.step_cell_state = tuple(tf.nn.rnn_cell.LSTMStateTuple(
+            c = tf.placeholder(tf.float32, [None, self.rnn_size]),
+            h = tf.placeholder(tf.float32, [None, self.rnn_size])) for _ in range(self.n_layers))
+        self.step_attention = tf.placeholder(tf.float32, [None, self.rnn_size])
+
+        attention_mechanism = tf.contrib.seq2seq.LuongAttention(
+            num_units = self.rnn_size, 
+            memory = self.step_memory,
+            memory_sequence_length = self.step_memory_len)
+        decoder_cell = tf.contrib.seq2seq.AttentionWrapper(
+            cell = tf.nn.rnn_cell.MultiRNNCell([self.lstm_cell(reuse=True) for _ in range(self.n_layers)]),
+            attention_mechanism = attention_mechanism,
+            attention_layer_size = self.rnn_size)
+        state = decoder_cell.zero_state(tf.shape(self.step_input)[0], tf.float32).clone(
+            cell_state = self.step_cell_state, attention = self.step_attention)
+        with tf.variable_scope('decoder'): # same variable names as inside dynamic_decode
+            output, next_state = decoder_cell(
+                tf.nn.embedding_lookup(tf.get_variable('decoder_embedding'), self.step_input), state)
+            logits = Dense(len(self.Y_word2idx), name='dense', _reuse=True)(output)
+        self.step_log_probs = tf.nn.log_softmax(logits)
+        self.step_next_cell_state = next_state.cell_state
+        self.step_next_attention = next_state.attention
+    # end method
+
+
     def add_backward_path(self):
         masks = tf.sequence_mask(self.Y_seq_len, tf.reduce_max(self.Y_seq_len), dtype=tf.float32)
         self.loss = tf.contrib.seq2seq.sequence_loss(logits = self.training_logits,
@@ -186,7 +227,8 @@ class Seq2Seq:
 
 
     def fit(self, X_train, Y_train, val_data, n_epoch=60, display_step=50, batch_size=128,
-            sentences=None):
+            sentences=None, profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.X, pad_int=self._x_pad)
         X_test, Y_test = val_data
         X_test_batch, Y_test_batch, X_test_batch_lens, Y_test_batch_lens = next(
         self.next_batch(X_test, Y_test, batch_size))
@@ -195,10 +237,10 @@ class Seq2Seq:
         for epoch in range(1, n_epoch+1):
             for local_step, (X_train_batch, Y_train_batch, X_train_batch_lens, Y_train_batch_lens) in enumerate(
                 self.next_batch(X_train, Y_train, batch_size)):
-                _, loss = self.sess.run([self.train_op, self.loss], {self.X: X_train_batch,
-                                                                     self.Y: Y_train_batch,
-                                                                     self.X_seq_len: X_train_batch_lens,
-                                                                     self.Y_seq_len: Y_train_batch_lens})
+                _, loss = run([self.train_op, self.loss], {self.X: X_train_batch,
+                                                           self.Y: Y_train_batch,
+                                                           self.X_seq_len: X_train_batch_lens,
+                                                           self.Y_seq_len: Y_train_batch_lens})
                 if local_step % display_step == 0:
                     val_loss = self.sess.run(self.loss, {self.X: X_test_batch,
                                                          self.Y: Y_test_batch,
@@ -208,6 +250,8 @@ class Seq2Seq:
                         % (epoch, n_epoch, local_step, len(X_train)//batch_size, loss, val_loss))
                     if sentences is not None:
                         self.infer(sentences)
+                    run.pause()
+        self.weights_changed()
     # end method
 
 
@@ -237,6 +281,130 @@ class Seq2Seq:
     # end method
 
 
+    def beam_search(self, sentences, beam_width=None, n_best=1):
+        """
+        Beam search that stops each sentence as soon as its n_best-th finished hypothesis scores
+        at least as high as every live beam (scores are summed log-probs, so live beams can only
+        get worse). Finished sentences are dropped from the rows fed to later steps.
+
+        Returns, for every sentence, a list of up to n_best (id list, score), best first
+        """
+        beam_width = self.beam_width if beam_width is None else beam_width
+        indices = [[self.X_word2idx.get(char, self._x_unk) for char in st] for st in sentences]
+        if self.cache is not None:
+            # the weights are part of the key, a process sharing the cache with other weights never
+            # reads their beams
+            return self.cache.get_or_compute(indices, lambda xs: self.beam_decode(xs, beam_width, n_best),
+                                             beam_width=beam_width, n_best=n_best, checkpoint=self.checkpoint())
+        return self.beam_decode(indices, beam_width, n_best)
+    # end method
+
+
+    def beam_decode(self, indices, beam_width, n_best):
+        X_batch, X_batch_lens = self.pad_sentence_batch(indices, self._x_pad)
+        encoder_out, encoder_state = self.sess.run([self.encoder_out, self.encoder_state], {
+            self.X: X_batch, self.X_seq_len: X_batch_lens})
+        X_batch_lens = np.array(X_batch_lens)
+        max_steps = 2 * X_batch_lens
+
+        # one row per live hypothesis, starting with a single <GO> row per sentence
+        items = np.arange(len(indices))
+        scores = np.zeros(len(indices), np.float32)
+        tokens = [[] for _ in indices]
+        cell_state = [(layer.c, layer.h) for layer in encoder_state]
+        attention = np.zeros([len(indices), self.rnn_size], np.float32)
+        last = np.full(len(indices), self._y_go, np.int32)
+        finished = [[] for _ in indices]
+
+        step = 0
+        while len(items) > 0:
+            feed_dict = {self.step_memory: encoder_out[items],
+                         self.step_memory_len: X_batch_lens[items],
+                         self.step_input: last,
+                         self.step_attention: attention}
+            for placeholder, (c, h) in zip(self.step_cell_state, cell_state):
+                feed_dict[placeholder.c] = c
+                feed_dict[placeholder.h] = h
+            log_probs, next_cell_state, next_attention = self.sess.run(
+                [self.step_log_probs, self.step_next_cell_state, self.step_next_attention], feed_dict)
+            candidates = scores[:, np.newaxis] + log_probs
+            step += 1
+
+            # rows are kept grouped by sentence in sentence order, each sentence is one contiguous slice
+            keep_rows, keep_tokens = [], []
+            unique_items, starts = np.unique(items, return_index=True)
+            for item, start, end in zip(unique_items, starts, np.append(starts[1:], len(items))):
+                flat = candidates[start:end].ravel()
+                top = np.argsort(-flat)[:beam_width]
+                parents, words = start + top // log_probs.shape[1], top % log_probs.shape[1]
+                is_eos = (words == self._y_eos)
+                for parent, score in zip(parents[is_eos], flat[top][is_eos]):
+                    finished[item].append((tokens[parent], float(score)))
+                live = np.flatnonzero(~is_eos)
+                done = (len(live) == 0) or (step >= max_steps[item])
+                if len(finished[item]) >= n_best:
+                    nth_best = sorted([sc for _, sc in finished[item]], reverse=True)[n_best-1]
+                    done = done or nth_best >= flat[top][live].max()
+                if done:
+                    if len(finished[item]) == 0: # ran out of steps, fall back to live beams
+                        finished[item].extend((tokens[p] + [int(w)], float(sc)) for p, w, sc in
+                                              zip(parents[live], words[live], flat[top][live]))
+                    continue
+                keep_rows.extend(parents[live])
+                keep_tokens.extend(words[live])
+
+            keep_rows = np.array(keep_rows, np.int64)
+            keep_tokens = np.array(keep_tokens, np.int32)
+            scores = candidates[keep_rows, keep_tokens]
+            tokens = [tokens[r] + [int(t)] for r, t in zip(keep_rows, keep_tokens)]
+            items = items[keep_rows]
+            cell_state = [(layer.c[keep_rows], layer.h[keep_rows]) for layer in next_cell_state]
+            attention = next_attention[keep_rows]
+            last = keep_tokens
+
+        return [sorted(hyps, key=lambda hyp: -hyp[1])[:n_best] for hyps in finished]
+    # end method
+
+
+    def restore(self, path):
+        tf.train.Saver().restore(self.sess, path)
+        self.weights_changed()
+    # end method
+
+
+    def checkpoint(self):
+        if self._checkpoint is None:
+            digest = hashlib.md5()
+            for value in self.sess.run(self.sess.graph.get_collection(tf.GraphKeys.TRAINABLE_VARIABLES)):
+                digest.update(value.tobytes())
+            self._checkpoint = digest.hexdigest()
+        return self._checkpoint
+    # end method
+
+
+    def weights_changed(self):
+        self._checkpoint = None
+        if self.cache is not None: # the beams of the old weights are no longer served
+            self.cache.clear()
+    # end method
+
+
+    def export_inference_graph(self, path):
+        # the greedy/beam graph, plus the encoder and the single step decoder used by beam_search
+        inputs = {'X': self.X, 'X_seq_len': self.X_seq_len, 'step_memory': self.step_memory,
+                  'step_memory_len': self.step_memory_len, 'step_input': self.step_input,
+                  'step_attention': self.step_attention}
+        outputs = {'predicting_ids': self.predicting_ids, 'encoder_out': self.encoder_out,
+                   'step_log_probs': self.step_log_probs, 'step_next_attention': self.step_next_attention}
+        for i in range(self.n_layers):
+            inputs['step_cell_state_%d_c' % i], inputs['step_cell_state_%d_h' % i] = self.step_cell_state[i]
+            outputs['encoder_state_%d_c' % i], outputs['encoder_state_%d_h' % i] = self.encoder_state[i]
+            outputs['step_next_cell_state_%d_c' % i], outputs['step_next_cell_state_%d_h' % i] = \
+                self.step_next_cell_state[i]
+        export_inference_graph(self.sess, path, inputs, outputs)
+    # end method
+
+
     def register_symbols(self):
         self._x_go = self.X_word2idx['<GO>']
         self._x_eos = self.X_word2idx['<EOS>']
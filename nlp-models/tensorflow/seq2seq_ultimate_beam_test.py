@@ -0,0 +1,72 @@
+import os
+import time
+import tensorflow as tf
+from session_config import new_session
+from seq2seq_ultimate import Seq2Seq
+from seq2seq_ultimate_test import preprocess_data
+from response_cache import ResponseCache
+
+
+BATCH_SIZE = 128
+CKPT_PATH = './saved/seq2seq_ultimate.ckpt'
+N_REPEAT = 10
+
+
+def build_model(X_char2idx, Y_char2idx, beam_width, sess):
+    return Seq2Seq(
+        rnn_size = 50,
+        n_layers = 2,
+        X_word2idx = X_char2idx,
+        encoder_embedding_dim = 15,
+        Y_word2idx = Y_char2idx,
+        decoder_embedding_dim = 15,
+        beam_width = beam_width,
+        sess = sess,
+    )
+
+
+def timeit(fn):
+    fn() # warm up
+    t0 = time.time()
+    for _ in range(N_REPEAT):
+        fn()
+    return 1000 * (time.time() - t0) / N_REPEAT
+
+
+def main():
+    X_indices, Y_indices, X_char2idx, Y_char2idx, X_idx2char, Y_idx2char = preprocess_data()
+    X_train, Y_train = X_indices[BATCH_SIZE:], Y_indices[BATCH_SIZE:]
+    X_test, Y_test = X_indices[:BATCH_SIZE], Y_indices[:BATCH_SIZE]
+
+    with tf.Graph().as_default():
+        model = build_model(X_char2idx, Y_char2idx, 5, new_session())
+        model.fit(X_train, Y_train, val_data=(X_test, Y_test), batch_size=BATCH_SIZE)
+        if not os.path.exists('./saved'):
+            os.makedirs('./saved')
+        tf.train.Saver().save(model.sess, CKPT_PATH)
+
+    sentences = [''.join(X_idx2char[i] for i in x) for x in X_test]
+    for beam_width in range(1, 11):
+        with tf.Graph().as_default():
+            model = build_model(X_char2idx, Y_char2idx, beam_width, new_session())
+            model.restore(CKPT_PATH)
+            X_batch, X_batch_lens = model.pad_sentence_batch(X_test, model._x_pad)
+            current = timeit(lambda: model.sess.run(model.predicting_ids,
+                                                    {model.X: X_batch, model.X_seq_len: X_batch_lens}))
+            early = timeit(lambda: model.beam_search(sentences, beam_width))
+            print('beam_width %2d | current decoder: %.1f ms | early-terminating: %.1f ms' %
+                  (beam_width, current, early))
+    print(model.beam_search(['common', 'apple'], n_best=3))
+
+    # the cache must not change what beam_search returns, on a miss or on a hit
+    plain = model.beam_search(sentences, n_best=3)
+    model.cache = ResponseCache(max_size=1000)
+    missed = model.beam_search(sentences, n_best=3)
+    hit = model.beam_search(sentences, n_best=3)
+    assert missed == plain and hit == plain, "beam_search differs with a ResponseCache"
+    print('beam_search with cache matches | %s' % model.cache.stats())
+# end function main
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Shared configuration of the sessions created by the models. A model builds its session when it is
+constructed (not when its module is imported), with the settings in place at that time:
+
+    import session_config
+    session_config.configure(intra_op_threads=2, inter_op_threads=1, cpu_affinity=[0, 1])
+    clf = RNNTextClassifier(vocab_size, 2)
+
+Models built with jit=True construct their graph inside jit_scope, so XLA fuses the forward and backward ops
+into compiled clusters (on CPU too). The parts XLA can't compile well, the while loops of dynamic_rnn and the
+CRF layers, are built inside no_jit_scope and keep running on the regular executor.
+"""
+import os
+import contextlib
+import tensorflow as tf
+
+
+_settings = {'intra_op_threads': 0, # 0 lets TensorFlow use one thread per core
+             'inter_op_threads': 0,
+             'allow_soft_placement': True}
+
+
+def configure(intra_op_threads=None, inter_op_threads=None, cpu_affinity=None, allow_soft_placement=None):
+    """
+    Parameters:
+    -----------
+    intra_op_threads: int
+        Threads used inside a single op (matmul, conv)
+    inter_op_threads: int
+        Threads used to run independent ops at the same time
+    cpu_affinity: list of int
+        Pins this process to these CPUs (Linux), intra_op_threads defaults to their count
+    allow_soft_placement: bool
+        Run ops on CPU when the requested device has no kernel for them
+    """
+    if cpu_affinity is not None:
+        os.sched_setaffinity(0, cpu_affinity)
+        if intra_op_threads is None:
+            intra_op_threads = len(cpu_affinity)
+    if intra_op_threads is not None:
+        _settings['intra_op_threads'] = intra_op_threads
+    if inter_op_threads is not None:
+        _settings['inter_op_threads'] = inter_op_threads
+    if allow_soft_placement is not None:
+        _settings['allow_soft_placement'] = allow_soft_placement
+
+
+def get_config():
+    return tf.ConfigProto(intra_op_parallelism_threads = _settings['intra_op_threads'],
+                          inter_op_parallelism_threads = _settings['inter_op_threads'],
+                          allow_soft_placement = _settings['allow_soft_placement'])
+
+
+def new_session(graph=None):
+    return tf.Session(graph=graph, config=get_config())
+
+
+@contextlib.contextmanager
+def jit_scope(jit=True):
+    """
+    Ops (and their gradients) built inside are compiled with XLA when jit is True, otherwise a no-op.
+    A new shape of the placeholders triggers a new compilation, so fixed batch and sequence sizes work best
+    """
+    if not jit:
+        yield
+        return
+    with tf.contrib.compiler.jit.experimental_jit_scope(compile_ops=True):
+        yield
+
+
+def no_jit_scope():
+    return tf.contrib.compiler.jit.experimental_jit_scope(compile_ops=False)
@@ -0,0 +1,119 @@
+"""
+Opt-in profiling of the fit loops
+
+    profiler = StepProfiler(trace_steps=[20, 21], report_every=100)
+    clf.fit(X_train, y_train, profiler=profiler)
+    print(profiler.summary())
+
+Every training step is split into
+    host_ms      time since the previous sess.run returned: Python batching, lr schedule, logging
+                 (a fit calls pause() after its validation, the step right after it is left out)
+    session_ms   the sess.run call: feed_dict conversion, kernels, fetching the results
+The trace_steps also run with FULL_TRACE and write a Chrome timeline (chrome://tracing) to trace_dir,
+and their kernel_ms (first op start to last op end) tells how much of session_ms is spent in kernels
+"""
+from __future__ import print_function
+import os
+import time
+import tensorflow as tf
+from tensorflow.python.client import timeline
+
+
+class StepProfiler:
+    def __init__(self, trace_steps=(), trace_dir='./temp/timeline', report_every=None):
+        """
+        Parameters:
+        -----------
+        trace_steps: list of int
+            Steps (counted from 0 over the whole fit) run with FULL_TRACE, skip the first few to leave warm-up out
+        trace_dir: str
+            Where the Chrome timelines step_<n>.json are written
+        report_every: int
+            Print the host/session split every this many steps, None to stay quiet
+        """
+        self.trace_steps = set(trace_steps)
+        self.trace_dir = trace_dir
+        self.report_every = report_every
+        self.step = 0
+        self.n_timed = 0
+        self.host_ms = 0.
+        self.session_ms = 0.
+        self.traces = []
+        self._last_end = None
+    # end constructor
+
+
+    def wrap(self, sess):
+        """
+        Returns a function with the signature of sess.run(fetches, feed_dict) that profiles each call
+        """
+        return lambda fetches, feed_dict=None: self.run(sess, fetches, feed_dict)
+    # end method wrap
+
+
+    def run(self, sess, fetches, feed_dict=None):
+        start = time.time()
+        host_ms = None if self._last_end is None else 1000 * (start - self._last_end)
+        if self.step in self.trace_steps:
+            run_metadata = tf.RunMetadata()
+            results = sess.run(fetches, feed_dict, options=tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE),
+                               run_metadata=run_metadata)
+            session_ms = 1000 * (time.time() - start)
+            self.write_trace(run_metadata, session_ms)
+        else:
+            results = sess.run(fetches, feed_dict)
+            session_ms = 1000 * (time.time() - start)
+            if host_ms is not None: # traced steps are slower, they stay out of the averages
+                self.n_timed += 1
+                self.host_ms += host_ms
+                self.session_ms += session_ms
+        self.step += 1
+        if self.report_every is not None and self.step % self.report_every == 0:
+            print(self.report())
+        self._last_end = time.time()
+        return results
+    # end method run
+
+
+    def pause(self):
+        """
+        Call after work in between the training steps that is not part of them (validation, sampling),
+        the next step stays out of the averages instead of counting that work as host time
+        """
+        self._last_end = None
+    # end method pause
+
+
+    def write_trace(self, run_metadata, session_ms):
+        if not os.path.isdir(self.trace_dir):
+            os.makedirs(self.trace_dir)
+        path = os.path.join(self.trace_dir, 'step_%d.json' % self.step)
+        with open(path, 'w') as f:
+            f.write(timeline.Timeline(run_metadata.step_stats).generate_chrome_trace_format())
+        nodes = [node for device in run_metadata.step_stats.dev_stats for node in device.node_stats]
+        kernel_ms = 0.
+        if len(nodes) > 0:
+            kernel_ms = (max(n.all_start_micros + n.all_end_rel_micros for n in nodes) -
+                         min(n.all_start_micros for n in nodes)) / 1000.
+        self.traces.append({'step': self.step, 'path': path, 'session_ms': session_ms, 'kernel_ms': kernel_ms})
+        print("Step %d traced to %s | session: %.1f ms | kernels: %.1f ms" % (self.step, path, session_ms, kernel_ms))
+    # end method write_trace
+
+
+    def summary(self):
+        n = max(1, self.n_timed)
+        host_ms, session_ms = self.host_ms / n, self.session_ms / n
+        return {'steps': self.step,
+                'host_ms': host_ms,
+                'session_ms': session_ms,
+                'host_fraction': host_ms / max(1e-9, host_ms + session_ms),
+                'traces': self.traces}
+    # end method summary
+
+
+    def report(self):
+        summary = self.summary()
+        return "Profiler | step %d | host: %.2f ms | sess.run: %.2f ms | host share: %.1f%%" % (
+            summary['steps'], summary['host_ms'], summary['session_ms'], 100 * summary['host_fraction'])
+    # end method report
+# end class
@@ -0,0 +1,23 @@
+from __future__ import print_function
+from rnn_text_clf import RNNTextClassifier
+from step_profiler import StepProfiler
+import tensorflow as tf
+
+
+vocab_size = 20000
+batch_size = 32
+
+
+if __name__ == '__main__':
+    (X_train, y_train), (X_test, y_test) = tf.keras.datasets.imdb.load_data(num_words=vocab_size)
+    X_train, y_train = X_train[:5000], y_train[:5000]
+
+    profiler = StepProfiler(trace_steps=[20, 100], trace_dir='./temp/timeline', report_every=50)
+    clf = RNNTextClassifier(vocab_size, 2)
+    clf.fit(X_train, y_train, n_epoch=1, batch_size=batch_size, profiler=profiler)
+
+    summary = profiler.summary()
+    print("Per step | Python side: %.2f ms | sess.run: %.2f ms" % (summary['host_ms'], summary['session_ms']))
+    for trace in summary['traces']:
+        print("Step %d | kernels %.1f ms of %.1f ms in sess.run | open %s in chrome://tracing" % (
+            trace['step'], trace['kernel_ms'], trace['session_ms'], trace['path']))
@@ -2,13 +2,14 @@ from __future__ import print_function
 from data import IMDB
 from model import Model
 import tensorflow as tf
+from session_config import new_session
 
 
 def main():
     dataloader = IMDB()
     model = Model(dataloader.params)
 
-    sess = tf.Session()
+    sess = new_session()
     sess.run(tf.global_variables_initializer())
 
     print("Loading trained model ...")
@@ -6,13 +6,14 @@ from config import args
 import os
 import json
 import tensorflow as tf
+from session_config import new_session
 
 
 def main():
     dataloader = IMDB()
     model = Model(dataloader.params)
 
-    sess = tf.Session()
+    sess = new_session()
     sess.run(tf.global_variables_initializer())
 
     n_batch = len(dataloader.enc_inp) // args.batch_size
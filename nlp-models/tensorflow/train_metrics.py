@@ -0,0 +1,330 @@
+"""
+Throughput metrics of the fit loops, cheap enough to leave on
+
+    ring = RingBuffer(1000)
+    with JSONLSink('./temp/train.jsonl') as jsonl:
+        clf.fit(X_train, y_train, callbacks=[ring, jsonl])
+    print(ring.mean('tokens_per_sec'))
+
+After every training step each callback gets a dict with the fields of FIELDS
+    step             steps counted from 0 over the whole fit
+    time             unix time at the end of the step
+    wall_ms          since the end of the previous step
+    data_wait_ms     the part of wall_ms spent before the step started: batching, feed conversion, logging
+                     (0 for the step right after a validation, the fit calls pause() once it is done)
+    compute_ms       the training step itself
+    examples         batch size
+    tokens           non-pad tokens of the batch (all of them when the model has no padding)
+    examples_per_sec examples / wall_ms
+    tokens_per_sec   tokens / wall_ms
+    lr               learning rate fed to the step, None when the model has no lr placeholder
+"""
+import csv
+import json
+import time
+import threading
+import collections
+import numpy as np
+import tensorflow as tf
+
+
+FIELDS = ['step', 'time', 'wall_ms', 'data_wait_ms', 'compute_ms', 'examples', 'tokens',
+          'examples_per_sec', 'tokens_per_sec', 'lr']
+
+
+class Callback:
+    def on_step(self, metrics):
+        pass
+    # end method on_step
+
+
+    def close(self):
+        pass
+    # end method close
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+# end class
+
+
+class RingBuffer(Callback):
+    def __init__(self, capacity=1000):
+        self.steps = collections.deque(maxlen=capacity)
+    # end constructor
+
+
+    def on_step(self, metrics):
+        self.steps.append(metrics)
+    # end method on_step
+
+
+    def last(self, n=1):
+        return list(self.steps)[-n:]
+    # end method last
+
+
+    def mean(self, field, n=None):
+        values = [m[field] for m in (self.steps if n is None else self.last(n)) if m[field] is not None]
+        return sum(values) / len(values) if len(values) > 0 else None
+    # end method mean
+# end class
+
+
+class CSVSink(Callback):
+    def __init__(self, path, flush_every=100):
+        """
+        Parameters:
+        -----------
+        path: str
+            The file is overwritten, with a header row of FIELDS
+        flush_every: int
+            Rows are buffered and written out every this many steps, and on close
+        """
+        self.f = open(path, 'w')
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(FIELDS)
+        self.flush_every = flush_every
+        self.n_rows = 0
+    # end constructor
+
+
+    def on_step(self, metrics):
+        self.writer.writerow(['' if metrics[k] is None else metrics[k] for k in FIELDS])
+        self.n_rows += 1
+        if self.n_rows % self.flush_every == 0:
+            self.f.flush()
+    # end method on_step
+
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+    # end method close
+# end class
+
+
+class JSONLSink(Callback):
+    def __init__(self, path, flush_every=100):
+        """
+        Parameters:
+        -----------
+        path: str
+            The file is overwritten, one JSON object per step
+        flush_every: int
+            Lines are buffered and written out every this many steps, and on close
+        """
+        self.f = open(path, 'w')
+        self.flush_every = flush_every
+        self.n_rows = 0
+    # end constructor
+
+
+    def on_step(self, metrics):
+        self.f.write(json.dumps(metrics) + '\n')
+        self.n_rows += 1
+        if self.n_rows % self.flush_every == 0:
+            self.f.flush()
+    # end method on_step
+
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+    # end method close
+# end class
+
+
+class SerialCallbacks(Callback):
+    def __init__(self, callbacks):
+        """
+        Lets the meters of several threads (fit_hogwild) report to the same callbacks one step at a time,
+        the steps are numbered in the order they finish across the threads
+        """
+        self.callbacks = list(callbacks)
+        self.lock = threading.Lock()
+        self.n_steps = 0
+    # end constructor
+
+
+    def on_step(self, metrics):
+        with self.lock:
+            metrics['step'] = self.n_steps
+            self.n_steps += 1
+            for callback in self.callbacks:
+                callback.on_step(metrics)
+    # end method on_step
+# end class
+
+
+class ThroughputMeter:
+    def __init__(self, callbacks=None, pad_int=0):
+        """
+        Parameters:
+        -----------
+        callbacks: list of Callback
+            None or empty turns start() and stop() into no-ops
+        pad_int: int
+            Index of the padding token left out of the token count, None to count every position
+        """
+        self.callbacks = list(callbacks) if callbacks else []
+        self.pad_int = pad_int
+        self.step = 0
+        self._start = None
+        self._last_end = None
+    # end constructor
+
+
+    def start(self):
+        """
+        Call when the batch is ready, right before the training step
+        """
+        if self.callbacks:
+            self._start = time.time()
+    # end method start
+
+
+    def stop(self, tokens, lr=None):
+        """
+        Call right after the training step
+
+        Parameters:
+        -----------
+        tokens: array-like
+            The token indices fed to the step, batch first
+        lr: float
+            The learning rate of the step
+        """
+        if not self.callbacks:
+            return
+        end = time.time()
+        n_tokens = self.count_tokens(tokens)
+        data_wait = 0. if self._last_end is None else self._start - self._last_end
+        wall = max(1e-9, end - self._start + data_wait)
+        metrics = {'step': self.step,
+                   'time': end,
+                   'wall_ms': 1000 * wall,
+                   'data_wait_ms': 1000 * data_wait,
+                   'compute_ms': 1000 * (end - self._start),
+                   'examples': len(tokens),
+                   'tokens': n_tokens,
+                   'examples_per_sec': len(tokens) / wall,
+                   'tokens_per_sec': n_tokens / wall,
+                   'lr': None if lr is None else float(lr)}
+        for callback in self.callbacks:
+            callback.on_step(metrics)
+        self.step += 1
+        self._last_end = time.time()
+    # end method stop
+
+
+    def pause(self):
+        """
+        Call once a validation or sampling run between two training steps is done, the next step then
+        reports no data wait rather than the time of that run
+        """
+        self._last_end = None
+    # end method pause
+
+
+    def count_tokens(self, tokens):
+        if isinstance(tokens, np.ndarray):
+            return int(tokens.size if self.pad_int is None else np.count_nonzero(tokens != self.pad_int))
+        # padded lists as built by pad_sentence_batch, np.asarray on them would cost more than the count
+        if self.pad_int is None:
+            return sum(len(row) for row in tokens)
+        return sum(len(row) - row.count(self.pad_int) for row in tokens)
+    # end method count_tokens
+# end class
+
+
+class StepRunner:
+    def __init__(self, sess, profiler=None, meter=None, tokens=None, lr=None):
+        """
+        Called like sess.run(fetches, feed_dict) for each training step, see step_runner
+        """
+        self.run = sess.run if profiler is None else profiler.wrap(sess)
+        self.profiler = profiler
+        self.meter = meter
+        self.tokens = tokens
+        self.lr = lr
+    # end constructor
+
+
+    def __call__(self, fetches, feed_dict=None):
+        if self.meter is None:
+            return self.run(fetches, feed_dict)
+        lr = None if (self.lr is None) or (feed_dict is None) else feed_dict.get(self.lr)
+        self.meter.start()
+        if (feed_dict is not None) and (self.tokens in feed_dict):
+            results = self.run(fetches, feed_dict)
+            tokens = feed_dict[self.tokens]
+        else: # the batch comes from an input pipeline, it is fetched along with the step
+            results, tokens = self.run([fetches, self.tokens], feed_dict)
+        self.meter.stop(tokens, lr)
+        return results
+    # end method __call__
+
+
+    def pause(self):
+        """
+        Call after validation or sampling in between the training steps, so the next step does not count it
+        """
+        if self.profiler is not None:
+            self.profiler.pause()
+        if self.meter is not None:
+            self.meter.pause()
+    # end method pause
+# end class
+
+
+def step_runner(sess, profiler=None, callbacks=None, tokens=None, lr=None, pad_int=0):
+    """
+    Returns the StepRunner a fit loop runs its training steps with, through a profiler (step_profiler.py)
+    and a ThroughputMeter when they are given
+
+    Parameters:
+    -----------
+    tokens: tf.Tensor
+        Token indices of the batch, its feed is counted for examples and tokens (fetched when it is not fed)
+    lr: tf.placeholder
+        Learning rate, None when the model has none
+    pad_int: int
+        Padding index in the tokens feed, None when the model pads nothing
+    """
+    meter = ThroughputMeter(callbacks, pad_int) if callbacks else None
+    return StepRunner(sess, profiler, meter, tokens, lr)
+# end function step_runner
+
+
+class MeterHook(tf.train.SessionRunHook):
+    def __init__(self, callbacks, tokens, pad_int=0):
+        """
+        ThroughputMeter of a tf.estimator training loop, passed to EstimatorSpec(training_hooks=...)
+        by the model_fn, which has the features. Reading the batch from the input_fn happens inside
+        the step, so it counts as compute_ms rather than data_wait_ms
+
+        Parameters:
+        -----------
+        tokens: tf.Tensor
+            Token indices of the batch from the features, fetched with every step
+        """
+        self.meter = ThroughputMeter(callbacks, pad_int)
+        self.tokens = tokens
+    # end constructor
+
+
+    def before_run(self, run_context):
+        self.meter.start()
+        return tf.train.SessionRunArgs(self.tokens)
+    # end method before_run
+
+
+    def after_run(self, run_context, run_values):
+        self.meter.stop(run_values.results)
+    # end method after_run
+# end class
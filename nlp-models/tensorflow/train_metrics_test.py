@@ -0,0 +1,44 @@
+from __future__ import print_function
+from rnn_text_clf import RNNTextClassifier
+from word2vec_skipgram import SkipGram
+from train_metrics import RingBuffer, CSVSink, JSONLSink
+import tensorflow as tf
+import string
+import os
+
+
+vocab_size = 20000
+batch_size = 32
+
+
+if __name__ == '__main__':
+    (X_train, y_train), (X_test, y_test) = tf.keras.datasets.imdb.load_data(num_words=vocab_size)
+    X_train, y_train = X_train[:5000], y_train[:5000]
+    if not os.path.isdir('./temp'):
+        os.makedirs('./temp')
+
+    ring = RingBuffer(1000)
+    clf = RNNTextClassifier(vocab_size, 2)
+    with CSVSink('./temp/train_metrics.csv') as csv_sink, JSONLSink('./temp/train_metrics.jsonl') as jsonl_sink:
+        clf.fit(X_train, y_train, val_data=(X_test[:1000], y_test[:1000]), n_epoch=2, batch_size=batch_size,
+                callbacks=[ring, csv_sink, jsonl_sink])
+
+    # the first step of the second epoch comes right after the validation, which it must not count
+    first_of_epoch = ring.steps[(len(X_train) + batch_size - 1) // batch_size]
+    assert first_of_epoch['data_wait_ms'] == 0.
+    print("After validation | wall: %.2f ms | compute: %.2f ms" % (
+        first_of_epoch['wall_ms'], first_of_epoch['compute_ms']))
+
+    print("Last %d steps | %.1f examples/sec | %.1f tokens/sec | data wait: %.2f ms | compute: %.2f ms" % (
+        len(ring.steps), ring.mean('examples_per_sec'), ring.mean('tokens_per_sec'),
+        ring.mean('data_wait_ms'), ring.mean('compute_ms')))
+
+    # the threads of fit_hogwild report to the same callbacks, every step once
+    with open('temp/ptb_train.txt') as f:
+        text = f.read()
+    tf.reset_default_graph()
+    ring = RingBuffer(100000)
+    model = SkipGram(text, ['six', 'gold', 'japan', 'college'], useless_words=string.punctuation)
+    model.fit_hogwild(n_epoch=1, n_threads=4, callbacks=[ring])
+    assert [step['step'] for step in ring.steps] == list(range(len(ring.steps)))
+    print("Hogwild | %d steps | %.1f tokens/sec per thread" % (len(ring.steps), ring.mean('tokens_per_sec')))
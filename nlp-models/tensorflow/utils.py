@@ -16,12 +16,13 @@ def layer_norm(inputs, epsilon=1e-8):
 
 def embed_seq(inputs, vocab_size=None, embed_dim=None, zero_pad=False, scale=False):
     lookup_table = tf.get_variable('lookup_table', dtype=tf.float32, shape=[vocab_size, embed_dim])
-
-    if zero_pad:
-        lookup_table = tf.concat((tf.zeros([1, embed_dim]), lookup_table[1:, :]), axis=0)
     
     outputs = tf.nn.embedding_lookup(lookup_table, inputs)
 
+    if zero_pad:
+        # zero the looked-up rows of index 0 rather than copying the whole table with a zero first row
+        outputs *= tf.expand_dims(tf.to_float(tf.not_equal(inputs, 0)), -1)
+
     if scale:
         outputs = outputs * (embed_dim ** 0.5)
      
@@ -56,10 +57,9 @@ def sinusoidal_positional_encoding(inputs, num_units, zero_pad=True, scale=True)
         [[pos / np.power(10000, 2.*i/num_units) for i in range(num_units)] for pos in range(T)])
     position_enc[:, 0::2] = np.sin(position_enc[:, 0::2])  # dim 2i
     position_enc[:, 1::2] = np.cos(position_enc[:, 1::2])  # dim 2i+1
-    lookup_table = tf.convert_to_tensor(position_enc, tf.float32)
-
     if zero_pad:
-        lookup_table = tf.concat([tf.zeros([1, num_units]), lookup_table[1:, :]], axis=0)
+        position_enc[0, :] = 0.
+    lookup_table = tf.convert_to_tensor(position_enc, tf.float32)
 
     outputs = tf.nn.embedding_lookup(lookup_table, position_idx)
 
@@ -80,7 +80,13 @@ def label_smoothing_sequence_loss(logits,
                                   label_depth,
                                   average_across_timesteps=True,
                                   average_across_batch=True,
-                                  name=None):
+                                  name=None,
+                                  epsilon=0.1):
+    """
+    Same result as softmax cross entropy against label_smoothing(one_hot(targets)), without building the
+    [batch_size x sequence_length x label_depth] targets: with q = (1-epsilon)*one_hot + epsilon/label_depth,
+    -sum(q * log_softmax(logits)) = logsumexp(logits) - (1-epsilon)*logits[target] - epsilon*mean(logits)
+    """
     if len(logits.get_shape()) != 3:
         raise ValueError("Logits must be a "
                         "[batch_size x sequence_length x logits] tensor")
@@ -92,9 +98,14 @@ def label_smoothing_sequence_loss(logits,
                         "tensor")
     
     with tf.name_scope(name, "sequence_loss", [logits, targets, weights]):
-        targets = label_smoothing(tf.one_hot(targets, depth=label_depth))
-        crossent = tf.nn.softmax_cross_entropy_with_logits(labels=targets, logits=logits)
-        crossent = tf.reshape(crossent, [-1]) *  tf.reshape(weights, [-1])
+        flat_logits = tf.reshape(logits, [-1, label_depth])
+        flat_targets = tf.to_int32(tf.reshape(targets, [-1]))
+        target_logits = tf.gather(tf.reshape(flat_logits, [-1]),
+                                  tf.range(tf.shape(flat_targets)[0]) * label_depth + flat_targets)
+        crossent = (tf.reduce_logsumexp(flat_logits, axis=1)
+                    - (1 - epsilon) * target_logits
+                    - epsilon * tf.reduce_mean(flat_logits, axis=1))
+        crossent = crossent * tf.reshape(weights, [-1])
         
         if average_across_timesteps and average_across_batch:
             crossent = tf.reduce_sum(crossent)
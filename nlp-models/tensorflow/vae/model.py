@@ -1,6 +1,7 @@
 from __future__ import print_function
 from config import args
 from modified_tf_classes import BasicDecoder, BeamSearchDecoder
+from inference_graph import export_inference_graph
 
 import tensorflow as tf
 import numpy as np
@@ -212,6 +213,14 @@ class VRAE:
         print('-'*12)
 
 
+    def export_inference_graph(self, sess, path):
+        # z, enc_seq_len and _batch_size are fed directly when generating from the prior
+        export_inference_graph(sess, path,
+            inputs = {'enc_inp': self.enc_inp, 'z': self.z, 'enc_seq_len': self.enc_seq_len,
+                      'batch_size': self._batch_size},
+            outputs = {'predicted_ids': self.predicted_ids})
+
+
     def _gradient_clipping(self, loss_op):
         params = tf.trainable_variables()
         gradients = tf.gradients(loss_op, params)
@@ -4,6 +4,7 @@ from model import VRAE
 from config import args
 import json
 import tensorflow as tf
+from session_config import new_session
 
 
 def main():
@@ -16,7 +17,7 @@ def main():
     model = VRAE(params)
     saver = tf.train.Saver()
 
-    sess = tf.Session()
+    sess = new_session()
     sess.run(tf.global_variables_initializer())
 
     for epoch in range(args.num_epoch):
@@ -0,0 +1,86 @@
+"""
+Frozen inference graphs: a serving process loads one GraphDef instead of rebuilding the model in Python
+and restoring its variables
+
+    model.export_inference_graph('temp/model.pb')      # after training
+    graph = InferenceGraph('temp/model.pb')             # in the worker
+    graph.run('logits', {'X': X_batch, 'X_seq_lens': X_batch_lens})
+"""
+import json
+import tensorflow as tf
+
+
+SIGNATURE = 'inference_signature'
+
+
+def export_inference_graph(sess, path, inputs, outputs, constants=None):
+    """
+    Freezes the variables into constants and keeps only the nodes the outputs depend on,
+    so train_op, optimizer slots and gradients are dropped
+
+    Parameters:
+    -----------
+    sess: tf.Session
+        Session holding the trained variables
+    path: str
+        Output GraphDef file
+    inputs: dict
+        Name -> tensor fed at inference time
+    outputs: dict
+        Name -> tensor fetched at inference time
+    constants: dict
+        Placeholder -> value baked into the graph, e.g. {keep_prob: 1.0} or {is_training: False}
+    """
+    output_nodes = [tensor.op.name for tensor in outputs.values()]
+    graph_def = tf.graph_util.convert_variables_to_constants(sess, sess.graph.as_graph_def(), output_nodes)
+
+    folded = {tensor.op.name: value for tensor, value in (constants or {}).items()}
+    for node in graph_def.node:
+        if node.name in folded and node.op in ('Placeholder', 'PlaceholderWithDefault'):
+            dtype = tf.as_dtype(node.attr['dtype'].type)
+            node.op = 'Const'
+            del node.input[:]
+            if 'shape' in node.attr:
+                del node.attr['shape']
+            node.attr['value'].tensor.CopyFrom(tf.make_tensor_proto(folded[node.name], dtype))
+
+    # the tensor names of the inputs and outputs travel inside the graph, so one file is enough
+    kept = set(node.name for node in graph_def.node)
+    signature = {'inputs': {name: tensor.name for name, tensor in inputs.items() if tensor.op.name in kept},
+                 'outputs': {name: tensor.name for name, tensor in outputs.items()}}
+    node = graph_def.node.add()
+    node.name = SIGNATURE
+    node.op = 'Const'
+    node.attr['dtype'].type = tf.string.as_datatype_enum
+    node.attr['value'].tensor.CopyFrom(tf.make_tensor_proto(json.dumps(signature).encode('utf-8')))
+
+    with tf.gfile.GFile(path, 'wb') as f:
+        f.write(graph_def.SerializeToString())
+    print("Inference graph with %d nodes written to %s" % (len(graph_def.node), path))
+
+
+class InferenceGraph:
+    def __init__(self, path, config=None):
+        graph_def = tf.GraphDef()
+        with tf.gfile.GFile(path, 'rb') as f:
+            graph_def.ParseFromString(f.read())
+        if any(node.op == 'GatherTree' for node in graph_def.node):
+            tf.contrib.seq2seq # beam search ops are registered when contrib is loaded
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+        self.sess = tf.Session(graph=self.graph, config=config)
+        signature = json.loads(self.sess.run(SIGNATURE + ':0').decode('utf-8'))
+        self.inputs = {name: self.graph.get_tensor_by_name(t) for name, t in signature['inputs'].items()}
+        self.outputs = {name: self.graph.get_tensor_by_name(t) for name, t in signature['outputs'].items()}
+    # end constructor
+
+
+    def run(self, outputs, feed):
+        """
+        outputs: an output name or a list of them, feed: dict, input name -> value
+        """
+        fetches = self.outputs[outputs] if isinstance(outputs, str) else [self.outputs[o] for o in outputs]
+        return self.sess.run(fetches, {self.inputs[name]: value for name, value in feed.items()})
+    # end method run
+# end class
@@ -2,6 +2,7 @@ from __future__ import print_function
 from data import IMDB
 from model import VRAE
 import tensorflow as tf
+from session_config import new_session
 
 
 def main():
@@ -12,7 +13,7 @@ def main():
         'idx2word': dataloader.idx2word,}
     model = VRAE(params)
 
-    sess = tf.Session()
+    sess = new_session()
     sess.run(tf.global_variables_initializer())
 
     print("Loading trained model ...")
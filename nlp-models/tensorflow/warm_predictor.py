@@ -0,0 +1,74 @@
+import time
+import tensorflow as tf
+
+
+class WarmPredictor:
+    def __init__(self, estimator, features, reload_check_secs=1.0):
+        """
+        Keeps the predict graph of a tf.estimator.Estimator and a session with restored variables alive,
+        so that a request is a single sess.run instead of graph building + checkpoint restore
+
+        Parameters:
+        -----------
+        estimator: tf.estimator.Estimator
+            Its model_fn, params, config and model_dir are reused
+        features: dict
+            Feature name -> (dtype, shape), a placeholder is created for each of them
+        reload_check_secs: float
+            Min seconds between two looks at model_dir for a newer checkpoint
+        """
+        self.model_dir = estimator.model_dir
+        self.reload_check_secs = reload_check_secs
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            self.features = {name: tf.placeholder(dtype, shape, name)
+                             for name, (dtype, shape) in features.items()}
+            spec = estimator.model_fn(self.features, None, tf.estimator.ModeKeys.PREDICT, estimator.config)
+            self.predictions = spec.predictions
+            self.saver = tf.train.Saver()
+        self.sess = tf.Session(graph=self.graph, config=estimator.config.session_config)
+        self.checkpoint_path = None
+        self._last_check = 0.
+        self.maybe_reload()
+    # end constructor
+
+
+    def maybe_reload(self):
+        """
+        Restores the latest checkpoint of model_dir if it is not the one loaded, returns True if it did
+        """
+        self._last_check = time.time()
+        path = tf.train.latest_checkpoint(self.model_dir)
+        if path is None:
+            raise ValueError("No checkpoint found in %s, train the estimator first" % self.model_dir)
+        if path == self.checkpoint_path:
+            return False
+        self.saver.restore(self.sess, path)
+        self.checkpoint_path = path
+        return True
+    # end method maybe_reload
+
+
+    def current_checkpoint(self):
+        """
+        Path of the checkpoint the next predict runs with, looks for a newer one at most every reload_check_secs
+        """
+        if time.time() - self._last_check >= self.reload_check_secs:
+            self.maybe_reload()
+        return self.checkpoint_path
+    # end method current_checkpoint
+
+
+    def predict(self, feed):
+        """
+        feed: dict, feature name -> numpy array, returns the evaluated predictions of the whole batch
+        """
+        self.current_checkpoint()
+        return self.sess.run(self.predictions, {self.features[name]: value for name, value in feed.items()})
+    # end method predict
+
+
+    def close(self):
+        self.sess.close()
+    # end method close
+# end class
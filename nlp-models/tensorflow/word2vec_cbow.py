@@ -2,15 +2,20 @@ from __future__ import division
 import re
 import sys
 import math
+import time
+import threading
 import numpy as np
 import tensorflow as tf
+import embedding_store
 from collections import Counter
-from sklearn.utils import shuffle
+from numpy.lib.stride_tricks import as_strided
+from session_config import new_session
+from train_metrics import step_runner, SerialCallbacks
 
 
 class CBOW:
     def __init__(self, text, sample_words, window_size=3, embedding_dim=200, n_sampled=100, min_freq=5,
-                 useless_words=None, loss_fn=tf.nn.sampled_softmax_loss, sess=tf.Session()):
+                 useless_words=None, loss_fn=tf.nn.sampled_softmax_loss, sess=None):
         self.text = text
         self.sample_words = sample_words
         self.window_size = window_size
@@ -19,7 +24,7 @@ class CBOW:
         self.min_freq = min_freq
         self.useless_words = useless_words
         self.loss_fn = loss_fn
-        self.sess = sess
+        self.sess = new_session() if sess is None else sess
         self.preprocess_text()
         self.build_graph()
     # end constructor
@@ -34,8 +39,16 @@ class CBOW:
 
 
     def add_input_layer(self):
-        self.x = tf.placeholder(tf.int32, shape=[None, 2*self.window_size])
-        self.y = tf.placeholder(tf.int32, shape=[None, 1])
+        self.batch_size = tf.placeholder(tf.int64, shape=[])
+        self.shuffle_buffer = tf.placeholder(tf.int64, shape=[]) # 1 means no shuffle
+        dataset = tf.data.Dataset.range(len(self.windows))
+        dataset = dataset.shuffle(self.shuffle_buffer).batch(self.batch_size)
+        dataset = dataset.map(lambda idx: tuple(tf.py_func(self.gather_xy, [idx], [tf.int32, tf.int32])))
+        dataset = dataset.prefetch(4)
+        self.iterator = dataset.make_initializable_iterator()
+        self.x, self.y = self.iterator.get_next()
+        self.x.set_shape([None, 2*self.window_size])
+        self.y.set_shape([None, 1])
         self.w = tf.get_variable('softmax_w', [self.vocab_size, self.embedding_dim], tf.float32,
                                   tf.variance_scaling_initializer())
         self.b = tf.get_variable('softmax_b', [self.vocab_size], tf.float32)
@@ -50,14 +63,18 @@ class CBOW:
 
 
     def add_backward_path(self):
-        self.loss = tf.reduce_mean(self.loss_fn(
+        crossent = self.loss_fn(
             weights=self.w,
             biases=self.b,
             labels=self.y,
             inputs=self.embedded,
             num_sampled=self.n_sampled,
-            num_classes=self.vocab_size))
+            num_classes=self.vocab_size)
+        self.loss = tf.reduce_mean(crossent)
         self.train_op = tf.train.AdamOptimizer().minimize(self.loss)
+        # plain sgd only touches the looked-up rows (sparse scatter updates, no locking), see fit_hogwild
+        self.sgd_lr = tf.placeholder(tf.float32, shape=[])
+        self.sgd_op = tf.train.GradientDescentOptimizer(self.sgd_lr).minimize(tf.reduce_sum(crossent))
     # end method add_backward_path
 
 
@@ -96,7 +113,8 @@ class CBOW:
         print('Vocabulary size:', self.vocab_size)
 
         indexed = [self.word2idx[w] for w in words]
-        self.indexed = self.filter_high_freq(indexed)
+        self.indexed = np.array(self.filter_high_freq(indexed), np.int32)
+        self.windows, self.context_cols = self.make_xy(self.indexed)
         print("Word preprocessing completed ...")
     # end method preprocess_text
 
@@ -116,71 +134,106 @@ class CBOW:
     # end method filter_high_freq
 
 
-    """
-    def next_batch(self, batch_size):
-        for idx in range(0, len(self.indexed), batch_size):
-            x, y = [], []
-            batch = self.indexed[idx: idx+batch_size]
-            for i in range(len(batch)):
-                batch_x = batch[i]
-                batch_y = self.get_y(batch, i)
-                x.extend([batch_x] * len(batch_y))
-                y.extend(batch_y)
-            yield (x, y)
-    # end method next_batch
-    """
-
-
     def make_xy(self, int_words):
-        x, y = [], []
-        for i in range(self.window_size, len(int_words)-self.window_size):
-            inputs = self.get_x(int_words, i)
-            x.append(inputs)
-            y.append(int_words[i])
-        return np.array(x), np.array(y)
+        """
+        Every row of the returned view is one window of 2*window_size+1 words,
+        all rows share the memory of int_words, nothing is copied
+        """
+        width = 2*self.window_size + 1
+        stride = int_words.strides[0]
+        windows = as_strided(int_words, shape=[len(int_words)-width+1, width], strides=[stride, stride],
+                             writeable=False)
+        context_cols = np.delete(np.arange(width), self.window_size) # drop the centre column
+        return windows, context_cols
     # end method make_xy
 
 
-    def get_x(self, words, idx):
-        left = idx - self.window_size
-        right = idx + self.window_size
-        return words[left: idx] + words[idx+1: right+1]
-    # end method get_y
+    def gather_xy(self, idx):
+        rows = self.windows[idx]
+        return rows[:, self.context_cols], rows[:, self.window_size, np.newaxis]
+    # end method gather_xy
 
 
-    def fit(self, n_epoch=10, batch_size=128, top_k=5, eval_step=1000, en_shuffle=True):
+    def fit(self, n_epoch=10, batch_size=128, top_k=5, eval_step=1000, en_shuffle=True,
+            profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.x, pad_int=None)
         self.sess.run(tf.global_variables_initializer())
-        x, y = self.make_xy(self.indexed)
         global_step = 0
-        n_batch = int(len(x) / batch_size)
-        total_steps = int(n_epoch * n_batch)
+        n_batch = int(len(self.windows) / batch_size)
 
         for epoch in range(n_epoch):
-            if en_shuffle:
-                x, y = shuffle(x, y)
-                print("Data Shuffled")
-            for local_step, (x_batch, y_batch) in enumerate(zip(self.next_batch(x, batch_size),
-                                                                self.next_batch(y, batch_size))):
-                y_batch = np.array(y_batch)[:, np.newaxis]
-                _, loss = self.sess.run([self.train_op, self.loss], {self.x: x_batch, self.y: y_batch})
+            self.sess.run(self.iterator.initializer, {self.batch_size: batch_size,
+                self.shuffle_buffer: len(self.windows) if en_shuffle else 1})
+            local_step = 0
+            while True:
+                try:
+                    _, loss = run([self.train_op, self.loss])
+                except tf.errors.OutOfRangeError:
+                    break
                 if local_step % 50 == 0:
                     print ('Epoch %d/%d | Batch %d/%d | train loss: %.4f' %
                            (epoch+1, n_epoch, local_step, n_batch, loss))
-                global_step += 1
                 if local_step % eval_step == 0:
-                    similarity = self.sess.run(self.similarity)
-                    for i in range(len(self.sample_words)):
-                        neighbours = (-similarity[i]).argsort()[1:top_k+1]
-                        log = 'Nearest to [%s]:' % self.idx2word[self.sample_indices[i]]
-                        for k in range(top_k):
-                            neighbour = self.idx2word[neighbours[k]]
-                            log = '%s %s,' % (log, neighbour)
-                        print(log)
+                    self.print_similarity(top_k)
+                    run.pause()
+                local_step += 1
+                global_step += 1
     # end method fit
 
 
-    def next_batch(self, arr, batch_size):
-        for i in range(0, len(arr), batch_size):
-            yield arr[i : i+batch_size]
-    # end method gen_batch
+    def fit_hogwild(self, n_epoch=10, n_threads=4, batch_size=128, start_lr=0.05, top_k=5, callbacks=None):
+        """
+        Hogwild training for multi-core CPUs: every thread streams its own shard of the corpus
+        and applies sparse sgd updates to the shared variables without locking.
+        Run with a session whose inter_op_parallelism_threads >= n_threads.
+        The callbacks get the steps of all the threads, one at a time.
+        """
+        self.sess.run(tf.global_variables_initializer())
+        shards = np.array_split(np.arange(len(self.windows)), n_threads)
+        n_words = [0] * n_threads
+        shared = [SerialCallbacks(callbacks)] if callbacks else None
+
+        def worker(tid):
+            run = step_runner(self.sess, None, shared, tokens=self.x, lr=self.sgd_lr, pad_int=None)
+            for epoch in range(n_epoch):
+                rows = np.random.permutation(shards[tid])
+                for i in range(0, len(rows), batch_size):
+                    progress = (epoch + i/len(rows)) / n_epoch
+                    lr = start_lr * max(1e-4, 1.0 - progress) # linear decay
+                    # iterator outputs are fed directly, each worker owns its stream
+                    x_batch, y_batch = self.gather_xy(rows[i : i+batch_size])
+                    run(self.sgd_op, {self.x: x_batch, self.y: y_batch, self.sgd_lr: lr})
+                n_words[tid] += len(rows)
+
+        t0 = time.time()
+        workers = [threading.Thread(target=worker, args=(tid,)) for tid in range(n_threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.time() - t0
+
+        words_per_sec = sum(n_words) / elapsed
+        print('Hogwild | %d threads | %.1f secs | %.0f words/sec | %.0f words/sec/core' %
+              (n_threads, elapsed, words_per_sec, words_per_sec / n_threads))
+        self.print_similarity(top_k)
+        return {'elapsed': elapsed, 'words_per_sec': words_per_sec, 'words_per_sec_per_core': words_per_sec / n_threads}
+    # end method fit_hogwild
+
+
+    def print_similarity(self, top_k):
+        similarity = self.sess.run(self.similarity)
+        for i in range(len(self.sample_words)):
+            neighbours = (-similarity[i]).argsort()[1:top_k+1]
+            log = 'Nearest to [%s]:' % self.idx2word[self.sample_indices[i]]
+            for k in range(top_k):
+                neighbour = self.idx2word[neighbours[k]]
+                log = '%s %s,' % (log, neighbour)
+            print(log)
+    # end method print_similarity
+
+
+    def export_embedding(self, path, dtype='float32'):
+        embedding_store.save(path, self.idx2word, self.sess.run(self.embedding), dtype)
+    # end method export_embedding
 # end class
\ No newline at end of file
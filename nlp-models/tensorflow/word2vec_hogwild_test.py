@@ -0,0 +1,27 @@
+import string
+import tensorflow as tf
+from word2vec_skipgram import SkipGram
+from word2vec_cbow import CBOW
+
+
+N_THREADS = [1, 2, 4, 8, 16, 32]
+
+
+def session(n_threads):
+    # one kernel thread per op, one op per worker: cores go to workers, not to intra-op pools
+    config = tf.ConfigProto(intra_op_parallelism_threads=1, inter_op_parallelism_threads=n_threads)
+    return tf.Session(config=config)
+
+
+if __name__ == '__main__':
+    with open('temp/ptb_train.txt') as f:
+        text = f.read()
+    sample_words = ['six', 'gold', 'japan', 'college']
+
+    for Model in [SkipGram, CBOW]:
+        for n_threads in N_THREADS:
+            with tf.Graph().as_default():
+                model = Model(text, sample_words, useless_words=string.punctuation, sess=session(n_threads))
+                log = model.fit_hogwild(n_epoch=1, n_threads=n_threads)
+                print('%s | %d threads | %.0f words/sec/core' %
+                      (Model.__name__, n_threads, log['words_per_sec_per_core']))
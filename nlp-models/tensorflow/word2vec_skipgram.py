@@ -2,15 +2,19 @@ from __future__ import division
 import re
 import sys
 import math
+import time
+import threading
 import numpy as np
 import tensorflow as tf
+import embedding_store
 from collections import Counter
-from sklearn.utils import shuffle
+from session_config import new_session
+from train_metrics import step_runner, SerialCallbacks
 
 
 class SkipGram:
     def __init__(self, text, sample_words, skip_window=5, embedding_dim=200, n_sampled=100, min_freq=5,
-                 useless_words=None, loss_fn=tf.nn.sampled_softmax_loss, sess=tf.Session()):
+                 useless_words=None, loss_fn=tf.nn.sampled_softmax_loss, sess=None):
         self.text = text
         self.sample_words = sample_words
         self.skip_window = skip_window
@@ -19,7 +23,7 @@ class SkipGram:
         self.min_freq = min_freq
         self.useless_words = useless_words
         self.loss_fn = loss_fn
-        self.sess = sess
+        self.sess = new_session() if sess is None else sess
         self.preprocess_text()
         self.build_graph()
     # end constructor
@@ -49,14 +53,18 @@ class SkipGram:
 
 
     def add_backward_path(self):
-        self.loss = tf.reduce_mean(self.loss_fn(
+        crossent = self.loss_fn(
             weights=self.w,
             biases=self.b,
             labels=self.y,
             inputs=self.embedded,
             num_sampled=self.n_sampled,
-            num_classes=self.vocab_size))
+            num_classes=self.vocab_size)
+        self.loss = tf.reduce_mean(crossent)
         self.train_op = tf.train.AdamOptimizer().minimize(self.loss)
+        # plain sgd only touches the looked-up rows (sparse scatter updates, no locking), see fit_hogwild
+        self.sgd_lr = tf.placeholder(tf.float32, shape=[])
+        self.sgd_op = tf.train.GradientDescentOptimizer(self.sgd_lr).minimize(tf.reduce_sum(crossent))
     # end method add_backward_path
 
 
@@ -94,95 +102,125 @@ class SkipGram:
         self.vocab_size = len(self.idx2word)
         print('Vocabulary size:', self.vocab_size)
 
-        indexed = [self.word2idx[w] for w in words]
-        self.indexed = self.filter_high_freq(indexed)
+        self.indexed = np.array([self.word2idx[w] for w in words], np.int32)
+        self.prob_keep = self.subsample_prob(self.indexed)
         print("Word preprocessing completed ...")
     # end method preprocess_text
 
 
-    def filter_high_freq(self, int_words):
+    def subsample_prob(self, int_words):
+        # probability of keeping each word id, 1 - P(drop) from Mikolov et al.
         t = 1e-5
-        threshold = 0.8
+        word_freqs = np.bincount(int_words, minlength=self.vocab_size) / len(int_words)
+        return np.minimum(1.0, np.sqrt(t / np.maximum(word_freqs, 1e-12)))
+    # end method subsample_prob
 
-        int_word_counts = Counter(int_words)
-        total_count = len(int_words)
-        
-        word_freqs = {w: c / total_count for w, c in int_word_counts.items()}
-        prob_drop = {w: 1 - np.sqrt(t / word_freqs[w]) for w in int_word_counts}
-        train_words = [w for w in int_words if prob_drop[w] < threshold]
 
-        return train_words
+    def filter_high_freq(self, int_words):
+        # frequent words are dropped at random, a different subset every epoch
+        return int_words[np.random.rand(len(int_words)) < self.prob_keep[int_words]]
     # end method filter_high_freq
 
 
-    """
-    def next_batch(self, batch_size):
-        for idx in range(0, len(self.indexed), batch_size):
-            x, y = [], []
-            batch = self.indexed[idx: idx+batch_size]
-            for i in range(len(batch)):
-                batch_x = batch[i]
-                batch_y = self.get_y(batch, i)
-                x.extend([batch_x] * len(batch_y))
-                y.extend(batch_y)
-            yield (x, y)
+    def next_batch(self, int_words, batch_size, en_shuffle=True):
+        """
+        Generates (center, context) pairs on the fly, batch_size pairs at a time,
+        so memory does not grow with the number of pairs
+        """
+        n = len(int_words)
+        centers = np.random.permutation(n) if en_shuffle else np.arange(n)
+        offsets = np.concatenate([np.arange(-self.skip_window, 0), np.arange(1, self.skip_window+1)])
+        chunk = max(1, batch_size // (self.skip_window+1)) # avg pairs per center is skip_window+1
+        x_buf = np.zeros([0], np.int32)
+        y_buf = np.zeros([0], np.int32)
+        for i in range(0, n, chunk):
+            center = centers[i : i+chunk]
+            windows = np.random.randint(1, self.skip_window+1, size=len(center)) # dynamic window
+            context = center[:, np.newaxis] + offsets                            # (chunk, 2*skip_window)
+            mask = ((np.abs(offsets) <= windows[:, np.newaxis]) & (context >= 0) & (context < n))
+            x_buf = np.concatenate([x_buf, np.repeat(int_words[center], mask.sum(1))])
+            y_buf = np.concatenate([y_buf, int_words[context[mask]]])
+            while len(x_buf) >= batch_size:
+                yield x_buf[:batch_size], y_buf[:batch_size, np.newaxis]
+                x_buf, y_buf = x_buf[batch_size:], y_buf[batch_size:]
+        if len(x_buf) > 0:
+            yield x_buf, y_buf[:, np.newaxis]
     # end method next_batch
-    """
-
 
-    def make_xy(self, int_words):
-        x, y = [], []
-        for i in range(0, len(int_words)):
-            input_w = int_words[i]
-            labels = self.get_y(int_words, i)
-            x.extend([input_w] * len(labels))
-            y.extend(labels)
-        return x, y
-    # end method make_xy
 
-
-    def get_y(self, words, idx):
-        skip_window = np.random.randint(1, self.skip_window+1)
-        left = idx - skip_window if (idx - skip_window) > 0 else 0
-        right = idx + skip_window
-        y = words[left: idx] + words[idx+1: right+1]
-        return list(set(y))
-    # end method get_y
-
-
-    def fit(self, n_epoch=10, batch_size=1000, top_k=5, eval_step=1000, en_shuffle=True):
+    def fit(self, n_epoch=10, batch_size=1000, top_k=5, eval_step=1000, en_shuffle=True,
+            profiler=None, callbacks=None):
+        run = step_runner(self.sess, profiler, callbacks, tokens=self.x, pad_int=None)
         self.sess.run(tf.global_variables_initializer())
-        x, y = self.make_xy(self.indexed)
         global_step = 0
-        n_batch = int(len(x) / batch_size)
-        total_steps = int(n_epoch * n_batch)
 
         for epoch in range(n_epoch):
-            if en_shuffle:
-                x, y = shuffle(x, y)
-                print("Data Shuffled")
-            for local_step, (x_batch, y_batch) in enumerate(zip(self.next_batch(x, batch_size),
-                                                                self.next_batch(y, batch_size))):
-                y_batch = np.array(y_batch)[:, np.newaxis]
-                _, loss = self.sess.run([self.train_op, self.loss], {self.x: x_batch, self.y: y_batch})
+            int_words = self.filter_high_freq(self.indexed)
+            n_batch = int(len(int_words) * (self.skip_window+1) / batch_size)
+            for local_step, (x_batch, y_batch) in enumerate(self.next_batch(int_words, batch_size, en_shuffle)):
+                _, loss = run([self.train_op, self.loss], {self.x: x_batch, self.y: y_batch})
                 if local_step % 50 == 0:
                     print ('Epoch %d/%d | Batch %d/%d | train loss: %.4f' %
                            (epoch+1, n_epoch, local_step, n_batch, loss))
                 global_step += 1
                 if local_step % eval_step == 0:
-                    similarity = self.sess.run(self.similarity)
-                    for i in range(len(self.sample_words)):
-                        neighbours = (-similarity[i]).argsort()[1:top_k+1]
-                        log = 'Nearest to [%s]:' % self.idx2word[self.sample_indices[i]]
-                        for k in range(top_k):
-                            neighbour = self.idx2word[neighbours[k]]
-                            log = '%s %s,' % (log, neighbour)
-                        print(log)
+                    self.print_similarity(top_k)
+                    run.pause()
     # end method fit
 
 
-    def next_batch(self, arr, batch_size):
-        for i in range(0, len(arr), batch_size):
-            yield arr[i : i+batch_size]
-    # end method gen_batch
-# end class
\ No newline at end of file
+    def fit_hogwild(self, n_epoch=10, n_threads=4, batch_size=128, start_lr=0.025, top_k=5, callbacks=None):
+        """
+        Hogwild training for multi-core CPUs: every thread streams its own shard of the corpus
+        and applies sparse sgd updates to the shared variables without locking.
+        Run with a session whose inter_op_parallelism_threads >= n_threads.
+        The callbacks get the steps of all the threads, one at a time.
+        """
+        self.sess.run(tf.global_variables_initializer())
+        shards = np.array_split(self.indexed, n_threads)
+        n_words = [0] * n_threads
+        shared = [SerialCallbacks(callbacks)] if callbacks else None
+
+        def worker(tid):
+            run = step_runner(self.sess, None, shared, tokens=self.x, lr=self.sgd_lr, pad_int=None)
+            for epoch in range(n_epoch):
+                int_words = self.filter_high_freq(shards[tid])
+                n_pairs = max(1, len(int_words) * (self.skip_window+1))
+                for local_step, (x_batch, y_batch) in enumerate(self.next_batch(int_words, batch_size)):
+                    progress = (epoch + min(1.0, local_step*batch_size/n_pairs)) / n_epoch
+                    lr = start_lr * max(1e-4, 1.0 - progress) # linear decay
+                    run(self.sgd_op, {self.x: x_batch, self.y: y_batch, self.sgd_lr: lr})
+                n_words[tid] += len(int_words)
+
+        t0 = time.time()
+        workers = [threading.Thread(target=worker, args=(tid,)) for tid in range(n_threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.time() - t0
+
+        words_per_sec = sum(n_words) / elapsed
+        print('Hogwild | %d threads | %.1f secs | %.0f words/sec | %.0f words/sec/core' %
+              (n_threads, elapsed, words_per_sec, words_per_sec / n_threads))
+        self.print_similarity(top_k)
+        return {'elapsed': elapsed, 'words_per_sec': words_per_sec, 'words_per_sec_per_core': words_per_sec / n_threads}
+    # end method fit_hogwild
+
+
+    def print_similarity(self, top_k):
+        similarity = self.sess.run(self.similarity)
+        for i in range(len(self.sample_words)):
+            neighbours = (-similarity[i]).argsort()[1:top_k+1]
+            log = 'Nearest to [%s]:' % self.idx2word[self.sample_indices[i]]
+            for k in range(top_k):
+                neighbour = self.idx2word[neighbours[k]]
+                log = '%s %s,' % (log, neighbour)
+            print(log)
+    # end method print_similarity
+
+
+    def export_embedding(self, path, dtype='float32'):
+        embedding_store.save(path, self.idx2word, self.sess.run(self.embedding), dtype)
+    # end method export_embedding
+# end class
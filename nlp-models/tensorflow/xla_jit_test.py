@@ -0,0 +1,69 @@
+from __future__ import print_function
+from conv_1d_text_clf import Conv1DClassifier
+from multihead_attn_clf import Tagger
+from rnn_text_clf import RNNTextClassifier
+from birnn_crf_clf import BiRNN_CRF
+from self_attn_lm import LM
+import string
+import time
+import numpy as np
+import tensorflow as tf
+
+
+VOCAB_SIZE = 20000
+BATCH_SIZE = 64
+SEQ_LEN = 100
+N_STEPS = 50
+
+
+# seq2seq and text generation are left out on purpose: their decoders run in tf.while_loop
+# (dynamic_decode, sampling loops), which XLA does not compile, so those models take no jit flag
+def build(family, jit):
+    X = np.random.randint(1, VOCAB_SIZE, [BATCH_SIZE, SEQ_LEN])
+    X_lens = np.full(BATCH_SIZE, SEQ_LEN) # fixed shapes, so XLA compiles once
+    if family == 'conv':
+        model = Conv1DClassifier(SEQ_LEN, VOCAB_SIZE, 2, jit=jit)
+        feed = {model.X: X, model.Y: np.random.randint(0, 2, BATCH_SIZE), model.keep_prob: 0.8, model.lr: 1e-3}
+    elif family == 'attention':
+        model = Tagger(VOCAB_SIZE, 10, SEQ_LEN, jit=jit)
+        feed = {model.X: X, model.X_seq_len: X_lens, model.Y: np.random.randint(0, 10, [BATCH_SIZE, SEQ_LEN]),
+                model.is_training: True, model.lr: 1e-3}
+    elif family == 'rnn':
+        model = RNNTextClassifier(VOCAB_SIZE, 2, jit=jit)
+        feed = {model.X: X, model.X_seq_lens: X_lens, model.Y: np.random.randint(0, 2, BATCH_SIZE),
+                model.keep_prob: 0.8, model.lr: 1e-3}
+    elif family == 'crf':
+        model = BiRNN_CRF(VOCAB_SIZE, 10, jit=jit)
+        feed = {model.X: X, model.X_seq_len: X_lens, model.Y: np.random.randint(0, 10, [BATCH_SIZE, SEQ_LEN]),
+                model.keep_prob: 0.8, model.lr: 1e-3}
+    elif family == 'lm':
+        model = LM(''.join(np.random.choice(list(string.ascii_lowercase), 10000)), SEQ_LEN, jit=jit)
+        feed = {model.sequence: model.indexed[:BATCH_SIZE * SEQ_LEN].reshape(BATCH_SIZE, SEQ_LEN),
+                model.is_training: True}
+    else:
+        raise ValueError(family)
+    return model, feed
+
+
+def step_time(model, feed):
+    model.sess.run(tf.global_variables_initializer())
+    t0 = time.time()
+    model.sess.run(model.train_op, feed) # the first step includes the XLA compilation
+    first = time.time() - t0
+    t0 = time.time()
+    for _ in range(N_STEPS):
+        model.sess.run(model.train_op, feed)
+    return first, (time.time() - t0) / N_STEPS
+
+
+if __name__ == '__main__':
+    for family in ['conv', 'attention', 'lm', 'rnn', 'crf']:
+        times = {}
+        for jit in [False, True]:
+            with tf.Graph().as_default():
+                model, feed = build(family, jit)
+                first, times[jit] = step_time(model, feed)
+                model.sess.close()
+            print("%s | jit=%s | first step %.1f ms | step time %.1f ms" % (
+                family, jit, 1000 * first, 1000 * times[jit]))
+        print("%s | speedup with XLA: %.2fx" % (family, times[False] / times[True]))